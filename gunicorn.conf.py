@@ -0,0 +1,6 @@
+# ค่าของ gunicorn (โหลดอัตโนมัติเมื่อรัน gunicorn จากโฟลเดอร์นี้)
+# GUNICORN_THREADS ใช้กำหนดขนาด pool ของฐานข้อมูลด้วย (my_project/settings.py)
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
@@ -15,6 +15,8 @@ import os
 from dotenv import load_dotenv
 import dj_database_url
 import sys
+from importlib.util import find_spec
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "pages",
     "users.apps.UsersConfig",
     "posts.apps.PostsConfig",
@@ -74,6 +77,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "posts.context_processors.bookmarks",
             ],
         },
     },
@@ -86,9 +90,44 @@ WSGI_APPLICATION = "my_project.wsgi.application"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 
-    
+
+# การจัดการ connection ของ PostgreSQL (ดูสถิติได้จาก posts/db_stats.py)
+# ""           = เปิด connection ใหม่ทุก request (ค่าเดิม)
+# "persistent" = ใช้ connection เดิมข้าม request นาน DATABASE_CONN_MAX_AGE วินาที
+# "pool"       = pool ของ psycopg 3 ต่อ process (ต้องติดตั้ง "psycopg[pool]" แทน psycopg2)
+# ทั้งสองโหมดตรวจว่า connection ยังใช้ได้ก่อนนำกลับมาใช้ (CONN_HEALTH_CHECKS)
+DATABASE_CONN_MODE = os.environ.get("DATABASE_CONN_MODE", "")
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", "600"))
+if DATABASE_CONN_MODE not in ("", "persistent", "pool"):
+    raise ImproperlyConfigured(
+        f"DATABASE_CONN_MODE must be empty, 'persistent' or 'pool' (got {DATABASE_CONN_MODE!r})"
+    )
+
+# จำนวน thread ต่อ worker ของ gunicorn (gunicorn.conf.py)
+# หนึ่ง thread ใช้ connection ทีละหนึ่ง pool ของแต่ละ process จึงมีขนาดเท่านี้
+# connection รวม = WEB_CONCURRENCY x GUNICORN_THREADS ต้องไม่เกิน max_connections ของ Postgres
+GUNICORN_THREADS = int(os.environ.get("GUNICORN_THREADS", "1"))
+
 if not DEBUG:
-    DATABASES = {"default": dj_database_url.parse(os.environ.get("DATABASE_URL"))}
+    DATABASES = {
+        "default": dj_database_url.parse(
+            os.environ.get("DATABASE_URL"),
+            conn_max_age=DATABASE_CONN_MAX_AGE if DATABASE_CONN_MODE == "persistent" else 0,
+            conn_health_checks=DATABASE_CONN_MODE in ("persistent", "pool"),
+        )
+    }
+    if DATABASE_CONN_MODE == "pool":
+        # Django จะรู้ว่าไม่มี psycopg_pool ก็ตอน connect ครั้งแรก จึงตรวจตั้งแต่ตอนโหลด settings
+        if find_spec("psycopg") is None or find_spec("psycopg_pool") is None:
+            raise ImproperlyConfigured(
+                "DATABASE_CONN_MODE='pool' requires psycopg 3 with its pool: pip install 'psycopg[pool]'"
+            )
+        # เปิดครบตั้งแต่แรก request แรกของ thread ไหนก็ไม่ต้องรอ connect
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": GUNICORN_THREADS,
+            "max_size": GUNICORN_THREADS,
+            "timeout": int(os.environ.get("DATABASE_POOL_TIMEOUT", "10")),
+        }
 else:
     DATABASES = {
         "default": {
@@ -96,6 +135,23 @@ else:
             "NAME": "db.sqlite3",
         }
     }
+
+# read replica ของ PostgreSQL (posts/db_router.py) ไม่ตั้ง = อ่านและเขียนที่ default ทั้งหมด
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL", "")
+# หลังผู้ใช้เขียนข้อมูล ให้ request ของผู้ใช้คนนั้นอ่านจาก primary ต่ออีกกี่วินาที (เผื่อ replica ตามไม่ทัน)
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get("DATABASE_REPLICA_STICKY_SECONDS", "10"))
+
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASES["default"].get("CONN_MAX_AGE", 0),
+        conn_health_checks=DATABASES["default"].get("CONN_HEALTH_CHECKS", False),
+    )
+    DATABASES["replica"]["OPTIONS"] = dict(DATABASES["default"].get("OPTIONS", {}))
+    # ตอนรันเทสต์ใช้ฐานข้อมูลเดียวกับ default
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_ROUTERS = ["posts.db_router.PrimaryReplicaRouter"]
+    MIDDLEWARE.append("posts.db_router.ReplicaRoutingMiddleware")
         
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,7 +203,16 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Media
 MEDIA_URL = "/media/"
-MEDIA_ROOT = BASE_DIR / "mediafiles"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "mediafiles")
+
+# เก็บไฟล์ media บน S3 (ค่าเริ่มต้นเมื่อ DEBUG=False) หรือบนดิสก์ใน MEDIA_ROOT
+USE_S3_MEDIA = os.environ.get("USE_S3_MEDIA", str(not DEBUG)) == "True"
+
+# วิธีเสิร์ฟไฟล์ใน MEDIA_ROOT เมื่อไม่ใช้ S3 (posts/media_serving.py)
+# "" = ไม่เสิร์ฟ (ตอน DEBUG ใช้ static() ของ Django), "django", "x-accel" (nginx), "x-sendfile"
+MEDIA_SERVE_MODE = os.environ.get("MEDIA_SERVE_MODE", "")
+# location แบบ internal ของ nginx ที่ชี้ไปยัง MEDIA_ROOT (ใช้กับ MEDIA_SERVE_MODE="x-accel")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
 
 AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
@@ -175,7 +240,7 @@ STORAGES = {
     "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
 }
 
-if not DEBUG:
+if USE_S3_MEDIA:
 
     STORAGES["default"] = {
         "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
@@ -191,6 +256,50 @@ if not DEBUG:
 
     MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/{AWS_LOCATION}/"
 
+# เวลาที่เก็บรายการโพสต์ที่ผู้ใช้จองไว้ใน cache ข้าม request (วินาที)
+# 0 = ปิด; ควรเปิดเฉพาะเมื่อ CACHES เป็น cache ที่แชร์กันทุก worker
+POSTS_BOOKMARK_CACHE_TIMEOUT = int(os.environ.get("POSTS_BOOKMARK_CACHE_TIMEOUT", "0"))
+
+# อายุ (วินาที) ของ HTML การ์ดโพสต์ที่ cache ไว้ (posts/cache.py)
+# 0 = ปิด; เปิดได้เมื่อใช้ cache ที่แชร์กันทุก worker เช่นเดียวกับด้านบน
+POSTS_CARD_CACHE_TIMEOUT = int(os.environ.get("POSTS_CARD_CACHE_TIMEOUT", "0"))
+
+# อายุ (วินาที) ของข้อมูลหน้าแรกที่ cache ไว้ (posts/cache.py) 0 = ปิด
+POSTS_HOME_FEED_CACHE_TIMEOUT = int(os.environ.get("POSTS_HOME_FEED_CACHE_TIMEOUT", "0"))
+
+# อัปโหลดรูปของโพสต์ผ่านคิวงาน (posts/jobs.py) แทนการอัปโหลดใน request
+# ต้องรัน worker แยก: python manage.py run_jobs
+POSTS_MEDIA_ASYNC = os.environ.get("POSTS_MEDIA_ASYNC", "False") == "True"
+
+# จำนวน thread สูงสุดที่ใช้เขียนรูปลง storage พร้อมกันในหนึ่ง request
+POSTS_MEDIA_UPLOAD_THREADS = int(os.environ.get("POSTS_MEDIA_UPLOAD_THREADS", "4"))
+
+# จำนวน URL ของไฟล์ media ที่จำไว้ต่อ process (posts/media_urls.py) 0 = ปิด
+POSTS_MEDIA_URL_CACHE_SIZE = int(os.environ.get("POSTS_MEDIA_URL_CACHE_SIZE", "4096"))
+
+# ให้เบราว์เซอร์อัปโหลดรูปตรงไปยัง storage (S3 presigned POST) ไม่ผ่าน gunicorn
+# ต้องตั้ง CORS ของ bucket ก่อนเปิดใช้ (posts/uploads.py)
+POSTS_DIRECT_UPLOADS = os.environ.get("POSTS_DIRECT_UPLOADS", "False") == "True"
+
+# ขนาดไฟล์รูปสูงสุดต่อไฟล์ (ไบต์)
+POSTS_MAX_UPLOAD_SIZE = int(os.environ.get("POSTS_MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))
+
+# ขนาด request ที่มีไฟล์แนบสูงสุด (ไบต์) เกินนี้ถูกปฏิเสธก่อนอ่าน body (posts/upload_handlers.py)
+POSTS_MAX_UPLOAD_REQUEST_SIZE = int(
+    os.environ.get("POSTS_MAX_UPLOAD_REQUEST_SIZE", str(50 * 1024 * 1024))
+)
+
+# นับ query / เวลา DB ของแต่ละ view (posts/query_budget.py) เปิดเฉพาะตอนตรวจประสิทธิภาพ
+QUERY_BUDGET_ENABLED = os.environ.get("QUERY_BUDGET_ENABLED", "False") == "True"
+# จำนวน query สูงสุดต่อ request ก่อนเตือน (view กำหนดเองได้ด้วย @query_budget)
+QUERY_BUDGET_DEFAULT = int(os.environ.get("QUERY_BUDGET_DEFAULT", "20"))
+# query รูปเดียวกันซ้ำกี่ครั้งใน request เดียวถึงถือว่าเป็น N+1
+QUERY_BUDGET_REPEAT_THRESHOLD = int(os.environ.get("QUERY_BUDGET_REPEAT_THRESHOLD", "5"))
+
+if QUERY_BUDGET_ENABLED:
+    # นอกสุด เพื่อนับ query ของ session / auth ด้วย
+    MIDDLEWARE.insert(0, "posts.query_budget.QueryBudgetMiddleware")
+
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
     
\ No newline at end of file
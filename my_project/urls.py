@@ -15,10 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf.urls.static import static
 from django.conf import settings
 from users import views as user_views
+from posts.media_serving import serve_media
 
 
 urlpatterns = [
@@ -32,5 +33,9 @@ urlpatterns = [
     
 ]
 
-if settings.DEBUG: # pragma: no cover
+if settings.MEDIA_SERVE_MODE and not settings.USE_S3_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+    ]
+elif settings.DEBUG: # pragma: no cover
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) 
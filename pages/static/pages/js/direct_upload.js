@@ -0,0 +1,96 @@
+// อัปโหลดรูปของฟอร์มโพสต์ตรงไปยัง storage ก่อนส่งฟอร์ม (ดู posts/uploads.py)
+// ใช้กับ <form data-upload-ticket-url="..."> ที่มีช่อง <input type="file" name="images">
+// ถ้าเบราว์เซอร์ไม่รองรับ fetch ฟอร์มจะส่งไฟล์ผ่าน Django แบบเดิม
+(function () {
+    async function requestTicket(ticketUrl, csrfToken, file) {
+        const body = new FormData();
+        body.append("content_type", file.type);
+        body.append("size", file.size);
+
+        const response = await fetch(ticketUrl, {
+            method: "POST",
+            headers: { "X-CSRFToken": csrfToken },
+            credentials: "same-origin",
+            body: body,
+        });
+        const ticket = await response.json();
+        if (!response.ok) {
+            throw new Error(ticket.error || "ไม่สามารถอัปโหลดรูปได้");
+        }
+        return ticket;
+    }
+
+    async function uploadFile(ticketUrl, csrfToken, file) {
+        const ticket = await requestTicket(ticketUrl, csrfToken, file);
+
+        let response;
+        if (ticket.method === "POST") {
+            // S3 presigned POST: ต้องส่ง fields ทั้งหมดก่อนไฟล์
+            const data = new FormData();
+            Object.entries(ticket.fields).forEach(([name, value]) => data.append(name, value));
+            data.append("file", file);
+            response = await fetch(ticket.url, { method: "POST", body: data });
+        } else {
+            response = await fetch(ticket.url, {
+                method: "PUT",
+                headers: ticket.headers,
+                credentials: "same-origin",
+                body: file,
+            });
+        }
+        if (!response.ok) {
+            throw new Error("อัปโหลดรูป " + file.name + " ไม่สำเร็จ");
+        }
+        return ticket.token;
+    }
+
+    function attach(form) {
+        const input = form.querySelector('input[type="file"][name="images"]');
+        if (!input || !window.fetch) {
+            return;
+        }
+
+        form.addEventListener("submit", async function (event) {
+            if (!input.files.length || form.dataset.uploading) {
+                return;
+            }
+            event.preventDefault();
+            form.dataset.uploading = "true";
+
+            const csrfToken = form.querySelector('[name="csrfmiddlewaretoken"]').value;
+            const submitButton = form.querySelector('[type="submit"]');
+            if (submitButton) {
+                submitButton.disabled = true;
+            }
+
+            try {
+                // อัปโหลดทุกไฟล์พร้อมกัน แต่เก็บ token ตามลำดับที่เลือกไว้
+                const files = Array.from(input.files);
+                const tokens = await Promise.all(
+                    files.map((file) => uploadFile(form.dataset.uploadTicketUrl, csrfToken, file))
+                );
+                tokens.forEach(function (token) {
+                    const hidden = document.createElement("input");
+                    hidden.type = "hidden";
+                    hidden.name = "upload_tokens";
+                    hidden.value = token;
+                    form.appendChild(hidden);
+                });
+
+                // ไฟล์อยู่ใน storage แล้ว ไม่ต้องส่งซ้ำไปกับฟอร์ม
+                input.value = "";
+                form.submit();
+            } catch (error) {
+                delete form.dataset.uploading;
+                if (submitButton) {
+                    submitButton.disabled = false;
+                }
+                alert(error.message);
+            }
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("form[data-upload-ticket-url]").forEach(attach);
+    });
+})();
@@ -1,16 +1,21 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.contrib.auth.models import User
-from posts.models import HiringPost, RentalPost, Media
+from posts.models import HiringPost, RentalPost, Media, Review
+from posts.cache import HOME_FEED_LOCK_KEY, get_home_feed
 from posts.views import _format_post_data
+from posts.testing import QueryBudgetTestMixin
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.messages import get_messages
 from pages.forms import StudentRegisterForm
 from django.contrib import messages
 from .forms import ContactForm
+import tempfile
 
 
-class PagesViewTests(TestCase):
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PagesViewTests(QueryBudgetTestMixin, TestCase):
     # กำหนดข้อมูลโพสต์ขึ้นมาเอง
     def setUp(self):
         self.user = User.objects.create_user(username = 'minnie', password = 'minn9149')
@@ -148,6 +153,68 @@ class PagesViewTests(TestCase):
         self.assertIn("avg_rating", formatted)
         self.assertIn("price_detail", formatted)
         
+    def test_home_page_query_budget(self):
+        # การ์ดทั้ง 6 ใบไม่ query ต่อการ์ด (ผู้ใช้ที่ login เพิ่ม query ของ session / user / การจอง)
+        self.assertQueryBudget(reverse('home'), 2)
+        self.client.force_login(self.user)
+        self.assertQueryBudget(reverse('home'), 4)
+
+@override_settings(POSTS_HOME_FEED_CACHE_TIMEOUT=300)
+class HomeFeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="minnie", password="minn9149")
+        self.old_post = HiringPost.objects.create(
+            author=self.user, title="old hiring", budgetMin=1, budgetMax=2
+        )
+        self.hiring = [
+            HiringPost.objects.create(
+                author=self.user, title=f"hiring {i}", budgetMin=1, budgetMax=2
+            )
+            for i in range(3)
+        ]
+        self.url = reverse("home")
+
+    def test_second_visit_uses_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["hiring_items"]), 3)
+
+    def test_new_post_and_review_invalidate_feed(self):
+        self.client.get(self.url)
+
+        post = HiringPost.objects.create(
+            author=self.user, title="brand new", budgetMin=1, budgetMax=2
+        )
+        items = self.client.get(self.url).context["hiring_items"]
+        self.assertEqual(items[0]["id"], post.id)
+
+        Review.objects.create(post=post, author=self.user, rating=4)
+        items = self.client.get(self.url).context["hiring_items"]
+        self.assertEqual(items[0]["count_reviews"], 1)
+
+    def test_change_to_post_not_on_home_keeps_cache(self):
+        self.client.get(self.url)
+        self.old_post.title = "still old"
+        self.old_post.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_concurrent_rebuild_serves_stale_feed(self):
+        self.client.get(self.url)
+        self.hiring[0].delete()
+
+        # มี request อื่นกำลังสร้าง feed ใหม่อยู่ (ถือ lock)
+        cache.add(HOME_FEED_LOCK_KEY, True, 10)
+
+        def build():
+            raise AssertionError("should not rebuild while another request holds the lock")
+
+        feed = get_home_feed(build)
+        self.assertIn(self.hiring[0].id, [item["id"] for item in feed["hiring_items"]])
+
+
 class StudentRegisterFormTest(TestCase):
     def setUp(self): 
         # กำหนดข้อมูล user 
@@ -1,7 +1,8 @@
 from django.shortcuts import render, redirect
-from django.db.models import Prefetch
 from posts.models import Post, HiringPost, RentalPost, Media
 from posts.views import _format_post_data
+from posts.cache import attach_card_versions, get_home_feed
+from posts.query_budget import query_budget
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from .forms import StudentRegisterForm
@@ -12,23 +13,27 @@ from .forms import ContactForm
 def about_page_view(request):
     return render(request, 'pages/about.html')
 
+def _build_home_feed():
+    # ดึงข้อมูล 3 โพสต์ล่าสุดของแต่ละประเภท (รูปปกมากับ query เดียว)
+    latest_hiring = HiringPost.objects.cards().order_by('-id')[:3]
+    latest_rental = RentalPost.objects.cards().order_by('-id')[:3]
+
+    # แปลงข้อมูลโดยใช้ฟังก์ชัน _format_post_data ของคุณเอง
+    return {
+        "hiring_items": [_format_post_data(post) for post in latest_hiring],
+        "rental_items": [_format_post_data(post) for post in latest_rental],
+    }
+
+
+@query_budget(6)
 def home_page_view(request):
+    # ข้อมูลหน้าแรกมาจาก cache (posts/cache.py) และถูกลบโดย signal เมื่อโพสต์เปลี่ยน
+    feed = get_home_feed(_build_home_feed)
 
-    posts_with_media = Prefetch(
-        'media', 
-        queryset=Media.objects.all(), 
-        to_attr='images'
-    )
-    
-    # ดึงข้อมูล 3 โพสต์ล่าสุดของแต่ละประเภท
-    latest_hiring = HiringPost.objects.prefetch_related(posts_with_media).order_by('-id')[:3]
-    latest_rental = RentalPost.objects.prefetch_related(posts_with_media).order_by('-id')[:3]
-    
     #  context เพื่อส่งไปให้ HTML
     context = {
-        # แปลงข้อมูลโดยใช้ฟังก์ชัน _format_post_data ของคุณเอง
-        "hiring_items": [_format_post_data(post) for post in latest_hiring],
-        "rental_items": [_format_post_data(post) for post in latest_rental],
+        "hiring_items": attach_card_versions(feed["hiring_items"], "home_hiring_card"),
+        "rental_items": attach_card_versions(feed["rental_items"], "home_rental_card"),
     }
     
     return render(request, 'pages/home.html', context)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Post, RentalPost, HiringPost, Media, Skill, Category
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import Post, RentalPost, HiringPost, Media, MediaBlob, Skill, Category, Job
 
 
 # Inline class สำหรับ Media
@@ -25,7 +27,26 @@ class HiringPostAdmin(admin.ModelAdmin):
 # ลงทะเบียนโมเดลเพื่อให้แสดงในหน้า admin
 admin.site.register(RentalPost, RentalPostAdmin)
 admin.site.register(HiringPost, HiringPostAdmin)
-admin.site.register(Media)
+
+
+@admin.register(Media)
+class MediaAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "post", "preview")
+    list_select_related = ("post",)
+
+    @admin.display(description="Thumbnail")
+    def preview(self, obj):
+        # ใช้รูปย่อ ไม่โหลดรูปต้นฉบับขนาดเต็มในหน้ารายการ
+        if not obj.thumbnail:
+            return "-"
+        return format_html('<img src="{}" width="80" height="80" alt="">', obj.thumbnail.url)
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "image", "size", "ref_count", "created_at")
+    search_fields = ("sha256", "image")
+    readonly_fields = ("sha256", "image", "thumbnail", "card_image", "card_webp", "size", "ref_count", "created_at")
 
 
 @admin.register(Skill)
@@ -50,3 +71,19 @@ class CategoryAdmin(admin.ModelAdmin):
             },
         ),
     )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "attempts", "max_attempts", "run_after", "updated_at")
+    list_filter = ("status", "kind")
+    readonly_fields = ("created_at", "updated_at", "locked_at", "last_error")
+    ordering = ("-id",)
+    actions = ("retry_jobs",)
+
+    @admin.action(description="Retry selected jobs")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_QUEUED, attempts=0, run_after=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f"Queued {updated} job(s) for retry")
@@ -0,0 +1,314 @@
+"""
+วัดความเร็วของทุก URL ที่มีชื่อใน ROOT_URLCONF รวม include() ทั้งหมด (manage.py bench)
+
+1. seed()       : สร้างข้อมูลจำลองตามจำนวนที่กำหนด (ผู้ใช้, โพสต์, รูป, รีวิว, การจอง)
+2. bench_routes(): ยิงทุก route ผ่าน test client ด้วย method จริงของ route
+                   ในนามผู้ใช้ที่เป็นนักศึกษา (route ของ staff ใช้ผู้ใช้ staff)
+                   วัด p50 / p95 ของเวลาตอบ, จำนวน query และหน่วยความจำสูงสุด (tracemalloc)
+3. failures()   : route ที่ตอบไม่ใช่ 2xx (หรือไม่ใช่ status ที่ route นั้นควรตอบ)
+4. compare()    : เทียบกับ baseline ที่บันทึกไว้ คืนรายการ route ที่ช้าลง / query เพิ่ม
+
+route ที่แก้ไขข้อมูลแบบย้อนไม่ได้ (ลบโพสต์) หรือต้องมี URL ที่เซ็นไว้จะถูกข้าม
+"""
+import math
+import random
+import time
+import tracemalloc
+from functools import partial
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.test import Client
+from django.urls import URLPattern, URLResolver, reverse
+
+from users.models import Profile
+
+from .models import Category, HiringPost, Media, Post, RentalPost, Review, Skill
+from .query_budget import QueryRecorder
+from .search import get_search_backend
+from .trigram import get_trigram_index
+
+# include() ที่ไม่วัดทั้ง namespace: แสดงในรายงานเป็น "<namespace>:*"
+SKIPPED_NAMESPACES = {
+    "admin": "Django admin",
+}
+
+# route ที่ไม่วัด: เหตุผลแสดงในรายงาน
+SKIPPED_ROUTES = {
+    "posts:delete_post": "ลบโพสต์ (ย้อนไม่ได้)",
+    "posts:direct_upload": "ต้องมี URL ที่เซ็นจาก upload ticket",
+    "media": "เสิร์ฟไฟล์จากดิสก์ ไม่ได้แตะฐานข้อมูล",
+    "logout": "ทำให้ client ที่ใช้วัด route อื่นหลุดจากระบบ",
+}
+
+# route ที่เปิดด้วย setting: ถ้าปิดอยู่ route ตอบ 404 จึงข้าม
+FEATURE_ROUTES = {
+    "posts:upload_ticket": "POSTS_DIRECT_UPLOADS",
+}
+
+# route ที่รับเฉพาะ POST: ข้อมูลที่ส่ง (route อื่นใช้ GET)
+POST_ROUTES = {
+    "posts:add_review": {"rating": 5, "comment": "bench"},
+    "posts:upload_ticket": {"content_type": "image/jpeg", "size": 100_000},
+}
+
+# route ที่เปิดได้เฉพาะ staff
+STAFF_ROUTES = {"posts:runtime_stats"}
+
+# status ที่ถูกต้องของ route ที่ไม่ตอบ 2xx (redirect หลังทำงานเสร็จ)
+# toggle_booking: สลับการจองทุกครั้งที่ยิง, add_review: ผู้ใช้รีวิวโพสต์ของตัวเองไม่ได้
+EXPECTED_STATUS = {
+    "posts:toggle_booking": 302,
+    "posts:add_review": 302,
+}
+
+# รายการ query string ของ route (หน้าค้นหาต้องมีคำค้น)
+QUERY_STRINGS = {
+    "posts:search": "?q=bench",
+    "posts:autocomplete": "?q=be",
+}
+
+
+def seed(users=200, posts=1000, media_per_post=3, reviews_per_post=5, bookings_per_user=10, random_seed=0):
+    """สร้างข้อมูลจำลอง คืนผู้ใช้ที่ใช้ยิง request (เจ้าของโพสต์และเป็นนักศึกษา)"""
+    rng = random.Random(random_seed)
+
+    # bulk_create ไม่ผ่าน signal ของ User จึงสร้าง Profile เอง (และไม่ต้อง hash รหัสผ่านทีละคน)
+    accounts = [
+        User(username=f"bench{i}", email=f"bench{i}@dome.tu.ac.th", password="!")
+        for i in range(users)
+    ]
+    User.objects.bulk_create(accounts)
+    accounts = list(User.objects.filter(username__startswith="bench").order_by("pk"))
+    # ผู้ใช้ staff สำหรับ STAFF_ROUTES (ไม่ได้เป็นเจ้าของ / ผู้รีวิวโพสต์ใด, Profile สร้างโดย signal)
+    staff = User.objects.create(username="bench_staff", email="staff@bench.local", password="!", is_staff=True)
+    Profile.objects.bulk_create(
+        [Profile(user=user, displayName=f"Bench {user.pk}") for user in accounts]
+    )
+
+    categories = Category.objects.bulk_create([Category(name=f"bench category {i}") for i in range(10)])
+    skills = Skill.objects.bulk_create([Skill(name=f"bench skill {i}") for i in range(10)])
+
+    # Post แบบสืบทอดหลายตาราง bulk_create ไม่ได้ ต้องสร้างทีละแถว
+    post_ids = []
+    for i in range(posts):
+        author = accounts[0] if i % 10 == 0 else rng.choice(accounts)
+        if i % 2:
+            post = RentalPost.objects.create(
+                author=author, title=f"bench rental {i}", description="bench " * 20, pricePerDay=rng.randint(50, 500)
+            )
+        else:
+            post = HiringPost.objects.create(
+                author=author, title=f"bench hiring {i}", description="bench " * 20, budgetMin=500, budgetMax=2000
+            )
+        post_ids.append(post.pk)
+
+    Post.categories.through.objects.bulk_create(
+        [Post.categories.through(post_id=post_id, category=rng.choice(categories)) for post_id in post_ids]
+    )
+    HiringPost.skills.through.objects.bulk_create(
+        [
+            HiringPost.skills.through(hiringpost_id=post_id, skill=rng.choice(skills))
+            for post_id in HiringPost.objects.filter(pk__in=post_ids).values_list("pk", flat=True)
+        ]
+    )
+
+    Media.objects.bulk_create(
+        [
+            Media(post_id=post_id, image=f"media_images/bench/{post_id}_{j}.jpg")
+            for post_id in post_ids
+            for j in range(media_per_post)
+        ],
+        batch_size=1000,
+    )
+    Post.objects.filter(pk__in=post_ids).refresh_cover_image()
+
+    Review.objects.bulk_create(
+        [
+            Review(post_id=post_id, author=reviewer, rating=rng.randint(1, 5), comment="bench")
+            for post_id in post_ids
+            for reviewer in rng.sample(accounts[1:], min(reviews_per_post, len(accounts) - 1))
+        ],
+        batch_size=1000,
+    )
+    _recount_reviews(post_ids)
+
+    Post.bookings.through.objects.bulk_create(
+        [
+            Post.bookings.through(post_id=post_id, user=user)
+            for user in accounts
+            for post_id in rng.sample(post_ids, min(bookings_per_user, len(post_ids)))
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    # tag ถูกเพิ่มแบบ bulk (ไม่มี m2m_changed) จึงสร้าง index ใหม่ทั้งหมดครั้งเดียว
+    get_search_backend().rebuild()
+    get_trigram_index().rebuild()
+    cache.clear()
+    return accounts[0]
+
+
+def _recount_reviews(post_ids):
+    # ตัวนับรีวิวบนแถว Post (ปกติ signal เป็นคนอัปเดต) ใน UPDATE เดียว
+    reviews = Review.objects.filter(post_id=OuterRef("pk")).order_by().values("post_id")
+    Post.objects.filter(pk__in=post_ids).update(
+        review_count=Coalesce(Subquery(reviews.annotate(n=Count("id")).values("n")), Value(0)),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum("rating")).values("total")), Value(0), output_field=IntegerField()
+        ),
+    )
+
+
+def named_routes(urlconf=None, namespace=None):
+    """
+    คืน [(ชื่อเต็ม เช่น "posts:hiring", URLPattern)] ของทุก route ที่มีชื่อ
+    ไล่เข้าไปใน include() ทุกชั้น ยกเว้น namespace ใน SKIPPED_NAMESPACES
+    """
+    module = import_module(urlconf or settings.ROOT_URLCONF)
+    return _walk(module.urlpatterns, namespace)
+
+
+def _walk(patterns, namespace):
+    routes = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            inner = f"{namespace}:{pattern.namespace}" if namespace and pattern.namespace else pattern.namespace or namespace
+            routes.extend(_walk(pattern.url_patterns, inner))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            routes.append((f"{namespace}:{pattern.name}" if namespace else pattern.name, pattern))
+    return routes
+
+
+def route_kwargs(pattern, user, post):
+    """สร้าง kwargs ของ URL จากชื่อพารามิเตอร์ คืน None ถ้าไม่รู้จักพารามิเตอร์"""
+    values = {"post_id": post.pk, "username": user.username}
+    names = pattern.pattern.regex.groupindex
+    if any(name not in values for name in names):
+        return None
+    return {name: values[name] for name in names}
+
+
+def percentile(samples, fraction):
+    """percentile แบบ nearest-rank"""
+    ordered = sorted(samples)
+    index = min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1
+    return ordered[index]
+
+
+def bench_routes(user, iterations=20, warmup=2, only=None):
+    """
+    วัดทุก route คืน {ชื่อ route: ผลการวัด} ผลที่ข้ามมี "skipped" แทนตัวเลข
+    เวลาเป็นมิลลิวินาที หน่วยความจำเป็น KiB
+    """
+    client = Client()
+    client.force_login(user)
+    staff = User.objects.filter(is_staff=True, is_active=True).order_by("pk").first()
+    staff_client = None
+    if staff is not None:
+        staff_client = Client()
+        staff_client.force_login(staff)
+    post = Post.objects.filter(author=user).order_by("-review_count", "pk").first()
+
+    results = {f"{namespace}:*": {"skipped": reason} for namespace, reason in SKIPPED_NAMESPACES.items()}
+    for name, pattern in named_routes():
+        if only and name not in only:
+            continue
+        if name in SKIPPED_ROUTES:
+            results[name] = {"skipped": SKIPPED_ROUTES[name]}
+            continue
+        if name in FEATURE_ROUTES and not getattr(settings, FEATURE_ROUTES[name], False):
+            results[name] = {"skipped": f"ปิดอยู่ ({FEATURE_ROUTES[name]})"}
+            continue
+        kwargs = route_kwargs(pattern, user, post)
+        if kwargs is None:
+            results[name] = {"skipped": "ไม่รู้จักพารามิเตอร์ของ URL"}
+            continue
+        route_client = client
+        if name in STAFF_ROUTES:
+            if staff_client is None:
+                results[name] = {"skipped": "ไม่มีผู้ใช้ staff"}
+                continue
+            route_client = staff_client
+
+        url = reverse(name, kwargs=kwargs) + QUERY_STRINGS.get(name, "")
+        if name in POST_ROUTES:
+            request = partial(route_client.post, url, POST_ROUTES[name])
+        else:
+            request = partial(route_client.get, url)
+        results[name] = _measure(request, iterations, warmup)
+    if only:
+        results = {name: result for name, result in results.items() if name in only}
+    return results
+
+
+def _measure(request, iterations, warmup):
+    for _ in range(warmup):
+        request()
+
+    timings = []
+    queries = []
+    statuses = set()
+    for _ in range(iterations):
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(recorder.count)
+        statuses.add(response.status_code)
+
+    # tracemalloc ทำให้ช้าลงมาก จึงวัดหน่วยความจำแยกอีกรอบเดียว
+    tracemalloc.start()
+    try:
+        request()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # status ที่ไม่ปกติที่สุดในรอบที่วัด (ถ้าพลาดแค่บางครั้งก็ต้องเห็น)
+    return {
+        "status": max(statuses),
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "queries": max(queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def failures(results):
+    """คืนรายการข้อความของ route ที่ตอบไม่ใช่ 2xx หรือไม่ใช่ EXPECTED_STATUS ของ route นั้น"""
+    failed = []
+    for name, result in results.items():
+        if "skipped" in result:
+            continue
+        expected = EXPECTED_STATUS.get(name)
+        ok = result["status"] == expected if expected else 200 <= result["status"] < 300
+        if not ok:
+            failed.append(f"{name}: status {result['status']}" + (f" (expected {expected})" if expected else ""))
+    return failed
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    คืนรายการข้อความของ route ที่แย่กว่า baseline
+    - p95 / หน่วยความจำเกิน baseline มากกว่า tolerance (สัดส่วน)
+    - จำนวน query มากกว่า baseline (ไม่มีค่าเผื่อ: query เพิ่ม = มี N+1 ใหม่)
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if "skipped" in result or not previous or "skipped" in previous:
+            continue
+        if result["queries"] > previous["queries"]:
+            regressions.append(f"{name}: queries {previous['queries']} -> {result['queries']}")
+        for key, label in (("p95_ms", "p95"), ("peak_kib", "peak memory")):
+            if result[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {label} {previous[key]} -> {result[key]}")
+    return regressions
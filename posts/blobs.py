@@ -0,0 +1,98 @@
+"""
+เก็บไฟล์รูปแบบ content-addressed (หนึ่งไฟล์ต่อหนึ่งเนื้อหา)
+
+- content_hash()        : SHA-256 ของไฟล์ ใช้เป็นตัวระบุ MediaBlob
+- claim_blobs()         : บันทึก blob ที่ยังไม่มี แล้วเพิ่ม ref_count ให้ Media ที่จะสร้าง
+- release_blob()        : ลด ref_count เมื่อ Media ถูกลบ ถ้าเหลือ 0 จะลบ blob และไฟล์ทิ้ง
+- delete_unreferenced() : ลบไฟล์ที่ไม่มี blob ไหนอ้างถึง (ไฟล์ซ้ำ / งานที่ล้มเหลว)
+                          ไฟล์ที่ลบไม่สำเร็จจะถูกบันทึกไว้ให้ gc_media ลองใหม่ (posts/gc.py)
+
+การเขียนไฟล์และสร้าง variants อยู่ใน posts/images.py
+"""
+import hashlib
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .gc import log_deleted_files
+from .models import Media, MediaBlob
+
+
+def _storage():
+    return Media._meta.get_field("image").storage
+
+
+def content_hash(file):
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def find_blobs(digests):
+    """คืน {sha256: MediaBlob (ยังไม่ save)} ของไฟล์ที่เคยเก็บไว้แล้ว"""
+    rows = MediaBlob.objects.filter(sha256__in=set(digests)).values(
+        "sha256", "size", *MediaBlob.FILE_FIELDS
+    )
+    return {row["sha256"]: MediaBlob(**row) for row in rows}
+
+
+def claim_blobs(digests, blobs):
+    """
+    เพิ่ม ref_count ของ blob ตาม digests (หนึ่งครั้งต่อหนึ่ง Media, ซ้ำกันได้)
+    แล้วคืน MediaBlob ที่บันทึกแล้วตามลำดับของ digests
+    blobs = {sha256: MediaBlob ที่ยังไม่ save} ของทุก digest ต้องเรียกภายใน transaction.atomic
+    """
+    # แถวที่มีอยู่แล้ว (หรือ request อื่นเพิ่งบันทึกไฟล์เดียวกันไป) จะถูกข้าม
+    MediaBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+    saved = MediaBlob.objects.select_for_update().in_bulk(blobs, field_name="sha256")
+
+    # blob ที่ถูกอ้างถึงจำนวนครั้งเท่ากัน อัปเดตด้วยคำสั่งเดียวกัน
+    counts = Counter(digests)
+    for count in set(counts.values()):
+        pks = [saved[digest].pk for digest, n in counts.items() if n == count]
+        MediaBlob.objects.filter(pk__in=pks).update(ref_count=F("ref_count") + count)
+    return [saved[digest] for digest in digests]
+
+
+def release_blob(blob_id):
+    """
+    Media ที่อ้างถึง blob ถูกลบไปหนึ่งแถว
+    ถ้าเป็นแถวสุดท้าย จะลบ blob และไฟล์ทั้งหมดของมันหลัง transaction commit
+    """
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            MediaBlob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") - 1)
+            return
+        blob.delete()
+
+    # ตรวจซ้ำตอนลบไฟล์: ระหว่างนี้อาจมีคนอัปโหลดรูปเดิมกลับมาใช้ชื่อไฟล์เดิม
+    names = blob.file_names()
+    transaction.on_commit(lambda: delete_unreferenced(names))
+
+
+def delete_unreferenced(names):
+    """ลบไฟล์ใน names ที่ไม่มี MediaBlob ไหนอ้างถึง"""
+    names = set(filter(None, names))
+    if not names:
+        return
+
+    query = Q()
+    for field in MediaBlob.FILE_FIELDS:
+        query |= Q(**{f"{field}__in": names})
+    for row in MediaBlob.objects.filter(query).values_list(*MediaBlob.FILE_FIELDS):
+        names.difference_update(row)
+
+    storage = _storage()
+    failed = []
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            failed.append(name)
+    log_deleted_files(failed)
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Post
+
+
+def _cache_key(user_id):
+    return f"posts:bookmarks:{user_id}"
+
+
+def _cache_timeout():
+    # 0 = ไม่ใช้ cache ข้าม request (ค่าเริ่มต้น)
+    # ควรเปิดเมื่อใช้ cache ที่แชร์กันทุก worker เท่านั้น เช่น Redis/Memcached
+    return getattr(settings, "POSTS_BOOKMARK_CACHE_TIMEOUT", 0)
+
+
+def get_booked_post_ids(request):
+    """
+    คืน set ของ id โพสต์ที่ผู้ใช้คนนี้จองไว้
+    โหลดจากตาราง through ของ Post.bookings ด้วย query เดียวต่อ request
+    แล้วเก็บไว้บน request เพื่อให้ view/template เช็คใน memory ได้
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return set()
+
+    booked_ids = getattr(request, "_booked_post_ids", None)
+    if booked_ids is not None:
+        return booked_ids
+
+    timeout = _cache_timeout()
+    if timeout:
+        booked_ids = cache.get(_cache_key(user.pk))
+
+    if booked_ids is None:
+        booked_ids = set(
+            Post.bookings.through.objects.filter(user_id=user.pk).values_list(
+                "post_id", flat=True
+            )
+        )
+        if timeout:
+            cache.set(_cache_key(user.pk), booked_ids, timeout)
+
+    request._booked_post_ids = set(booked_ids)
+    return request._booked_post_ids
+
+
+def invalidate_booked_post_ids(user_id):
+    # ลบ cache ข้าม request ของผู้ใช้คนนี้ (เรียกทุกครั้งที่ bookings เปลี่ยน)
+    cache.delete(_cache_key(user_id))
+
+
+def toggle_booking(request, post):
+    """
+    จอง / ยกเลิกการจองโพสต์ แล้วอัปเดต set ของ request นี้ให้ตรงกันทันที
+    คืนค่า True ถ้าหลังจากนี้โพสต์ถูกจองอยู่
+    """
+    booked_ids = get_booked_post_ids(request)
+
+    if post.pk in booked_ids:
+        post.bookings.remove(request.user)  # ถ้ามีแล้ว ให้ลบออก (Un-book)
+        booked_ids.discard(post.pk)
+    else:
+        post.bookings.add(request.user)  # ถ้ายังไม่มี ให้เพิ่ม (Book)
+        booked_ids.add(post.pk)
+
+    # การลบ cache ข้าม request ทำใน signal m2m_changed (posts/signals.py)
+    return post.pk in booked_ids
@@ -0,0 +1,135 @@
+"""
+Cache ของ HTML การ์ดโพสต์ (ใช้กับ {% card_cache %} ใน posts/templatetags/post_cards.py)
+
+การ์ดแต่ละใบถูก cache ด้วย key (ชื่อ fragment, post id, version)
+version ของโพสต์เก็บไว้ใน cache และถูกเปลี่ยนโดย signal (posts/signals.py)
+ทุกครั้งที่โพสต์ถูกแก้ไข/ลบ, มีรูปเพิ่ม หรือรีวิวเปลี่ยน
+fragment เดิมจึงไม่ถูกใช้อีกโดยไม่ต้องตามลบทีละ template
+
+view อ่าน version และ HTML ของการ์ดทั้งหน้าด้วย get_many (attach_card_versions)
+tag จึงไม่ต้องยิง cache ทีละการ์ด นอกจากตอนเขียนการ์ดที่ยังไม่มีใน cache
+
+ส่วนที่ขึ้นกับผู้ชม (เช่น ปุ่ม Bookmark) และ URL รูปภาพ ต้องอยู่นอกบล็อก {% card_cache %}
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _version_key(post_id):
+    return f"posts:card_version:{post_id}"
+
+
+def card_cache_timeout():
+    # 0 = ไม่ cache การ์ด (ค่าเริ่มต้น)
+    # ควรเปิดเมื่อใช้ cache ที่แชร์กันทุก worker เท่านั้น เพราะ version ต้องเห็นตรงกัน
+    return getattr(settings, "POSTS_CARD_CACHE_TIMEOUT", 0)
+
+
+def _fragment_key(fragment, post_id, version):
+    return f"posts:card:{fragment}:{post_id}:{version}"
+
+
+def bump_card_version(post_id):
+    # version ใหม่ที่ไม่ซ้ำของเดิม (ไม่ใช้ incr เพราะ key อาจหายไปจาก cache แล้ว)
+    cache.set(_version_key(post_id), time.time_ns(), None)
+
+
+def attach_card_versions(items, fragment):
+    """
+    เติม item["card_version"], item["card_key"] และ item["card_html"] (None ถ้ายังไม่มีใน cache)
+    ให้การ์ด (dict จาก _format_post_data) ทุกใบ สำหรับ {% card_cache item %}
+    fragment คือชื่อของส่วนที่ cache (template ต่างกันต้องใช้ชื่อต่างกัน)
+    อ่าน version แล้วอ่าน HTML ของทั้งหน้าด้วย get_many อย่างละครั้ง
+    """
+    if not card_cache_timeout() or not items:
+        return items
+
+    keys = {_version_key(item["id"]): item for item in items}
+    versions = cache.get_many(keys)
+
+    # โพสต์ที่ยังไม่มี version (หรือถูก evict ไป) ได้ version ใหม่
+    # fragment เก่าที่อาจค้างอยู่จึงไม่ถูกนำกลับมาใช้
+    missing = {}
+    for key, item in keys.items():
+        version = versions.get(key)
+        if version is None:
+            version = missing[key] = time.time_ns()
+        item["card_version"] = version
+
+    if missing:
+        cache.set_many(missing, None)
+
+    for item in items:
+        item["card_key"] = _fragment_key(fragment, item["id"], item["card_version"])
+    fragments = cache.get_many([item["card_key"] for item in items])
+    for item in items:
+        item["card_html"] = fragments.get(item["card_key"])
+    return items
+
+
+# ---------------------------------------------------------------
+# Home feed: ข้อมูลการ์ดล่าสุดของหน้าแรก
+# ---------------------------------------------------------------
+HOME_FEED_KEY = "posts:home_feed"
+HOME_FEED_STALE_KEY = "posts:home_feed:stale"
+HOME_FEED_LOCK_KEY = "posts:home_feed:lock"
+
+# เวลาสูงสุดที่ worker หนึ่งจะถือสิทธิ์สร้าง feed ใหม่ (วินาที)
+HOME_FEED_LOCK_TIMEOUT = 10
+
+
+def home_feed_timeout():
+    # 0 = ไม่ cache (ค่าเริ่มต้น) เงื่อนไขเดียวกับ POSTS_CARD_CACHE_TIMEOUT
+    # ถ้าใช้ S3 แบบ signed URL ควรตั้งให้สั้นกว่าอายุของ URL รูปภาพ
+    return getattr(settings, "POSTS_HOME_FEED_CACHE_TIMEOUT", 0)
+
+
+def _feed_post_ids(feed):
+    return {item["id"] for items in feed.values() for item in items}
+
+
+def get_home_feed(build):
+    """
+    คืนข้อมูลหน้าแรกจาก cache ถ้าไม่มีจะเรียก build() เพื่อสร้างใหม่
+
+    กัน cache stampede: เมื่อ cache หมดอายุหรือถูกลบ จะมีเพียง request เดียว
+    (ที่ได้ lock จาก cache.add) เป็นคนสร้างใหม่ request อื่นระหว่างนั้น
+    จะได้ข้อมูลชุดก่อนหน้า (stale) ไปแสดงแทนการยิง query พร้อมกัน
+    """
+    timeout = home_feed_timeout()
+    if not timeout:
+        return build()
+
+    feed = cache.get(HOME_FEED_KEY)
+    if feed is not None:
+        return feed
+
+    if not cache.add(HOME_FEED_LOCK_KEY, True, HOME_FEED_LOCK_TIMEOUT):
+        stale = cache.get(HOME_FEED_STALE_KEY)
+        if stale is not None:
+            return stale
+        # ยังไม่เคยมีข้อมูลเลย (เช่น เพิ่ง deploy) ให้สร้างเองโดยไม่เขียน cache
+        return build()
+
+    try:
+        feed = build()
+        # ชุด stale อยู่นานกว่าปกติ เพื่อใช้ระหว่างที่มีคนกำลังสร้างชุดใหม่
+        cache.set(HOME_FEED_KEY, feed, timeout)
+        cache.set(HOME_FEED_STALE_KEY, feed, timeout * 2)
+    finally:
+        cache.delete(HOME_FEED_LOCK_KEY)
+    return feed
+
+
+def invalidate_home_feed(post_id=None):
+    """
+    ลบ feed หน้าแรกออกจาก cache (ชุด stale ยังเก็บไว้)
+    ถ้าระบุ post_id จะลบเฉพาะเมื่อโพสต์นั้นแสดงอยู่บนหน้าแรก
+    """
+    if post_id is not None:
+        feed = cache.get(HOME_FEED_KEY)
+        if feed is None or post_id not in _feed_post_ids(feed):
+            return
+    cache.delete(HOME_FEED_KEY)
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+from .bookmarks import get_booked_post_ids
+
+
+def bookmarks(request):
+    # ให้ template เช็ค {% if post.id in booked_post_ids %} ได้
+    # โหลดแบบ lazy: ถ้า template ไม่ได้ใช้ จะไม่มี query เกิดขึ้น
+    return {
+        "booked_post_ids": SimpleLazyObject(lambda: get_booked_post_ids(request)),
+    }
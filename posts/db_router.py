@@ -0,0 +1,90 @@
+"""
+ส่ง query อ่านของหน้าที่อ่านอย่างเดียวไปยัง read replica (settings.DATABASE_REPLICA_URL)
+
+- PrimaryReplicaRouter     : เขียนที่ "default" เสมอ อ่านจาก "replica" เฉพาะเมื่อ middleware อนุญาต
+- ReplicaRoutingMiddleware : อนุญาตให้อ่านจาก replica เฉพาะ request GET/HEAD ที่ไปยัง view
+                             ของ posts / users / pages และผู้ใช้ไม่ได้เพิ่งเขียนข้อมูล
+                             (ยกเว้น view ใน PRIMARY_VIEWS)
+
+replica ตามหลัง primary เล็กน้อย หลังผู้ใช้เขียนข้อมูล (ส่งรีวิว, กดจอง ฯลฯ) จึงตั้ง cookie
+ให้ request ถัดไปของผู้ใช้คนนั้นอ่านจาก primary ต่ออีก DATABASE_REPLICA_STICKY_SECONDS วินาที
+เช่น หน้าที่ redirect กลับมาหลัง add_review_view / toggle_booking_view จะเห็นข้อมูลที่เพิ่งเขียน
+
+นอก request (worker, management command) อ่านจาก primary เสมอ
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_ALIAS = "replica"
+PRIMARY_ALIAS = "default"
+STICKY_COOKIE = "db_primary"
+
+# app ที่ view แบบ GET/HEAD อ่านจาก replica ได้
+REPLICA_APPS = ("posts", "users", "pages")
+
+# view ที่เขียนข้อมูลจาก request GET: อ่านก่อนเขียน (เช่น การจองปัจจุบัน) ต้องเป็นข้อมูลล่าสุด
+PRIMARY_VIEWS = {
+    "posts.views.toggle_booking_view",
+    "posts.views.delete_post_view",
+}
+
+# สถานะของ request ปัจจุบัน: {"replica": bool, "wrote": bool} หรือ None นอก request
+_state = ContextVar("db_router_state", default=None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state and state["replica"] and not state["wrote"]:
+            return REPLICA_ALIAS
+        return PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # หลังเขียนแล้ว ส่วนที่เหลือของ request ต้องอ่านจาก primary ด้วย
+            state["wrote"] = True
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica เป็นสำเนาของ default ทั้งหมด object จากสองฝั่งจึงอ้างถึงกันได้
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {"replica": False, "wrote": False}
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state["wrote"] or request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None:
+            return None
+        state["replica"] = (
+            request.method in ("GET", "HEAD")
+            and STICKY_COOKIE not in request.COOKIES
+            and view_func.__module__.split(".")[0] in REPLICA_APPS
+            and f"{view_func.__module__}.{view_func.__name__}" not in PRIMARY_VIEWS
+        )
+        return None
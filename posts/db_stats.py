@@ -0,0 +1,64 @@
+"""
+สถิติการใช้ connection ฐานข้อมูลของ process นี้ (settings.DATABASE_CONN_MODE)
+
+- requests   : จำนวน request ที่ process นี้รับไปแล้ว
+- connects   : จำนวนครั้งที่ Django เปิด connection (โหมด pool = ยืมจาก pool)
+- reuse_rate : สัดส่วน request ที่ไม่ต้อง connect ใหม่ (โหมดเดิมจะใกล้ 0)
+- pool       : สถิติจาก psycopg_pool (connections_num = connection จริงที่เปิด)
+
+แสดงผ่าน runtime_stats_view (เฉพาะ staff) ค่าเป็นของ worker ที่ตอบ request นั้น
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_requests = 0
+_connects = Counter()
+
+
+@receiver(request_started)
+def _count_request(**kwargs):
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+@receiver(connection_created)
+def _count_connect(connection, **kwargs):
+    with _lock:
+        _connects[connection.alias] += 1
+
+
+def reset_connection_stats():
+    global _requests
+    with _lock:
+        _requests = 0
+        _connects.clear()
+
+
+def connection_stats():
+    with _lock:
+        requests = _requests
+        connects = dict(_connects)
+
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        count = connects.get(alias, 0)
+        entry = {
+            "mode": settings.DATABASE_CONN_MODE or "per-request",
+            "requests": requests,
+            "connects": count,
+            "reuse_rate": max(0.0, 1 - count / requests) if requests else 0.0,
+        }
+        pool = connection.pool if connection.vendor == "postgresql" else None
+        if pool is not None:
+            entry["pool"] = pool.get_stats()
+        stats[alias] = entry
+    return stats
@@ -0,0 +1,165 @@
+"""
+เก็บกวาดไฟล์ใน storage ที่ไม่มีแถวไหนในฐานข้อมูลอ้างถึงแล้ว (manage.py gc_media)
+
+ไฟล์ถือว่ายังถูกใช้ถ้ามีชื่ออยู่ใน Media / MediaBlob (รูปต้นฉบับและ variants)
+หรือ Profile (รูปโปรไฟล์และ avatar)
+
+- log_deleted_files() : signal บันทึกชื่อไฟล์ที่อาจกลายเป็นขยะลง DeletedFile
+- collect_logged()    : โหมด incremental ตรวจเฉพาะไฟล์ใน log (เร็ว รันบ่อยได้)
+- collect_storage()   : โหมด full ไล่ทุกไฟล์ใต้ MEDIA_PREFIXES (ไฟล์ค้างจากก่อนมี log,
+                        อัปโหลดตรงที่ไม่ได้ส่งฟอร์ม ฯลฯ)
+- delete_files()      : ลบเป็นชุด S3 ใช้ DeleteObjects ครั้งละไม่เกิน 1000 key
+"""
+import posixpath
+
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import Profile
+
+from .models import DeletedFile, Media, MediaBlob
+from .uploads import is_s3_storage
+
+MEDIA_PREFIXES = ("media_images", "profile_images")
+
+# จำนวน key สูงสุดต่อหนึ่งคำสั่ง DeleteObjects ของ S3
+S3_DELETE_LIMIT = 1000
+
+# model -> ฟิลด์ที่เก็บชื่อไฟล์ (Media ใช้ชื่อฟิลด์เดียวกับ MediaBlob)
+FILE_REFERENCES = (
+    (Media, MediaBlob.FILE_FIELDS),
+    (MediaBlob, MediaBlob.FILE_FIELDS),
+    (Profile, Profile.FILE_FIELDS),
+)
+
+
+def _storage():
+    return Media._meta.get_field("image").storage
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def log_deleted_files(names):
+    names = [name for name in names if name]
+    if names:
+        DeletedFile.objects.bulk_create([DeletedFile(name=name) for name in names])
+
+
+def referenced_names(names):
+    """คืนชื่อไฟล์ใน names ที่ยังมีแถวอ้างถึง (หนึ่ง query ต่อ model)"""
+    names = set(names)
+    found = set()
+    for model, fields in FILE_REFERENCES:
+        query = Q()
+        for field in fields:
+            query |= Q(**{f"{field}__in": names})
+        for row in model.objects.filter(query).values_list(*fields):
+            found.update(row)
+    return found & names
+
+
+def delete_files(names, batch_size=S3_DELETE_LIMIT):
+    """ลบไฟล์ทั้งหมดใน names เป็นชุด คืนลิสต์ชื่อไฟล์ที่ลบสำเร็จ"""
+    storage = _storage()
+    names = list(names)
+    deleted = []
+
+    if is_s3_storage(storage):
+        for batch in _chunks(names, min(batch_size, S3_DELETE_LIMIT)):
+            keys = {_s3_key(storage, name): name for name in batch}
+            # ไม่ใช้ Quiet: ต้องรู้ว่า key ไหนลบสำเร็จ (key ที่อยู่ใน Errors ยังค้างอยู่ใน bucket)
+            response = storage.bucket.delete_objects(
+                Delete={"Objects": [{"Key": key} for key in keys], "Quiet": False}
+            )
+            deleted += [keys[item["Key"]] for item in response.get("Deleted", []) if item["Key"] in keys]
+        return deleted
+
+    for batch in _chunks(names, batch_size):
+        for name in batch:
+            storage.delete(name)
+        deleted += batch
+    return deleted
+
+
+def _s3_key(storage, name):
+    return posixpath.join(storage.location, name) if storage.location else name
+
+
+def collect_logged(batch_size=S3_DELETE_LIMIT, dry_run=False):
+    """
+    ตรวจไฟล์ใน DeletedFile ทีละชุด ลบไฟล์ที่ไม่มีใครอ้างถึงแล้วและลบแถว log ที่ตรวจแล้ว
+    แถวของไฟล์ที่ลบไม่สำเร็จถูกเก็บไว้ให้รอบถัดไปลองใหม่
+    yield ลิสต์ชื่อไฟล์ที่ลบ (หรือจะลบ ถ้า dry_run) ของแต่ละชุด
+    """
+    last_pk = 0
+    while True:
+        entries = list(
+            DeletedFile.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "name")[:batch_size]
+        )
+        if not entries:
+            return
+        last_pk = entries[-1][0]
+
+        names = {name for _, name in entries}
+        orphans = sorted(names - referenced_names(names))
+        if dry_run:
+            yield orphans
+            continue
+
+        deleted = delete_files(orphans, batch_size)
+        failed = set(orphans) - set(deleted)
+        DeletedFile.objects.filter(pk__in=[pk for pk, name in entries if name not in failed]).delete()
+        yield deleted
+
+
+def collect_storage(min_age, batch_size=S3_DELETE_LIMIT, dry_run=False):
+    """
+    ไล่ทุกไฟล์ใน storage ที่เก่ากว่า min_age (timedelta)
+    ไฟล์ที่ใหม่กว่านั้นอาจยังอยู่ระหว่างอัปโหลด / ยังไม่ได้บันทึกแถว จึงถูกข้าม
+    yield ลิสต์ชื่อไฟล์ที่ลบ (หรือจะลบ ถ้า dry_run) ของแต่ละชุด
+    """
+    older_than = timezone.now() - min_age
+    batch = []
+    for name in _iter_storage_files(_storage(), older_than):
+        batch.append(name)
+        if len(batch) >= batch_size:
+            yield _collect_batch(batch, batch_size, dry_run)
+            batch = []
+    if batch:
+        yield _collect_batch(batch, batch_size, dry_run)
+
+
+def _collect_batch(names, batch_size, dry_run):
+    orphans = sorted(set(names) - referenced_names(names))
+    if dry_run:
+        return orphans
+    return delete_files(orphans, batch_size)
+
+
+def _iter_storage_files(storage, older_than):
+    if is_s3_storage(storage):
+        # list ทีละ 1000 key ด้วย paginator ของ boto3 ไม่ต้อง listdir ทีละโฟลเดอร์
+        prefix_length = len(storage.location) + 1 if storage.location else 0
+        for prefix in MEDIA_PREFIXES:
+            for obj in storage.bucket.objects.filter(Prefix=_s3_key(storage, prefix) + "/"):
+                if obj.last_modified < older_than:
+                    yield obj.key[prefix_length:]
+        return
+
+    for prefix in MEDIA_PREFIXES:
+        yield from _walk(storage, prefix, older_than)
+
+
+def _walk(storage, path, older_than):
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for file_name in files:
+        name = f"{path}/{file_name}"
+        if storage.get_modified_time(name) < older_than:
+            yield name
+    for directory in directories:
+        yield from _walk(storage, f"{path}/{directory}", older_than)
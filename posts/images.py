@@ -0,0 +1,283 @@
+"""
+สร้างรูปย่อ (variants) ของรูปที่อัปโหลดให้โพสต์ด้วย Pillow
+
+- thumbnail  : JPEG สี่เหลี่ยมจัตุรัสขนาดเล็ก (ใช้ในหน้า admin)
+- card_image : JPEG ขนาดการ์ด (ใช้ในหน้า listing ทุกหน้า)
+- card_webp  : WebP ขนาดการ์ด (เบราว์เซอร์ที่รองรับจะโหลดไฟล์นี้แทน JPEG)
+
+หน้า detail_post ยังใช้รูปต้นฉบับ (Media.image) เหมือนเดิม
+
+ไฟล์ทั้งชุดเก็บแบบ content-addressed ผ่าน MediaBlob (posts/blobs.py)
+รูปที่เนื้อไฟล์ซ้ำกับรูปที่เคยอัปโหลดแล้ว จะใช้ไฟล์เดิมโดยไม่เขียนลง storage อีก
+"""
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .blobs import claim_blobs, content_hash, delete_unreferenced, find_blobs
+from .jobs import enqueue
+from .models import Media, MediaBlob
+from .signals import media_changed
+from .uploads import UPLOAD_PREFIX
+
+THUMBNAIL_SIZE = (160, 160)
+
+# การ์ดสูงไม่เกิน 280px และกว้างราว 300-400px ในหน้า listing
+# เผื่อจอความละเอียดสูง (2x) จึงย่อให้ไม่เกิน 640x480 โดยคงสัดส่วนเดิม
+CARD_SIZE = (640, 480)
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+VARIANT_FIELDS = ("thumbnail", "card_image", "card_webp")
+
+
+def encode_image(image, format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def open_image(source):
+    """
+    เปิดรูปจากไฟล์ที่อัปโหลดหรือ FieldFile แล้วคืน Image แบบ RGB
+    คืน None ถ้าไฟล์ไม่ใช่รูปที่ Pillow อ่านได้
+    """
+    try:
+        source.seek(0)
+        with Image.open(source) as image:
+            image.load()
+            image = ImageOps.exif_transpose(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        source.seek(0)
+
+    # JPEG ไม่มีช่อง alpha: วางรูปโปร่งใสบนพื้นขาว
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_variants(media, source=None, stem=None):
+    """
+    สร้างไฟล์ variants ทั้งหมดของ media แล้วกำหนดให้ฟิลด์ (ยังไม่ save แถว Media)
+    source = ไฟล์ต้นฉบับที่อ่านได้ (ถ้าไม่ระบุจะเปิดจาก media.image)
+    stem   = ชื่อไฟล์ variants (ถ้าไม่ระบุจะใช้ชื่อไฟล์ต้นฉบับ)
+    คืน True ถ้าสร้างสำเร็จ / False ถ้าไม่มีรูปหรือไฟล์ไม่ใช่รูปภาพ
+    """
+    if source is None:
+        if not media.image:
+            return False
+        try:
+            with media.image.open("rb") as source:
+                image = open_image(source)
+        except (OSError, ValueError):
+            return False
+    else:
+        image = open_image(source)
+    if image is None:
+        return False
+
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(source.name or "image"))[0]
+
+    thumbnail = ImageOps.fit(image, THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    card = image.copy()
+    card.thumbnail(CARD_SIZE, Image.Resampling.LANCZOS)
+
+    media.thumbnail.save(
+        f"{stem}_thumb.jpg",
+        encode_image(thumbnail, "JPEG", quality=JPEG_QUALITY, optimize=True),
+        save=False,
+    )
+    media.card_image.save(
+        f"{stem}_card.jpg",
+        encode_image(card, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True),
+        save=False,
+    )
+    media.card_webp.save(
+        f"{stem}_card.webp",
+        encode_image(card, "WEBP", quality=WEBP_QUALITY, method=4),
+        save=False,
+    )
+    return True
+
+
+def attach_images(post, files):
+    """
+    สร้าง Media ให้ post จากไฟล์ที่อัปโหลด พร้อม variants ของแต่ละรูป
+    ไฟล์ที่ไม่ใช่รูปภาพยังถูกเก็บเป็น Media ตามเดิม แต่จะไม่มี variants
+    (หน้า listing จะใช้รูปต้นฉบับแทน)
+
+    ถ้าเปิด settings.POSTS_MEDIA_ASYNC จะส่งงานให้ worker ทำแทน (queue_images)
+    """
+    if getattr(settings, "POSTS_MEDIA_ASYNC", False):
+        return queue_images(post, files)
+    if not files:
+        return []
+    return _persist(post, files)
+
+
+def attach_uploaded(post, keys):
+    """
+    สร้าง Media จากไฟล์ที่เบราว์เซอร์อัปโหลดเข้า storage เองแล้ว (posts/uploads.py)
+    key ต้องผ่าน verify_upload_tokens มาก่อน
+    ไฟล์ใหม่ใช้ key เดิมเป็นรูปต้นฉบับ (ไม่คัดลอก) ส่วนไฟล์ที่ซ้ำของเดิมจะถูกลบทิ้ง
+    """
+    if not keys:
+        return []
+
+    if getattr(settings, "POSTS_MEDIA_ASYNC", False):
+        return _queue_variants(post, keys)
+
+    storage = Media._meta.get_field("image").storage
+    sources = [storage.open(key, "rb") for key in keys]
+    try:
+        return _persist(post, sources, stored_names=keys)
+    finally:
+        for source in sources:
+            source.close()
+
+
+def _persist(post, sources, stored_names=None):
+    """
+    เขียนไฟล์ที่ยังไม่เคยเก็บลง storage (หลาย thread, ไม่แตะฐานข้อมูล)
+    แล้ว INSERT Media ทุกแถวในคำสั่งเดียว เรียงตามลำดับที่อัปโหลด
+    """
+    media_list = [Media(post=post) for _ in sources]
+    digests, blobs, written = _prepare_blobs(sources, stored_names)
+    try:
+        with transaction.atomic():
+            for media, blob in zip(media_list, claim_blobs(digests, blobs)):
+                _use_blob(media, blob)
+            created = Media.objects.bulk_create(media_list)
+    finally:
+        # ไฟล์ที่ไม่มี blob ใช้: request ล้มเหลว, ไฟล์ซ้ำของเดิม
+        # หรือมี request อื่นบันทึกไฟล์เดียวกันไปก่อน
+        delete_unreferenced(written)
+
+    # bulk_create ไม่ส่ง post_save จึงต้องอัปเดตรูปปก / cache เอง
+    media_changed(post.pk)
+    return created
+
+
+def _prepare_blobs(sources, stored_names=None):
+    """
+    หา MediaBlob ของแต่ละไฟล์จาก SHA-256 ไฟล์ที่ยังไม่เคยเก็บจะถูกเขียนลง storage
+    พร้อม variants พร้อมกันหลาย thread เวลารวมจึงใกล้กับรูปที่ช้าที่สุด
+    stored_names = key ของไฟล์ที่อยู่ใน storage แล้ว (ใช้เป็นรูปต้นฉบับได้เลย)
+
+    คืน (digests ตามลำดับ sources, {sha256: MediaBlob ที่ยังไม่ save}, ชื่อไฟล์ที่เขียนไป)
+    """
+    stored_names = stored_names or [None] * len(sources)
+    digests = [content_hash(source) for source in sources]
+    blobs = find_blobs(digests)
+
+    new_blobs = []
+    for digest, source, stored_name in zip(digests, sources, stored_names):
+        if digest not in blobs:
+            blobs[digest] = MediaBlob(sha256=digest, size=source.size)
+            new_blobs.append((blobs[digest], source, stored_name))
+
+    # key ที่อัปโหลดมาแล้วนับเป็นไฟล์ที่เขียนไป ถ้าซ้ำของเดิมจะถูกลบทิ้ง
+    written = [name for name in stored_names if name]
+    if new_blobs:
+        max_workers = min(len(new_blobs), getattr(settings, "POSTS_MEDIA_UPLOAD_THREADS", 4))
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # list() เพื่อให้ exception จาก thread ถูกโยนออกมาที่นี่
+                list(executor.map(_write_blob, *zip(*new_blobs)))
+        except Exception:
+            # ลบไฟล์ที่เขียนไปแล้วของ request ที่ล้มเหลว ไม่ให้ค้างใน storage
+            delete_unreferenced(written + [name for blob, _, _ in new_blobs for name in blob.file_names()])
+            raise
+        for blob, _, _ in new_blobs:
+            written.extend(blob.file_names())
+    return digests, blobs, written
+
+
+def _write_blob(blob, source, stored_name=None):
+    # ใช้ Media ชั่วคราวเพื่อให้ไฟล์ได้ path / storage ตามฟิลด์ของ Media
+    media = Media()
+    if stored_name:
+        media.image = stored_name
+    else:
+        # โฟลเดอร์ตาม hash ของเนื้อไฟล์ ชื่อไฟล์คงตามที่ผู้ใช้อัปโหลดครั้งแรก
+        name = os.path.basename(source.name or "image")
+        media.image.save(f"{blob.sha256}/{name}", source, save=False)
+    blob.image = media.image.name
+
+    try:
+        generate_variants(media, source=source, stem=blob.sha256)
+    finally:
+        # ชื่อไฟล์ที่เขียนไปแล้ว (แม้จะล้มเหลวกลางทาง) ต้องอยู่บน blob เพื่อให้ลบทิ้งได้
+        for field in VARIANT_FIELDS:
+            setattr(blob, field, getattr(media, field).name or "")
+
+
+def _use_blob(media, blob):
+    media.blob = blob
+    for field in MediaBlob.FILE_FIELDS:
+        setattr(media, field, getattr(blob, field))
+
+
+def _attach_blob(media, source, stored_name=None):
+    # ผูก Media ที่มีอยู่แล้วกับ blob ของ source (ใช้ใน worker ทีละรูป)
+    digests, blobs, written = _prepare_blobs([source], [stored_name])
+    try:
+        with transaction.atomic():
+            _use_blob(media, claim_blobs(digests, blobs)[0])
+            # save ผ่าน signal: รูปปกของโพสต์ / cache การ์ด จะอัปเดตตาม
+            media.save(update_fields=["blob", *MediaBlob.FILE_FIELDS])
+    finally:
+        delete_unreferenced(written)
+
+
+def queue_images(post, files):
+    """
+    เขียนเฉพาะรูปต้นฉบับลง storage (ทีละ chunk ไม่อ่านทั้งไฟล์เข้าหน่วยความจำ)
+    แล้วให้ worker สร้าง variants / blob ทีหลัง แบบเดียวกับรูปที่อัปโหลดตรง (attach_uploaded)
+    คิวเก็บเพียง media_id ส่วนไฟล์อยู่ใน storage ที่ worker ทุกเครื่องอ่านได้
+    """
+    if not files:
+        return []
+    storage = Media._meta.get_field("image").storage
+    keys = []
+    try:
+        for f in files:
+            extension = os.path.splitext(f.name or "")[1].lower()
+            keys.append(storage.save(f"{UPLOAD_PREFIX}/{post.author_id}/{uuid.uuid4().hex}{extension}", f))
+        return _queue_variants(post, keys)
+    except Exception:
+        delete_unreferenced(keys)
+        raise
+
+
+def _queue_variants(post, keys):
+    # รูปต้นฉบับใช้ได้ทันที ส่วน variants / blob ให้ worker ทำทีหลัง
+    with transaction.atomic():
+        created = Media.objects.bulk_create([Media(post=post, image=key) for key in keys])
+        for media in created:
+            enqueue("generate_variants", payload={"media_id": media.pk})
+    media_changed(post.pk)
+    return created
+
+
+def generate_variants_job(job):
+    """handler ของงาน "generate_variants" (เรียกโดย posts.jobs.run_job)"""
+    media = Media.objects.filter(pk=job.payload["media_id"]).first()
+    if media is None or media.blob_id:
+        return
+    key = media.image.name
+    with media.image.open("rb") as source:
+        _attach_blob(media, source, stored_name=key)
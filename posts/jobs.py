@@ -0,0 +1,107 @@
+"""
+คิวงานเบื้องหลังที่เก็บไว้ในตาราง Job
+
+- enqueue()     : เพิ่มงานลงคิว (เรียกจาก view ภายใน transaction เดียวกับข้อมูลหลัก)
+- claim_job()   : worker จองงานถัดไปแบบไม่ชนกับ worker อื่น
+- run_job()     : เรียก handler ตาม Job.kind แล้วบันทึกผล / ตั้งเวลาลองใหม่
+
+การจองงานและการบันทึกผลเป็น transaction สั้นๆ แยกกัน handler ทำงาน (อ่าน/เขียน storage)
+นอก transaction จึงไม่มี lock ของแถว Job หรือ connection ค้างไว้ระหว่างรอ I/O
+
+worker คือ `python manage.py run_jobs` (รันแยกจาก gunicorn)
+"""
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+# kind -> handler(job) ที่ทำงานจริง (dotted path เพื่อไม่ให้ import วนกัน)
+HANDLERS = {
+    "generate_variants": "posts.images.generate_variants_job",
+}
+
+# งานที่อยู่ในสถานะ running นานเกินนี้ ถือว่า worker ตายไปแล้ว ให้กลับเข้าคิว
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue(kind, payload=None, max_attempts=3):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, payload=payload or {}, max_attempts=max_attempts)
+
+
+def retry_delay(attempts):
+    # 30 วินาที, 1 นาที, 2 นาที, ... (สูงสุด 1 ชั่วโมง)
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+def requeue_stale_jobs():
+    cutoff = timezone.now() - STALE_AFTER
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff).update(
+        status=Job.STATUS_QUEUED, locked_at=None
+    )
+
+
+def claim_job():
+    """
+    จองงานถัดไปที่ถึงเวลาทำแล้ว คืน None ถ้าไม่มีงาน
+    PostgreSQL ใช้ SELECT ... FOR UPDATE SKIP LOCKED ให้หลาย worker ไม่หยิบงานซ้ำกัน
+    (ฐานข้อมูลที่ไม่รองรับ จะอาศัย UPDATE แบบมีเงื่อนไข status=queued แทน)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+            .order_by("run_after", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, locked_at=now, attempts=job.attempts + 1, updated_at=now
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    """ทำงานหนึ่งงาน (ที่ claim_job จองไว้แล้ว) คืน True ถ้าสำเร็จ"""
+    handler = import_string(HANDLERS[job.kind])
+    try:
+        # ไม่ครอบด้วย transaction: handler เปิด transaction สั้นๆ เองเฉพาะตอนเขียนฐานข้อมูล
+        handler(job)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        if job.attempts < job.max_attempts:
+            job.status = Job.STATUS_QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        else:
+            job.status = Job.STATUS_FAILED
+        job.save(update_fields=["status", "last_error", "locked_at", "run_after", "updated_at"])
+        return False
+
+    job.status = Job.STATUS_DONE
+    job.locked_at = None
+    job.last_error = ""
+    job.save(update_fields=["status", "locked_at", "last_error", "updated_at"])
+    return True
+
+
+def run_pending_jobs(limit=None):
+    """ทำงานที่ค้างอยู่จนหมดคิว (หรือครบ limit) คืนจำนวนงานที่ทำ"""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,91 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from posts.bench import bench_routes, compare, failures, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "วัดเวลาตอบ (p50/p95), จำนวน query และหน่วยความจำของทุก URL ที่มีชื่อ "
+        "บนฐานข้อมูลทดสอบที่สร้างข้อมูลจำลองไว้ แล้วเทียบกับ baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200, help="จำนวนผู้ใช้")
+        parser.add_argument("--posts", type=int, default=1000, help="จำนวนโพสต์ (hiring / rental อย่างละครึ่ง)")
+        parser.add_argument("--media-per-post", type=int, default=3, help="จำนวนรูปต่อโพสต์")
+        parser.add_argument("--reviews-per-post", type=int, default=5, help="จำนวนรีวิวต่อโพสต์")
+        parser.add_argument("--bookings-per-user", type=int, default=10, help="จำนวนโพสต์ที่ผู้ใช้แต่ละคนจอง")
+        parser.add_argument("--iterations", type=int, default=20, help="จำนวนครั้งที่ยิงต่อ route")
+        parser.add_argument("--warmup", type=int, default=2, help="จำนวนครั้งที่ยิงก่อนเริ่มจับเวลา")
+        parser.add_argument("--route", action="append", dest="routes", help="วัดเฉพาะ route นี้ (ระบุซ้ำได้)")
+        parser.add_argument("--baseline", help="ไฟล์ JSON ของผลครั้งก่อน ถ้าแย่กว่านี้จะจบด้วย error")
+        parser.add_argument("--save-baseline", help="บันทึกผลครั้งนี้เป็นไฟล์ JSON")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="สัดส่วนที่ p95 / หน่วยความจำแย่ลงได้ก่อนถือว่าถดถอย (จำนวน query ต้องไม่เพิ่มเลย)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        # ใช้ฐานข้อมูลทดสอบแยก (เหมือน manage.py test) ไม่แตะข้อมูลจริง
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write("Seeding data...")
+            user = seed(
+                users=options["users"],
+                posts=options["posts"],
+                media_per_post=options["media_per_post"],
+                reviews_per_post=options["reviews_per_post"],
+                bookings_per_user=options["bookings_per_user"],
+            )
+            # status ที่ผิดรายงานครั้งเดียวผ่าน failures() ไม่ต้องพิมพ์ warning ทุกครั้งที่ยิง
+            request_logger = logging.getLogger("django.request")
+            level = request_logger.level
+            request_logger.setLevel(logging.ERROR)
+            try:
+                results = bench_routes(user, options["iterations"], options["warmup"], options["routes"])
+            finally:
+                request_logger.setLevel(level)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        self._report(results)
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as f:
+                json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+            self.stdout.write(f"Saved baseline to {options['save_baseline']}")
+
+        failed = failures(results)
+        if failed:
+            raise CommandError("Routes that did not respond as expected:\n  " + "\n  ".join(failed))
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def _report(self, results):
+        width = max(len(name) for name in results)
+        self.stdout.write(
+            f"{'route':<{width}}  status   p50 ms   p95 ms  queries  peak KiB"
+        )
+        for name, result in results.items():
+            if "skipped" in result:
+                self.stdout.write(f"{name:<{width}}  skipped: {result['skipped']}")
+                continue
+            self.stdout.write(
+                f"{name:<{width}}  {result['status']:>6}  {result['p50_ms']:>7.2f}  {result['p95_ms']:>7.2f}"
+                f"  {result['queries']:>7}  {result['peak_kib']:>8.1f}"
+            )
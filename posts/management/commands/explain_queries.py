@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "รัน EXPLAIN กับ query หลักของแต่ละหน้า แล้วเตือนเมื่อมีการอ่านทั้งตาราง (sequential scan) "
+        "บนตารางที่มีแถวมาก"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=1000,
+            help="เตือนเฉพาะตารางที่มีแถวไม่น้อยกว่านี้ (ตารางเล็ก scan ทั้งตารางเร็วกว่าใช้ index)",
+        )
+        parser.add_argument("--user-id", type=int, help="id ผู้ใช้ตัวอย่างใน WHERE (ค่าเริ่มต้น: แถวแรก)")
+        parser.add_argument("--post-id", type=int, help="id โพสต์ตัวอย่างใน WHERE (ค่าเริ่มต้น: แถวแรก)")
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="จบด้วย error ถ้าพบ sequential scan (ใช้ใน CI)",
+        )
+
+    def handle(self, *args, **options):
+        results = check_query_plans(
+            options["min_rows"], user_id=options["user_id"], post_id=options["post_id"]
+        )
+
+        flagged_count = 0
+        for name, plan, flagged in results:
+            if flagged:
+                flagged_count += 1
+                tables = ", ".join(f"{table} (~{rows} rows)" for table, rows in flagged)
+                self.stdout.write(self.style.WARNING(f"SEQ SCAN  {name}: {tables}"))
+            else:
+                self.stdout.write(f"ok        {name}")
+            if flagged or options["verbosity"] >= 2:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        summary = f"{flagged_count} of {len(results)} queries scan large tables sequentially"
+        if flagged_count and options["fail"]:
+            raise CommandError(summary)
+        self.stdout.write(summary)
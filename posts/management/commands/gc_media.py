@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.gc import S3_DELETE_LIMIT, collect_logged, collect_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "ลบไฟล์รูปใน storage ที่ไม่มี Media / Profile อ้างถึงแล้ว "
+        "(ค่าเริ่มต้นตรวจเฉพาะไฟล์ใน log ของไฟล์ที่ถูกลบ ใช้ --full เพื่อไล่ทั้ง storage)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="ไล่ทุกไฟล์ใน storage แทนการอ่านจาก log (ช้า ใช้เก็บกวาดไฟล์เก่าที่ไม่อยู่ใน log)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="แสดงไฟล์ที่จะถูกลบโดยไม่ลบจริง (-v 2 เพื่อแสดงชื่อไฟล์)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=S3_DELETE_LIMIT,
+            help="จำนวนไฟล์ที่ตรวจ/ลบต่อชุด",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=24,
+            help="(--full) ข้ามไฟล์ที่ใหม่กว่านี้ (ชั่วโมง) เพราะอาจยังอัปโหลดไม่เสร็จ",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        if options["full"]:
+            batches = collect_storage(
+                timedelta(hours=options["min_age"]), options["batch_size"], dry_run
+            )
+        else:
+            batches = collect_logged(options["batch_size"], dry_run)
+
+        total = 0
+        for orphans in batches:
+            total += len(orphans)
+            if options["verbosity"] >= 2:
+                for name in orphans:
+                    self.stdout.write(f"  {name}")
+
+        if dry_run:
+            self.stdout.write(f"Would delete {total} unreferenced file(s)")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {total} unreferenced file(s)"))
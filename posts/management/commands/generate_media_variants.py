@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import VARIANT_FIELDS, generate_variants
+from posts.models import Media
+
+
+class Command(BaseCommand):
+    help = "สร้างรูปย่อ (thumbnail / การ์ด JPEG / การ์ด WebP) ให้ Media ที่อัปโหลดไว้ก่อนมีระบบ variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="สร้างใหม่ทุกรูป แม้จะมี variants อยู่แล้ว",
+        )
+
+    def handle(self, *args, **options):
+        # Media ที่มี blob ได้ variants ตอนอัปโหลดแล้ว (และใช้ไฟล์ร่วมกับ Media อื่น)
+        queryset = (
+            Media.objects.filter(blob__isnull=True)
+            .exclude(Q(image="") | Q(image__isnull=True))
+            .order_by("pk")
+        )
+        if not options["force"]:
+            queryset = queryset.filter(Q(card_image="") | Q(card_image__isnull=True))
+
+        generated = skipped = 0
+        for media in queryset.iterator():
+            if generate_variants(media):
+                # save ผ่าน signal: รูปปกของโพสต์ (Post.cover_image) จะเปลี่ยนไปใช้รูปย่อด้วย
+                media.save(update_fields=VARIANT_FIELDS)
+                generated += 1
+            else:
+                skipped += 1
+                self.stderr.write(f"Skipped media #{media.pk}: {media.image.name} is not a readable image")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated variants for {generated} media ({skipped} skipped)")
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_search_backend
+from posts.trigram import get_trigram_index
+
+
+class Command(BaseCommand):
+    help = "สร้าง search index และ trigram index ของโพสต์ทั้งหมดใหม่ (ใช้ซ่อมเมื่อ index ไม่ตรงกับข้อมูล ไม่ต้องรันทุกครั้งที่ deploy)"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt search index with {backend.__class__.__name__}")
+        )
+
+        index = get_trigram_index()
+        index.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt trigram index with {index.__class__.__name__}")
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.jobs import claim_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "worker สำหรับงานเบื้องหลังในตาราง Job (อัปโหลดรูป / สร้าง variants)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="ทำงานที่ค้างอยู่จนหมดคิวแล้วจบ (ไม่รอค้าง)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="เวลาที่รอก่อนเช็คคิวใหม่เมื่อไม่มีงาน (วินาที)",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="จบการทำงานหลังทำครบจำนวนนี้ (ให้ process manager เปิด worker ใหม่)",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        while options["max_jobs"] is None or processed < options["max_jobs"]:
+            job = claim_job()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                requeue_stale_jobs()
+                continue
+
+            ok = run_job(job)
+            processed += 1
+            self.stdout.write(f"{'Done' if ok else 'Failed'}: {job}")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
@@ -0,0 +1,151 @@
+"""
+เสิร์ฟไฟล์ media จาก MEDIA_ROOT สำหรับ deployment ที่ไม่ใช้ S3 (USE_S3_MEDIA=False)
+
+settings.MEDIA_SERVE_MODE
+- "django"     : ส่งไฟล์เองด้วย FileResponse (รองรับ Range สำหรับไฟล์บางส่วน)
+- "x-accel"    : ให้ nginx ส่งไฟล์แทน (X-Accel-Redirect) ต้องมี location แบบ internal เช่น
+                     location /protected-media/ { internal; alias /srv/app/mediafiles/; }
+                 แล้วตั้ง MEDIA_ACCEL_PREFIX="/protected-media/"
+- "x-sendfile" : Apache (mod_xsendfile) / lighttpd ส่งไฟล์จาก path เต็มใน X-Sendfile
+
+ทุกโหมดตอบ 304 จาก ETag / Last-Modified ได้โดยไม่ต้องส่งไฟล์
+ETag มาจาก inode + ขนาด + เวลาแก้ไขแบบนาโนวินาที (เปลี่ยนทุกครั้งที่เนื้อไฟล์เปลี่ยน)
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_http_methods
+
+# ไฟล์ที่ path มี SHA-256 ของเนื้อไฟล์ (MediaBlob, posts/blobs.py) ไม่มีทางเปลี่ยนเนื้อหา
+# จึง cache ได้ตลอดไป ไฟล์อื่นอาจถูก gc_media ลบแล้วมีไฟล์ใหม่มาใช้ชื่อเดิมได้
+CONTENT_ADDRESSED = re.compile(r"(^|/)[0-9a-f]{64}([/_.]|$)")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _resolve(path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404
+    # SuspiciousFileOperation (path ออกนอก MEDIA_ROOT) ถูก safe_join โยนเป็น 400 เอง
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+    return full_path, st
+
+
+def _etag(st):
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _byte_range(request, size, etag):
+    """
+    คืน (start, end) ของ Range แบบช่วงเดียว, None ถ้าต้องส่งทั้งไฟล์
+    หรือ False ถ้าช่วงที่ขออยู่นอกไฟล์ (416)
+    """
+    header = request.headers.get("Range", "")
+    match = RANGE_HEADER.match(header.replace(" ", ""))
+    if not match:
+        # ไม่มี Range หรือขอหลายช่วง (multipart/byteranges): ส่งทั้งไฟล์แทนได้ตาม RFC 9110
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N : N ไบต์สุดท้าย
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    full_path, st = _resolve(path)
+    etag = _etag(st)
+    last_modified = int(st.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, full_path, path, st, etag)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = (
+        IMMUTABLE_CACHE_CONTROL if CONTENT_ADDRESSED.search(path) else DEFAULT_CACHE_CONTROL
+    )
+    return response
+
+
+def _file_response(request, full_path, path, st, etag):
+    mode = settings.MEDIA_SERVE_MODE
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    if mode == "x-accel":
+        # nginx ส่งไฟล์ (และจัดการ Range) เอง Django ตอบแค่ header
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        return response
+    if mode == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+        return response
+
+    byte_range = _byte_range(request, st.st_size, etag)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{st.st_size}"
+        return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = st.st_size
+    elif byte_range is None:
+        # FileResponse ใช้ wsgi.file_wrapper (sendfile) ได้ถ้า server รองรับ
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, length), status=206, content_type=content_type
+        )
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Accept-Ranges"] = "bytes"
+    return response
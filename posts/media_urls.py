@@ -0,0 +1,151 @@
+"""
+สร้าง URL ของไฟล์ media แบบจำค่าไว้ (LRU จำกัดขนาดต่อ process)
+
+การ์ดและแกลเลอรีเรียก FieldFile.url ทุกรูปทุกครั้งที่ render ซึ่งบน S3 ต้องผ่าน
+S3Boto3Storage.url() ทุกครั้ง ที่นี่จึง
+- จำ URL ไว้ตามชื่อไฟล์ (ชื่อไฟล์ใน storage ไม่ถูกเขียนทับ URL เดิมจึงใช้ซ้ำได้)
+- URL ที่ไม่ต้องเซ็น (custom domain / bucket สาธารณะ) ประกอบเองโดยไม่แตะ boto3 client
+- URL ที่เซ็นแล้ว (presigned) จำไว้แค่ครึ่งหนึ่งของอายุลายเซ็น
+
+MediaImageField ใช้แทน ImageField ให้ .url ผ่านตัวจำนี้ (Media.image, Profile.profile_image)
+ดูอัตรา hit ได้จาก url_cache_stats()
+"""
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.db.models.fields.files import ImageField, ImageFieldFile
+from django.dispatch import receiver
+from django.utils.encoding import filepath_to_uri
+
+
+class URLCache:
+    """OrderedDict เรียงจากใช้ล่าสุดน้อยไปมาก ตัดตัวเก่าสุดทิ้งเมื่อเกิน maxsize"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                url, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return url
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, url, maxsize, expires_at=None):
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = URLCache()
+
+
+def media_url(name, storage=None):
+    """URL ของไฟล์ name ใน storage (ค่าเริ่มต้นคือ default storage)"""
+    storage = storage or default_storage
+    maxsize = settings.POSTS_MEDIA_URL_CACHE_SIZE
+    if maxsize <= 0:
+        return storage.url(name)
+
+    key = (id(storage), name)
+    url = _cache.get(key)
+    if url is not None:
+        return url
+
+    url = _s3_public_url(storage, name)
+    expires_at = None
+    if url is None:
+        url = storage.url(name)
+        if getattr(storage, "querystring_auth", False) and not _is_unsigned(storage):
+            # presigned URL: ทิ้งก่อนลายเซ็นหมดอายุ
+            expires_at = time.monotonic() + storage.querystring_expire / 2
+    _cache.set(key, url, maxsize, expires_at)
+    return url
+
+
+def url_cache_stats():
+    return _cache.stats()
+
+
+def clear_url_cache():
+    _cache.clear()
+
+
+def _is_unsigned(storage):
+    # S3Boto3Storage.url() ใช้ custom domain โดยไม่เซ็น ถ้าไม่ได้ตั้ง CloudFront signer
+    return bool(storage.custom_domain) and not storage.cloudfront_signer
+
+
+def _s3_public_url(storage, name):
+    """
+    ประกอบ URL ของ S3 ที่ไม่ต้องเซ็นเอง (เหมือน S3Boto3Storage.url() แต่ไม่สร้าง client)
+    คืน None ถ้าไม่ใช่ S3 หรือต้องเซ็น
+    """
+    if not hasattr(storage, "bucket_name") or not hasattr(storage, "querystring_auth"):
+        return None
+
+    if storage.custom_domain:
+        if not _is_unsigned(storage):
+            return None
+        domain = storage.custom_domain
+    elif not storage.querystring_auth and not storage.endpoint_url and storage.region_name:
+        domain = f"{storage.bucket_name}.s3.{storage.region_name}.amazonaws.com"
+    else:
+        return None
+
+    key = posixpath.join(storage.location, name) if storage.location else name
+    return f"{storage.url_protocol}//{domain}/{filepath_to_uri(key)}"
+
+
+@receiver(setting_changed)
+def _clear_on_storage_settings_change(setting, **kwargs):
+    # override_settings ในเทสต์เปลี่ยน MEDIA_URL / storage ได้ URL ที่จำไว้จะผิดทันที
+    if setting in ("MEDIA_URL", "STORAGES", "POSTS_MEDIA_URL_CACHE_SIZE") or setting.startswith("AWS_"):
+        _cache.clear()
+
+
+class MediaFieldFile(ImageFieldFile):
+    @property
+    def url(self):
+        self._require_file()
+        return media_url(self.name, self.storage)
+
+
+class MediaImageField(ImageField):
+    """ImageField ที่ .url ผ่าน media_url()"""
+
+    attr_class = MediaFieldFile
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:57
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_counters(apps, schema_editor):
+    # เติมตัวนับให้โพสต์ที่มีรีวิวอยู่ก่อนแล้ว
+    Post = apps.get_model('posts', 'Post')
+    Review = apps.get_model('posts', 'Review')
+    stats = Review.objects.values('post_id').annotate(count=Count('id'), total=Sum('rating'))
+    for row in stats:
+        Post.objects.filter(pk=row['post_id']).update(
+            review_count=row['count'], rating_sum=row['total'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_bookings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:11
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    # โครงสร้าง index ขึ้นกับชนิดฐานข้อมูล จึงสร้างด้วย SQL ตรงๆ
+    # ข้อมูลของโพสต์ที่มีอยู่แล้วถูกเติมใน migration 0021
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS posts_search_vector_gin '
+            'ON posts_postsearchdocument USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        # trigram tokenizer ต้องใช้ SQLite 3.34 ขึ้นไป ถ้าไม่มีให้ใช้ unicode61 แทน
+        tokenizer = 'trigram' if schema_editor.connection.Database.sqlite_version_info >= (3, 34) else 'unicode61'
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts '
+            f"USING fts5(title, description, tags, tokenize='{tokenizer}')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_review_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.post')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:14
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+# GIN trigram index สำหรับ pg_trgm (เฉพาะ PostgreSQL)
+TRIGRAM_INDEXES = [
+    ('posts_post_title_trgm', 'posts_post', 'title'),
+    ('posts_skill_name_trgm', 'posts_skill', 'name'),
+    ('posts_category_name_trgm', 'posts_category', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING GIN ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search_index'),
+    ]
+
+    operations = [
+        # TrigramExtension ไม่ทำอะไรบนฐานข้อมูลที่ไม่ใช่ PostgreSQL
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post title'), ('skill', 'Skill name'), ('category', 'Category name')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('trigram', models.CharField(max_length=3)),
+                ('text', models.CharField(max_length=255)),
+                ('trigram_count', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'trigram'], name='posts_searc_kind_daf9f8_idx'), models.Index(fields=['kind', 'object_id'], name='posts_searc_kind_c9a409_idx')],
+            },
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:23
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_cover_image(apps, schema_editor):
+    # รูปปก = Media ตัวแรกของโพสต์ (เรียงตาม id) ทำใน UPDATE เดียว
+    Post = apps.get_model('posts', 'Post')
+    Media = apps.get_model('posts', 'Media')
+    cover = Media.objects.filter(post_id=OuterRef('pk')).order_by('id').values('image')[:1]
+    Post.objects.update(cover_image=Coalesce(Subquery(cover), Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='cover_image',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_cover_image, migrations.RunPython.noop),
+    ]
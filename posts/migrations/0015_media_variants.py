@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_cover_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='card_image',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='media_images/cards/'),
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='card_webp',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='media_images/cards/'),
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='media_images/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='cover_webp',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:09
+
+import posts.media_urls
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_deleted_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='media',
+            name='card_image',
+            field=posts.media_urls.MediaImageField(blank=True, editable=False, null=True, upload_to='media_images/cards/'),
+        ),
+        migrations.AlterField(
+            model_name='media',
+            name='card_webp',
+            field=posts.media_urls.MediaImageField(blank=True, editable=False, null=True, upload_to='media_images/cards/'),
+        ),
+        migrations.AlterField(
+            model_name='media',
+            name='image',
+            field=posts.media_urls.MediaImageField(blank=True, null=True, upload_to='media_images/'),
+        ),
+        migrations.AlterField(
+            model_name='media',
+            name='thumbnail',
+            field=posts.media_urls.MediaImageField(blank=True, editable=False, null=True, upload_to='media_images/thumbs/'),
+        ),
+    ]
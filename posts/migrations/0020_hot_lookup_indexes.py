@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_media_url_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(('is_hiring_category', True)), fields=['id'], name='category_hiring_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(('is_rental_category', True)), fields=['id'], name='category_rental_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-id'], name='posts_post_author__e29b80_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['post', 'rating'], name='posts_revie_post_id_caf8e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['post', '-created_at'], name='posts_revie_post_id_8990da_idx'),
+        ),
+        # ตาราง M2M ของ Post.bookings ที่ Django สร้างเองกำหนด Meta.indexes ไม่ได้
+        # (user_id, post_id) ทำให้ get_booked_post_ids() อ่านจาก index อย่างเดียว
+        migrations.RunSQL(
+            "CREATE INDEX posts_post_bookings_user_post_idx ON posts_post_bookings (user_id, post_id)",
+            "DROP INDEX posts_post_bookings_user_post_idx",
+        ),
+    ]
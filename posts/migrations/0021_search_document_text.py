@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:44
+
+from django.db import migrations, models
+
+
+# จำนวนโพสต์ที่เติม index ต่อรอบ
+BATCH_SIZE = 500
+
+POSTGRES_INSERT = (
+    'INSERT INTO posts_postsearchdocument (post_id, document, search_vector) VALUES ('
+    "%s, %s, setweight(to_tsvector('simple', %s), 'A') "
+    "|| setweight(to_tsvector('simple', %s), 'B') "
+    "|| setweight(to_tsvector('simple', %s), 'C'))"
+)
+SQLITE_INSERT = 'INSERT INTO posts_post_fts (rowid, title, description, tags) VALUES (%s, %s, %s, %s)'
+
+
+def _documents(apps):
+    """คืน [(post_id, title, description, tags)] ของโพสต์ hiring/rental ทีละ BATCH_SIZE โพสต์"""
+    Post = apps.get_model('posts', 'Post')
+    HiringPost = apps.get_model('posts', 'HiringPost')
+    categories = Post.categories.through
+    skills = HiringPost.skills.through
+
+    posts = Post.objects.filter(type__in=('hiring', 'rental')).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk).values_list('pk', 'title', 'description')[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        ids = [pk for pk, _, _ in batch]
+
+        tags = {}
+        for post_id, name in categories.objects.filter(post_id__in=ids).values_list('post_id', 'category__name'):
+            tags.setdefault(post_id, []).append(name)
+        for post_id, name in skills.objects.filter(hiringpost_id__in=ids).values_list('hiringpost_id', 'skill__name'):
+            tags.setdefault(post_id, []).append(name)
+
+        yield [(pk, title, description or '', ' '.join(tags.get(pk, []))) for pk, title, description in batch]
+
+
+def backfill_search_index(apps, schema_editor):
+    # เติม index ของโพสต์ที่มีอยู่แล้ว (โพสต์ใหม่ถูกทำ index โดย signal ใน posts/signals.py)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS posts_search_document_trgm '
+            'ON posts_postsearchdocument USING GIN (document gin_trgm_ops)'
+        )
+        clear, insert = 'DELETE FROM posts_postsearchdocument', POSTGRES_INSERT
+    elif vendor == 'sqlite':
+        clear, insert = 'DELETE FROM posts_post_fts', SQLITE_INSERT
+    else:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(clear)
+        for batch in _documents(apps):
+            if vendor == 'postgresql':
+                rows = [
+                    (pk, ' '.join((title, tags, description)).lower(), title, tags, description)
+                    for pk, title, description, tags in batch
+                ]
+            else:
+                rows = batch
+            cursor.executemany(insert, rows)
+
+
+def drop_document_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_search_document_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postsearchdocument',
+            name='document',
+            field=models.TextField(default=''),
+        ),
+        migrations.RunPython(backfill_search_index, drop_document_index),
+    ]
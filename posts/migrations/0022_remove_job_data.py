@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:55
+
+from django.db import migrations
+
+
+def fail_process_media_jobs(apps, schema_editor):
+    # งาน "process_media" เก็บไฟล์ไว้ใน Job.data ที่กำลังจะถูกลบ และไม่มี handler แล้ว
+    Job = apps.get_model('posts', 'Job')
+    Job.objects.filter(kind='process_media').exclude(status__in=('done', 'failed')).update(
+        status='failed', locked_at=None, last_error='process_media jobs were removed; upload the image again'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_search_document_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_process_media_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='job',
+            name='data',
+        ),
+    ]
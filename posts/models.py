@@ -1,8 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
+from django.utils import timezone
+from django.db.models import Exists, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .media_urls import MediaImageField
 
 # โมเดลหลักที่ Post จะอ้างอิงถึง
 class Skill(models.Model):
@@ -29,12 +35,73 @@ class Category(models.Model):
         default=True
     )
 
+    class Meta:
+        indexes = [
+            # ตัวเลือกหมวดหมู่ในฟอร์มสร้างโพสต์แต่ละประเภท (posts/forms.py)
+            models.Index(fields=["id"], condition=Q(is_hiring_category=True), name="category_hiring_idx"),
+            models.Index(fields=["id"], condition=Q(is_rental_category=True), name="category_rental_idx"),
+        ]
+
     def __str__(self):
         # กำหนดให้ Django Admin แสดงผลด้วยฟิลด์ 'name'
         # เช่น "เครื่องใช้ไฟฟ้า", "งานฟรีแลนซ์"
         return self.name
 
 
+# ค่าที่ PostQuerySet.cards() annotate ไว้บน object แม่
+# ต้องคัดลอกไปให้ object ลูกตอน downcast ด้วย Post.as_subtype()
+CARD_ANNOTATIONS = ("is_booked",)
+
+# ฟิลด์ของ Post ที่ดูแลโดย signal (posts/signals.py) ไม่ใช่จากฟอร์ม
+DENORMALIZED_FIELDS = ("review_count", "rating_sum", "cover_image", "cover_webp")
+
+
+class PostQuerySet(models.QuerySet):
+    def with_subtypes(self):
+        """
+        ดึงโพสต์ทั้ง hiring และ rental ใน query เดียว
+        JOIN ตารางลูกทั้งสองมาด้วย select_related แล้วค่อย downcast ใน memory
+        ด้วย Post.as_subtype() ทำให้ ORDER BY / LIMIT ไปทำที่ฐานข้อมูลได้
+        """
+        return self.filter(type__in=("hiring", "rental")).select_related(
+            "hiringpost", "rentalpost"
+        )
+
+    def cards(self, user=None):
+        """
+        QuerySet สำหรับแสดงผลเป็นการ์ดในหน้า feed
+        ดึงสถานะการจองของผู้ใช้มาใน SQL คำสั่งเดียว
+        (รูปปกและคะแนนรีวิวอ่านจาก cover_image / review_count / rating_sum
+        บนแถว Post อยู่แล้ว ไม่ต้องแตะตาราง Media / Review)
+        """
+        queryset = self
+
+        if user is not None and user.is_authenticated:
+            booked = Post.bookings.through.objects.filter(
+                post_id=OuterRef("pk"), user_id=user.pk
+            )
+            queryset = queryset.annotate(is_booked=Exists(booked))
+        return queryset
+
+    def refresh_cover_image(self):
+        """ตั้ง cover_image / cover_webp ใหม่จาก Media ตัวแรกของแต่ละโพสต์ (UPDATE เดียว)"""
+        # ข้าม Media ที่ยังไม่มีไฟล์ (เช่น รอ worker อัปโหลดอยู่)
+        first_media = (
+            Media.objects.filter(post_id=OuterRef("pk"))
+            .exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("id")
+        )
+        cover = first_media.annotate(
+            name=Coalesce(NullIf("card_image", Value("")), "image", output_field=models.CharField())
+        ).values("name")[:1]
+        webp = first_media.values("card_webp")[:1]
+        return self.update(
+            cover_image=Coalesce(Subquery(cover), Value(""), output_field=models.CharField()),
+            cover_webp=Coalesce(Subquery(webp), Value(""), output_field=models.CharField()),
+        )
+
+
 # โมเดล Post (เป็น Concrete Base Class)
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
@@ -52,21 +119,69 @@ class Post(models.Model):
     categories = models.ManyToManyField(Category, related_name="posts", blank=True)
     bookings = models.ManyToManyField(User, related_name='booked_posts', blank=True)
 
+    # ตัวนับรีวิวที่เก็บไว้ในแถวของ Post เลย (denormalized)
+    # อัปเดตโดย signal ใน posts/signals.py ทุกครั้งที่ Review ถูกสร้าง/แก้ไข/ลบ
+    # ทำให้หน้า listing อ่านคะแนนได้โดยไม่ต้อง query ตาราง Review เพิ่ม
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
+    # ชื่อไฟล์รูปปก (= Media ตัวแรกของโพสต์) เก็บไว้ให้หน้า feed ไม่ต้อง query Media
+    # อัปเดตโดย signal ทุกครั้งที่ Media ของโพสต์ถูกเพิ่ม/ลบ
+    # cover_image เป็น JPEG ขนาดการ์ด (หรือรูปต้นฉบับถ้ายังไม่มี variants)
+    cover_image = models.CharField(max_length=100, blank=True, default="", editable=False)
+    cover_webp = models.CharField(max_length=100, blank=True, default="", editable=False)
+
+    # Manager นี้ถูกสืบทอดไปยัง HiringPost / RentalPost ด้วย
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # โพสต์ของผู้ใช้หนึ่งคนเรียงตาม id (my_post_view, รีวิวในหน้าโปรไฟล์)
+            models.Index(fields=["author", "-id"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        # ฟิลด์ denormalized ถูกอัปเดตด้วย UPDATE แยกจาก signal
+        # ตอนบันทึกโพสต์เดิม (เช่น edit_post_view) จึงไม่เขียนทับค่าที่อาจเก่าใน memory
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         # กำหนดให้ Django Admin แสดงผลด้วยฟิลด์ 'title'
         # เช่น "รับสมัครโปรแกรมเมอร์"
         return self.title
 
+    def as_subtype(self):
+        """
+        แปลง Post -> HiringPost / RentalPost โดยใช้ object ลูกที่ select_related มาแล้ว
+        (ถ้าไม่ใช่ทั้งสองแบบ จะคืนตัวเอง)
+        """
+        for related_name in ("hiringpost", "rentalpost"):
+            try:
+                child = getattr(self, related_name)
+            except ObjectDoesNotExist:
+                continue
+            for attr in CARD_ANNOTATIONS:
+                if attr in self.__dict__:
+                    setattr(child, attr, self.__dict__[attr])
+            return child
+        return self
+
     @property
     def avg_rating(self):
-        # คำนวณค่าเฉลี่ยจาก field 'rating' ของ model Review ที่ผูกกับโพสต์นี้
-        # โดยสมมติว่าใน Review model ใช้ related_name='reviews'
-        ratings = self.reviews.aggregate(Avg('rating'))['rating__avg']
-        return ratings if ratings else 0
+        # ค่าเฉลี่ยคำนวณจากตัวนับที่เก็บไว้ ไม่ต้อง aggregate ตาราง Review
+        if not self.review_count:
+            return 0
+        return self.rating_sum / self.review_count
 
     @property
     def count_reviews(self):
-        return self.reviews.count()
+        return self.review_count
 
 
 # โมเดลที่สืบทอดจาก Post
@@ -102,11 +217,46 @@ class HiringPost(Post):
         return f"[Hiring] {self.title}"
 
 
+# ไฟล์รูปที่ Media ใช้ร่วมกัน (หนึ่งแถวต่อเนื้อไฟล์)
+class MediaBlob(models.Model):
+    # ไฟล์รูปหนึ่งชุดใน storage ระบุด้วย SHA-256 ของเนื้อไฟล์ (posts/blobs.py)
+    # รูปเดียวกันที่อัปโหลดซ้ำ (แก้ไขโพสต์ / หลายโพสต์) ใช้ไฟล์ชุดนี้ร่วมกัน
+    # ref_count = จำนวน Media ที่อ้างถึง ไฟล์จะถูกลบเมื่อไม่เหลือ Media ใช้แล้ว
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.CharField(max_length=255)
+    thumbnail = models.CharField(max_length=255, blank=True)
+    card_image = models.CharField(max_length=255, blank=True)
+    card_webp = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    FILE_FIELDS = ("image", "thumbnail", "card_image", "card_webp")
+
+    def file_names(self):
+        return [name for name in (getattr(self, field) for field in self.FILE_FIELDS) if name]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
 # โมเดล Media ที่เชื่อมโยงกับ Post
 class Media(models.Model):
     # เชื่อมโยงกับ Post ตัวหลัก
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="media")
-    image = models.ImageField(upload_to="media_images/", null=True, blank=True)
+    image = MediaImageField(upload_to="media_images/", null=True, blank=True)
+
+    # ไฟล์ที่ใช้ร่วมกับ Media อื่น (ชื่อไฟล์ทุกฟิลด์ของ Media ตรงกับของ blob)
+    # PROTECT: ห้ามลบ blob ที่ยังมี Media อ้างถึง (ไม่งั้นรูปจะหาย)
+    blob = models.ForeignKey(
+        MediaBlob, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name="media"
+    )
+
+    # รูปย่อที่สร้างจาก image ตอนอัปโหลด (posts/images.py)
+    # หน้า listing ใช้ขนาดการ์ด ส่วนหน้า detail ยังใช้รูปต้นฉบับ
+    thumbnail = MediaImageField(upload_to="media_images/thumbs/", null=True, blank=True, editable=False)
+    card_image = MediaImageField(upload_to="media_images/cards/", null=True, blank=True, editable=False)
+    card_webp = MediaImageField(upload_to="media_images/cards/", null=True, blank=True, editable=False)
 
     def __str__(self):
         # กำหนดการแสดงผลในหน้า Admin
@@ -119,6 +269,16 @@ class Media(models.Model):
         return f"Media for Post ID: {self.post.id}"
 
 
+class DeletedFile(models.Model):
+    # ไฟล์ใน storage ที่อาจไม่มีใครใช้แล้ว (รูปของ Media ที่ถูกลบ, รูปโปรไฟล์เดิม)
+    # manage.py gc_media ตรวจว่าไม่มีแถวไหนอ้างถึงแล้วจึงลบไฟล์จริง (posts/gc.py)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Review(models.Model):
     post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='reviews')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -131,6 +291,91 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('post', 'author') # ป้องกันคนเดิมรีวิวโพสต์เดิมซ้ำ
+        indexes = [
+            # COUNT / SUM(rating) ของโพสต์อ่านจาก index ได้เลย (recount_reviews)
+            models.Index(fields=["post", "rating"]),
+            # รีวิวของโพสต์เรียงใหม่ -> เก่า (หน้าโปรไฟล์ / หน้ารายละเอียด)
+            models.Index(fields=["post", "-created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Rating {self.rating} on {self.post.title} by {self.author.username}"
+
+
+class PostSearchDocument(models.Model):
+    # เอกสารสำหรับค้นหาแบบ full-text บน PostgreSQL (หนึ่งแถวต่อหนึ่งโพสต์)
+    # แยกตารางออกมา เพื่อไม่ให้ query ของหน้า feed ต้องโหลด tsvector ไปด้วย
+    # GIN index สร้างใน migration 0012 (เฉพาะ PostgreSQL)
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="search_document"
+    )
+    search_vector = SearchVectorField(null=True)
+    # ข้อความทั้งหมดแบบตัวพิมพ์เล็ก ใช้ค้นคำกลางข้อความด้วย LIKE (ภาษาไทยไม่มีการเว้นวรรค
+    # tsvector จึงแยกคำไม่ได้) GIN trigram index สร้างใน migration 0021
+    document = models.TextField(default="")
+
+    def __str__(self):
+        return f"Search document for Post ID: {self.post_id}"
+
+
+class SearchTrigram(models.Model):
+    # ตาราง trigram สำหรับค้นหาแบบทนต่อการพิมพ์ผิด/autocomplete บนฐานข้อมูลที่ไม่มี pg_trgm
+    # หนึ่งแถวต่อหนึ่ง trigram ของข้อความ (ดู posts/trigram.py)
+    KIND_POST = "post"
+    KIND_SKILL = "skill"
+    KIND_CATEGORY = "category"
+    KIND_CHOICES = [
+        (KIND_POST, "Post title"),
+        (KIND_SKILL, "Skill name"),
+        (KIND_CATEGORY, "Category name"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    trigram = models.CharField(max_length=3)
+    text = models.CharField(max_length=255)
+    # จำนวน trigram ทั้งหมดของข้อความ ใช้คำนวณคะแนน similarity
+    trigram_count = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "trigram"]),
+            models.Index(fields=["kind", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} '{self.trigram}'"
+
+
+class Job(models.Model):
+    # งานเบื้องหลังที่รอให้ worker (manage.py run_jobs) ทำ ดู posts/jobs.py
+    # ใช้ตารางในฐานข้อมูลเป็นคิว จึงไม่ต้องมี Redis/Celery เพิ่ม
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    payload = models.JSONField(default=dict, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
 
     def __str__(self):
-        return f"Rating {self.rating} on {self.post.title} by {self.author.username}"
\ No newline at end of file
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,83 @@
+class KeysetPage:
+    """
+    หน้าผลลัพธ์แบบ keyset (cursor) ที่อ้างอิงจาก id
+    ใช้แทน Paginator ของ Django ในหน้า feed
+    ไม่มี COUNT(*) และไม่มี OFFSET ทำให้ทุกหน้ามีต้นทุนเท่ากันไม่ว่าจะลึกแค่ไหน
+    """
+
+    def __init__(self, object_list, has_next, has_previous, cursor=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # cursor ที่ใช้เปิดหน้านี้ ใช้เป็นลิงก์ย้อนกลับเมื่อหน้านี้ว่าง
+        self._cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        # ใช้กับลิงก์ ?after=<id> (โพสต์ที่เก่ากว่าการ์ดใบสุดท้าย)
+        if self._has_next and self.object_list:
+            return self.object_list[-1].pk
+        return None
+
+    @property
+    def previous_cursor(self):
+        # ใช้กับลิงก์ ?before=<id> (โพสต์ที่ใหม่กว่าการ์ดใบแรก)
+        if not self._has_previous:
+            return None
+        if self.object_list:
+            return self.object_list[0].pk
+        # ?after=<id> ที่เลยโพสต์สุดท้ายไปแล้ว: ย้อนไปหน้าที่เริ่มจากโพสต์ id นั้น (id >= cursor)
+        return self._cursor - 1
+
+
+def _parse_cursor(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def keyset_paginate(queryset, after=None, before=None, per_page=6):
+    """
+    แบ่งหน้า queryset แบบ "ใหม่ -> เก่า" (เรียงตาม -id)
+
+    - after=<id>  : หน้าถัดไป คือโพสต์ที่ id น้อยกว่า cursor
+    - before=<id> : หน้าก่อนหน้า คือโพสต์ที่ id มากกว่า cursor
+    ดึงเกินมา 1 แถวเพื่อรู้ว่ายังมีหน้าต่อไปหรือไม่ โดยไม่ต้องนับทั้งหมด
+    ฝั่งของ cursor ดูจากแถวเดียวว่ามีโพสต์อีกฝั่งหรือไม่ (หน้าแรกไม่มี cursor จึงไม่ต้องดู)
+    """
+    after = _parse_cursor(after)
+    before = _parse_cursor(before)
+
+    if before is not None:
+        rows = list(queryset.filter(pk__gt=before).order_by("pk")[: per_page + 1])
+        if rows:
+            has_previous = len(rows) > per_page
+            rows = rows[:per_page]
+            rows.reverse()
+            has_next = queryset.filter(pk__lte=before).exists()
+            return KeysetPage(rows, has_next=has_next, has_previous=has_previous, cursor=before)
+        # cursor ใหม่กว่าโพสต์ทั้งหมดแล้ว ให้กลับไปหน้าแรก
+
+    if after is None:
+        rows = list(queryset.order_by("-pk")[: per_page + 1])
+        return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=False)
+
+    rows = list(queryset.filter(pk__lt=after).order_by("-pk")[: per_page + 1])
+    has_previous = queryset.filter(pk__gte=after).exists()
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=has_previous, cursor=after)
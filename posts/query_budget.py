@@ -0,0 +1,108 @@
+"""
+นับจำนวน SQL query / เวลาที่ใช้ใน DB ของแต่ละ view และหา query ที่ซ้ำรูปเดิม (N+1)
+
+- QueryRecorder         : context manager เก็บทุก query ที่ผ่านทุก connection ของ thread นี้
+- QueryBudgetMiddleware : เปิดด้วย QUERY_BUDGET_ENABLED=True ใส่ header X-DB-Queries / X-DB-Time
+                          และเตือน (logger "posts.query_budget") เมื่อเกินงบของ view
+- query_budget(n)       : decorator กำหนดงบของ view เองแทน QUERY_BUDGET_DEFAULT
+
+ในเทสต์ใช้ QueryBudgetTestMixin (posts/testing.py)
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# ค่าใน IN (...) / ตัวเลขใน SQL ไม่ทำให้เป็นคนละรูปกัน
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def query_shape(sql):
+    return _NUMBER.sub("?", _IN_LIST.sub("IN (...)", sql))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []  # [(sql, วินาที)]
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, threshold=None):
+        """คืน [(รูปของ query, จำนวนครั้ง)] ที่ซ้ำตั้งแต่ threshold ครั้งขึ้นไป เรียงจากมากไปน้อย"""
+        threshold = threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD
+        shapes = Counter(query_shape(sql) for sql, _ in self.queries)
+        return [(shape, n) for shape, n in shapes.most_common() if n >= threshold]
+
+
+def query_budget(max_queries):
+    """กำหนดจำนวน query สูงสุดของ view นี้ (ใส่ไว้นอกสุดของ decorator อื่น)"""
+
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._query_budget = settings.QUERY_BUDGET_DEFAULT
+        request._query_view = request.path
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response["X-DB-Queries"] = recorder.count
+        response["X-DB-Time"] = f"{recorder.duration * 1000:.1f}ms"
+
+        budget = request._query_budget
+        repeated = recorder.repeated()
+        if recorder.count > budget:
+            response["X-Query-Budget-Exceeded"] = f"{recorder.count}/{budget}"
+        if recorder.count > budget or repeated:
+            logger.warning(
+                "%s ran %d queries (budget %d) in %.1fms%s",
+                request._query_view,
+                recorder.count,
+                budget,
+                recorder.duration * 1000,
+                "".join(f"\n  {n}x {shape}" for shape, n in repeated),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, "query_budget", settings.QUERY_BUDGET_DEFAULT)
+        request._query_view = f"{view_func.__module__}.{view_func.__name__}"
+        return None
@@ -0,0 +1,97 @@
+"""
+ตรวจแผนการ query (EXPLAIN) ของ query หลักในแต่ละหน้า (manage.py explain_queries)
+
+canonical_queries() สร้าง queryset แบบเดียวกับที่ view ใช้จริง แล้ว find_seq_scans()
+หาตารางที่ถูกอ่านทั้งตาราง (PostgreSQL "Seq Scan on", SQLite "SCAN" ที่ไม่ใช้ index)
+ตารางเล็กถูก scan ทั้งตารางได้ตามปกติ จึงเตือนเฉพาะตารางที่มีแถวไม่น้อยกว่า min_rows
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Sum
+
+from .models import Category, HiringPost, Media, Post, RentalPost, Review
+
+# PostgreSQL: "Seq Scan on posts_post" / "Parallel Seq Scan on posts_post p"
+POSTGRES_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+# SQLite: "SCAN posts_post" (อ่านทั้งตาราง) ต่างจาก "SCAN posts_post USING INDEX ..."
+SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)(.*)")
+
+
+def canonical_queries(user_id=None, post_id=None):
+    """
+    คืน [(ชื่อ, queryset)] ของ query หลักของแต่ละหน้า
+    user_id / post_id ใช้เป็นค่าตัวอย่างใน WHERE (ไม่ระบุ = ใช้แถวแรกในฐานข้อมูล)
+    """
+    if user_id is None:
+        user_id = User.objects.order_by("pk").values_list("pk", flat=True).first() or 0
+    if post_id is None:
+        post_id = Post.objects.order_by("pk").values_list("pk", flat=True).first() or 0
+
+    return [
+        ("home: latest hiring", HiringPost.objects.cards().order_by("-id")[:3]),
+        ("home: latest rental", RentalPost.objects.cards().order_by("-id")[:3]),
+        ("hiring feed", HiringPost.objects.cards().order_by("-pk")[:7]),
+        ("rental feed: next page", RentalPost.objects.cards().filter(pk__lt=post_id).order_by("-pk")[:7]),
+        ("detail: media", Media.objects.filter(post_id=post_id)),
+        ("detail: reviews", Review.objects.filter(post_id=post_id).select_related("author__profile")),
+        (
+            "review counters",
+            Review.objects.filter(post_id=post_id).values("post_id").annotate(count=Count("id"), total=Sum("rating")),
+        ),
+        (
+            "profile: reviews",
+            Review.objects.filter(post__author_id=user_id)
+            .select_related("author__profile", "post")
+            .order_by("-created_at"),
+        ),
+        ("my posts", Post.objects.filter(author_id=user_id).with_subtypes().order_by("id")),
+        ("bookmarks", Post.bookings.through.objects.filter(user_id=user_id).values_list("post_id", flat=True)),
+        ("hiring form categories", Category.objects.filter(is_hiring_category=True)),
+        ("rental form categories", Category.objects.filter(is_rental_category=True)),
+    ]
+
+
+def find_seq_scans(plan, vendor=None):
+    """คืนชื่อตารางที่ถูกอ่านทั้งตารางในแผน (ข้อความจาก QuerySet.explain())"""
+    vendor = vendor or connection.vendor
+    if vendor == "postgresql":
+        return sorted(set(POSTGRES_SEQ_SCAN.findall(plan)))
+    if vendor == "sqlite":
+        return sorted({table for table, rest in SQLITE_SCAN.findall(plan) if "USING" not in rest})
+    return []
+
+
+def table_rows(table):
+    """จำนวนแถวของตาราง (PostgreSQL ใช้ค่าประมาณจาก pg_class ไม่ต้อง COUNT ทั้งตาราง)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+            return max(row[0], 0) if row else 0
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+def check_query_plans(min_rows=1000, **sample):
+    """
+    EXPLAIN ทุก query ใน canonical_queries()
+    คืน [(ชื่อ, แผน, [(ตาราง, จำนวนแถว)] ที่ถูก scan ทั้งตารางและใหญ่เกิน min_rows)]
+    """
+    rows = {}
+    results = []
+    # SQLite แสดง alias (เช่น T4) แทนชื่อตารางในบางแผน ข้ามชื่อที่ไม่ใช่ตารางจริง
+    tables = set(connection.introspection.table_names())
+    for name, queryset in canonical_queries(**sample):
+        plan = queryset.explain()
+        flagged = []
+        for table in find_seq_scans(plan):
+            if table not in tables:
+                continue
+            if table not in rows:
+                rows[table] = table_rows(table)
+            if rows[table] >= min_rows:
+                flagged.append((table, rows[table]))
+        results.append((name, plan, flagged))
+    return results
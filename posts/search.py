@@ -0,0 +1,265 @@
+"""
+ระบบค้นหาโพสต์แบบ full-text ที่เปลี่ยน backend ได้
+
+- PostgresSearchBackend : tsvector + GIN index (ใช้บน production)
+                          คำภาษาที่ไม่เว้นวรรค (เช่น ไทย) ค้นด้วย LIKE + GIN trigram index
+- SQLiteSearchBackend   : ตาราง FTS5 (ใช้ตอนรันบนเครื่อง)
+- SimpleSearchBackend   : icontains แบบเดิม (สำรองสำหรับฐานข้อมูลอื่น)
+
+ทุก backend คืนผลลัพธ์เป็น "ลิสต์ของ post id เรียงตามความเกี่ยวข้อง"
+ที่ใช้กับ Paginator ได้โดยตรง (มี count() และ slice ได้)
+index จะถูกอัปเดตโดย signal ใน posts/signals.py
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q, TextField, Value
+from django.utils.module_loading import import_string
+
+from .models import Category, Post, PostSearchDocument, Skill
+
+# คำค้นที่ใช้ได้: ตัวอักษร/ตัวเลขทุกภาษา (รวมสระและวรรณยุกต์ไทย)
+_TERM_RE = re.compile(r"[\w\u0e00-\u0e7f]+")
+
+# อักษรของภาษาที่ไม่เว้นวรรคระหว่างคำ (ไทย ลาว พม่า เขมร ญี่ปุ่น จีน)
+# tsvector แยกคำภาษาเหล่านี้ไม่ได้ จึงต้องค้นแบบคำที่อยู่กลางข้อความ
+_UNSEGMENTED_RE = re.compile(r"[\u0e00-\u0eff\u1000-\u109f\u1780-\u17ff\u3040-\u30ff\u4e00-\u9fff]")
+
+# ตาราง FTS5 ที่สร้างใน migration 0012 (เฉพาะ SQLite)
+SQLITE_FTS_TABLE = "posts_post_fts"
+
+# tokenizer trigram ของ FTS5 ค้นได้เฉพาะคำที่ยาวอย่างน้อย 3 ตัวอักษร
+SQLITE_MIN_MATCH_LENGTH = 3
+
+
+def _terms(query):
+    return _TERM_RE.findall(query or "")
+
+
+def _like_pattern(term):
+    # คำค้นมีแค่ตัวอักษร/ตัวเลข/_ จึง escape เพียง _ (wildcard ของ LIKE)
+    return "%" + term.replace("_", "\\_") + "%"
+
+
+def _document_parts(post_id):
+    """
+    ดึงข้อความที่ใช้ทำ index ของโพสต์หนึ่งโพสต์
+    คืน None ถ้าโพสต์ไม่ใช่ hiring/rental (ไม่แสดงในผลค้นหา)
+    """
+    post = (
+        Post.objects.filter(pk=post_id, type__in=("hiring", "rental"))
+        .values("title", "description")
+        .first()
+    )
+    if post is None:
+        return None
+
+    tags = list(Category.objects.filter(posts__pk=post_id).values_list("name", flat=True))
+    tags += Skill.objects.filter(hiring_posts__pk=post_id).values_list("name", flat=True)
+    return post["title"], post["description"] or "", " ".join(tags)
+
+
+class SearchResults:
+    """ลิสต์ post id แบบ lazy: query เฉพาะหน้าที่ถูก slice"""
+
+    def __init__(self, count_func, slice_func):
+        self._count_func = count_func
+        self._slice_func = slice_func
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self._count_func()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            stop = index.stop if index.stop is not None else self.count()
+            if stop <= start:
+                return []
+            return self._slice_func(start, stop - start)
+        return self._slice_func(index, 1)[0]
+
+
+class BaseSearchBackend:
+    def index_post(self, post_id):
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        raise NotImplementedError
+
+    def search(self, query):
+        raise NotImplementedError
+
+    def rebuild(self):
+        for post_id in Post.objects.values_list("pk", flat=True).iterator():
+            self.index_post(post_id)
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """ค้นหาด้วย icontains (ไม่มี index และไม่มีการจัดอันดับ)"""
+
+    def index_post(self, post_id):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def search(self, query):
+        return (
+            Post.objects.with_subtypes()
+            .filter(
+                Q(title__icontains=query)
+                | Q(description__icontains=query)
+                | Q(hiringpost__skills__name__icontains=query)
+                | Q(categories__name__icontains=query)
+            )
+            .distinct()
+            .order_by("-pk")
+            .values_list("pk", flat=True)
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """เก็บ tsvector ไว้ที่ PostSearchDocument และค้นผ่าน GIN index"""
+
+    config = "simple"
+
+    def index_post(self, post_id):
+        parts = _document_parts(post_id)
+        if parts is None:
+            self.remove_post(post_id)
+            return
+        title, description, tags = parts
+        vector = (
+            SearchVector(Value(title, output_field=TextField()), weight="A", config=self.config)
+            + SearchVector(Value(tags, output_field=TextField()), weight="B", config=self.config)
+            + SearchVector(Value(description, output_field=TextField()), weight="C", config=self.config)
+        )
+        document = " ".join((title, tags, description)).lower()
+        PostSearchDocument.objects.update_or_create(
+            post_id=post_id, defaults={"search_vector": vector, "document": document}
+        )
+
+    def remove_post(self, post_id):
+        PostSearchDocument.objects.filter(post_id=post_id).delete()
+
+    def search(self, query):
+        terms = _terms(query)
+        if not terms:
+            return SimpleSearchBackend().search(query)
+
+        # ทุกคำต้องตรง (AND)
+        # - คำที่เว้นวรรคได้: ค้นใน tsvector แบบ prefix (:*) เหมือนพิมพ์ไม่ครบคำ
+        # - คำภาษาที่ไม่เว้นวรรค: ค้นคำที่อยู่กลางข้อความด้วย LIKE (ใช้ GIN trigram index)
+        words = [term for term in terms if not _UNSEGMENTED_RE.search(term)]
+        substrings = [term.lower() for term in terms if _UNSEGMENTED_RE.search(term)]
+
+        queryset = Post.objects.with_subtypes()
+        for term in substrings:
+            queryset = queryset.filter(search_document__document__contains=term)
+        if not words:
+            return queryset.filter(search_document__isnull=False).order_by("-pk").values_list("pk", flat=True)
+
+        raw = " & ".join(f"{term}:*" for term in words)
+        search_query = SearchQuery(raw, config=self.config, search_type="raw")
+        return (
+            queryset.filter(search_document__search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_document__search_vector"), search_query))
+            .order_by("-rank", "-pk")
+            .values_list("pk", flat=True)
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    ใช้ตาราง FTS5 tokenizer แบบ trigram
+    ค้นคำที่อยู่กลางคำได้ (สำคัญกับภาษาไทยที่ไม่มีการเว้นวรรค)
+    จัดอันดับด้วย bm25 โดยให้น้ำหนัก title > tags > description
+    """
+
+    def index_post(self, post_id):
+        parts = _document_parts(post_id)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s", [post_id])
+            if parts is not None:
+                cursor.execute(
+                    f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, title, description, tags) "
+                    "VALUES (%s, %s, %s, %s)",
+                    [post_id, *parts],
+                )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s", [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_FTS_TABLE}")
+        super().rebuild()
+
+    def search(self, query):
+        terms = _terms(query)
+        if not terms:
+            return SimpleSearchBackend().search(query)
+
+        # ทุกคำต้องตรง (AND): คำยาวค้นผ่าน MATCH, คำสั้นกว่าที่ tokenizer รองรับค้นด้วย LIKE
+        # (LIKE ของ SQLite ไม่สนตัวพิมพ์เล็ก/ใหญ่ เหมือน icontains)
+        long_terms = [term for term in terms if len(term) >= SQLITE_MIN_MATCH_LENGTH]
+        short_terms = [term for term in terms if len(term) < SQLITE_MIN_MATCH_LENGTH]
+
+        where, params = [], []
+        if long_terms:
+            where.append(f"{SQLITE_FTS_TABLE} MATCH %s")
+            params.append(" AND ".join('"%s"' % term for term in long_terms))
+        for term in short_terms:
+            where.append(
+                "(title LIKE %s ESCAPE '\\' OR description LIKE %s ESCAPE '\\' OR tags LIKE %s ESCAPE '\\')"
+            )
+            params += [_like_pattern(term)] * 3
+        where = " AND ".join(where)
+        # bm25 ใช้ได้เฉพาะเมื่อมี MATCH
+        order = f"bm25({SQLITE_FTS_TABLE}, 10.0, 1.0, 5.0), rowid DESC" if long_terms else "rowid DESC"
+
+        def count():
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {SQLITE_FTS_TABLE} WHERE {where}", params)
+                return cursor.fetchone()[0]
+
+        def page(offset, limit):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {where} ORDER BY {order} LIMIT %s OFFSET %s",
+                    [*params, limit, offset],
+                )
+                return [row[0] for row in cursor.fetchall()]
+
+        return SearchResults(count, page)
+
+
+_backend = None
+
+
+def get_search_backend():
+    """
+    เลือก backend ตาม settings.POSTS_SEARCH_BACKEND (dotted path)
+    ถ้าไม่ได้ตั้งไว้ จะเลือกตามชนิดฐานข้อมูลที่ใช้อยู่
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "POSTS_SEARCH_BACKEND", None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == "postgresql":
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == "sqlite":
+            _backend = SQLiteSearchBackend()
+        else:
+            _backend = SimpleSearchBackend()
+    return _backend
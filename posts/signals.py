@@ -0,0 +1,280 @@
+from django.db.models import Count, F, Sum
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from .blobs import release_blob
+from .gc import log_deleted_files
+from .bookmarks import invalidate_booked_post_ids
+from .cache import bump_card_version, invalidate_home_feed
+from .models import (
+    Category,
+    HiringPost,
+    Media,
+    MediaBlob,
+    Post,
+    RentalPost,
+    Review,
+    SearchTrigram,
+    Skill,
+)
+from .search import get_search_backend
+from .trigram import get_trigram_index
+
+
+def _apply_rating_delta(post_id, count_delta, rating_delta):
+    # อัปเดตตัวนับด้วย F() ในคำสั่ง UPDATE เดียว
+    # ฐานข้อมูลเป็นคนบวก/ลบค่าเอง จึงไม่ชนกันเมื่อมีหลาย request พร้อมกัน
+    if not count_delta and not rating_delta:
+        return
+    Post.objects.filter(pk=post_id).update(
+        review_count=F("review_count") + count_delta,
+        rating_sum=F("rating_sum") + rating_delta,
+    )
+
+
+def recount_reviews(post_id):
+    # คำนวณตัวนับใหม่จากตาราง Review ทั้งหมด
+    # ใช้เฉพาะกรณีที่ไม่รู้ค่าเดิมของรีวิว (เช่น โหลดมาแบบ defer rating)
+    stats = Review.objects.filter(post_id=post_id).aggregate(
+        count=Count("id"), total=Sum("rating")
+    )
+    Post.objects.filter(pk=post_id).update(
+        review_count=stats["count"], rating_sum=stats["total"] or 0
+    )
+
+
+@receiver(post_init, sender=Review)
+def remember_review_state(sender, instance, **kwargs):
+    # จำค่า post/rating ตอนโหลดจาก DB ไว้
+    # เพื่อคำนวณส่วนต่างตอน update_or_create แก้ไขรีวิวเดิม
+    # (อ่านจาก __dict__ ตรงๆ เพื่อไม่ให้ field ที่ถูก defer ไปยิง query เพิ่ม)
+    loaded = instance.pk is not None
+    instance._saved_post_id = instance.__dict__.get("post_id") if loaded else None
+    instance._saved_rating = instance.__dict__.get("rating") if loaded else None
+
+
+@receiver(post_save, sender=Review)
+def update_rating_counters_on_save(sender, instance, created, **kwargs):
+    rating = int(instance.rating)
+    old_post_id = instance._saved_post_id
+    old_rating = instance._saved_rating
+
+    if created:
+        _apply_rating_delta(instance.post_id, 1, rating)
+    elif old_post_id is None or old_rating is None:
+        recount_reviews(instance.post_id)
+    elif old_post_id != instance.post_id:
+        # รีวิวถูกย้ายไปโพสต์อื่น: หักออกจากโพสต์เดิม แล้วบวกเข้าโพสต์ใหม่
+        _apply_rating_delta(old_post_id, -1, -int(old_rating))
+        _apply_rating_delta(instance.post_id, 1, rating)
+    else:
+        _apply_rating_delta(instance.post_id, 0, rating - int(old_rating))
+
+    instance._saved_post_id = instance.post_id
+    instance._saved_rating = rating
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_counters_on_delete(sender, instance, **kwargs):
+    if instance._saved_rating is None:
+        recount_reviews(instance.post_id)
+        return
+    _apply_rating_delta(instance._saved_post_id, -1, -int(instance._saved_rating))
+
+
+@receiver(m2m_changed, sender=Post.bookings.through)
+def invalidate_bookmark_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    # ลบ cache รายการจองของผู้ใช้ที่ได้รับผลกระทบ
+    # ไม่ว่าจะเปลี่ยนจากฝั่ง post.bookings หรือ user.booked_posts (รวมถึงหน้า admin)
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        # instance คือ User
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        user_ids = list(instance.bookings.values_list("pk", flat=True))
+    else:
+        user_ids = pk_set or []
+
+    for user_id in user_ids:
+        invalidate_booked_post_ids(user_id)
+
+
+# ---------------------------------------------------------------
+# Media: รูปของโพสต์เปลี่ยน -> รูปปก / cache การ์ด / feed หน้าแรก
+# ---------------------------------------------------------------
+def media_changed(post_id):
+    """
+    อัปเดตทุกอย่างที่ขึ้นกับรูปของโพสต์ (Post.cover_image = Media ตัวแรกของโพสต์)
+    เรียกตรง ๆ หลัง bulk_create / delete ที่ไม่ส่ง signal ของ Media
+    """
+    Post.objects.filter(pk=post_id).refresh_cover_image()
+    bump_card_version(post_id)
+    invalidate_home_feed(post_id)
+
+
+@receiver(post_save, sender=Media)
+@receiver(post_delete, sender=Media)
+def update_post_on_media_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    media_changed(instance.post_id)
+
+
+@receiver(post_delete, sender=Media)
+def release_media_files(sender, instance, **kwargs):
+    # ไฟล์อาจใช้ร่วมกับ Media อื่น ลบไฟล์จริงเมื่อ Media ตัวสุดท้ายถูกลบเท่านั้น
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+    else:
+        # Media ที่ไม่มี blob (อัปโหลดก่อนมีระบบ blob): ให้ gc_media ตรวจแล้วลบทีหลัง
+        log_deleted_files(getattr(instance, field).name for field in MediaBlob.FILE_FIELDS)
+
+
+# ---------------------------------------------------------------
+# Card cache: เปลี่ยน version ของการ์ดเมื่อข้อมูลที่แสดงบนการ์ดเปลี่ยน
+# ---------------------------------------------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=HiringPost)
+@receiver(post_save, sender=RentalPost)
+@receiver(post_delete, sender=Post)
+def bump_card_on_post_change(sender, instance, **kwargs):
+    bump_card_version(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_card_on_review_change(sender, instance, **kwargs):
+    # คะแนนรีวิวของโพสต์เปลี่ยน
+    bump_card_version(instance.post_id)
+
+
+# ---------------------------------------------------------------
+# Home feed: ลบ feed หน้าแรกที่ cache ไว้เมื่อข้อมูลที่แสดงเปลี่ยน
+# ---------------------------------------------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=HiringPost)
+@receiver(post_save, sender=RentalPost)
+def invalidate_home_feed_on_post_save(sender, instance, created, **kwargs):
+    # โพสต์ใหม่จะขึ้นหน้าแรกเสมอ ส่วนการแก้ไขมีผลเฉพาะโพสต์ที่แสดงอยู่
+    invalidate_home_feed(None if created else instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_home_feed_on_change(sender, instance, **kwargs):
+    invalidate_home_feed(instance.pk if sender is Post else instance.post_id)
+
+
+# ---------------------------------------------------------------
+# Search index: อัปเดต index ทุกครั้งที่โพสต์หรือ tag ของโพสต์เปลี่ยน
+# ---------------------------------------------------------------
+def _reindex_posts(post_ids):
+    backend = get_search_backend()
+    for post_id in set(post_ids):
+        backend.index_post(post_id)
+
+
+def _tagged_post_ids(tag):
+    if isinstance(tag, Category):
+        return list(tag.posts.values_list("pk", flat=True))
+    return list(tag.hiring_posts.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=HiringPost)
+@receiver(post_save, sender=RentalPost)
+def index_post_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    # ลบ HiringPost/RentalPost จะลบแถว Post แม่ด้วยเสมอ จึงฟังแค่ Post พอ
+    get_search_backend().remove_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+@receiver(m2m_changed, sender=HiringPost.skills.through)
+def reindex_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance คือโพสต์
+        if action in ("post_add", "post_remove", "post_clear"):
+            _reindex_posts([instance.pk])
+        return
+
+    # instance คือ Category/Skill และ pk_set คือ id ของโพสต์
+    if action == "pre_clear":
+        instance._search_post_ids = _tagged_post_ids(instance)
+    elif action == "post_clear":
+        _reindex_posts(getattr(instance, "_search_post_ids", []))
+    elif action in ("post_add", "post_remove"):
+        _reindex_posts(pk_set or [])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Skill)
+def reindex_on_tag_renamed(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    _reindex_posts(_tagged_post_ids(instance))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Skill)
+def remember_tagged_posts(sender, instance, **kwargs):
+    # ความสัมพันธ์ M2M ถูกลบแบบ cascade โดยไม่มี m2m_changed
+    # จึงต้องจำ id โพสต์ไว้ก่อน แล้วค่อย reindex หลังลบเสร็จ
+    instance._search_post_ids = _tagged_post_ids(instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Skill)
+def reindex_on_tag_deleted(sender, instance, **kwargs):
+    _reindex_posts(getattr(instance, "_search_post_ids", []))
+
+
+# ---------------------------------------------------------------
+# Trigram index: ชื่อโพสต์ / skill / category สำหรับ autocomplete
+# ---------------------------------------------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=HiringPost)
+@receiver(post_save, sender=RentalPost)
+def index_post_title(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index = get_trigram_index()
+    if instance.type in ("hiring", "rental"):
+        index.index(SearchTrigram.KIND_POST, instance.pk, instance.title)
+    else:
+        index.remove(SearchTrigram.KIND_POST, instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Skill)
+def index_tag_name(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    kind = SearchTrigram.KIND_CATEGORY if sender is Category else SearchTrigram.KIND_SKILL
+    get_trigram_index().index(kind, instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Skill)
+def remove_from_trigram_index(sender, instance, **kwargs):
+    kind = {
+        Post: SearchTrigram.KIND_POST,
+        Category: SearchTrigram.KIND_CATEGORY,
+        Skill: SearchTrigram.KIND_SKILL,
+    }[sender]
+    get_trigram_index().remove(kind, instance.pk)
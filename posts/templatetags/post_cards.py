@@ -0,0 +1,49 @@
+"""
+{% card_cache %}: cache HTML ส่วนหนึ่งของการ์ดโพสต์ ตาม POSTS_CARD_CACHE_TIMEOUT
+
+    # view
+    "hiring_items": attach_card_versions(items, "hiring_card")
+
+    {% load post_cards %}
+    {% card_cache item %} ... {% end_card_cache %}
+
+HTML ที่อยู่ใน cache แล้วถูกอ่านมาพร้อมกันทั้งหน้าโดย attach_card_versions (posts/cache.py)
+tag แค่หยิบจาก item และเขียน cache เฉพาะการ์ดที่ยังไม่มี
+ถ้าอายุเป็น 0 (ปิด) หรือ item ไม่ได้ผ่าน attach_card_versions จะ render ตรงๆ โดยไม่แตะ cache
+
+ส่วนที่ cache ต้องเป็น element ที่ครบในตัว และไม่มี URL รูปภาพ
+(URL ของรูปเปลี่ยนได้โดยที่ version ของการ์ดไม่เปลี่ยน เช่น ย้าย storage หรือ signed URL หมดอายุ)
+"""
+from django import template
+from django.core.cache import cache
+
+from ..cache import card_cache_timeout
+
+register = template.Library()
+
+
+class CardCacheNode(template.Node):
+    def __init__(self, nodelist, item):
+        self.nodelist = nodelist
+        self.item = item
+
+    def render(self, context):
+        timeout = card_cache_timeout()
+        item = self.item.resolve(context)
+        if not timeout or "card_key" not in item:
+            return self.nodelist.render(context)
+
+        if item["card_html"] is None:
+            item["card_html"] = self.nodelist.render(context)
+            cache.set(item["card_key"], item["card_html"], timeout)
+        return item["card_html"]
+
+
+@register.tag("card_cache")
+def do_card_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError("'card_cache' tag requires the card item.")
+    nodelist = parser.parse(("end_card_cache",))
+    parser.delete_first_token()
+    return CardCacheNode(nodelist, parser.compile_filter(bits[1]))
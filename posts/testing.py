@@ -0,0 +1,30 @@
+"""ตัวช่วยสำหรับเทสต์ของ app ต่าง ๆ"""
+from django.conf import settings
+
+from .query_budget import QueryRecorder
+
+
+class QueryBudgetTestMixin:
+    """
+    ใช้คู่กับ TestCase: ตรวจว่า view ใช้ query ไม่เกินงบ และไม่มี query รูปเดิมซ้ำ (N+1)
+
+        response = self.assertQueryBudget(reverse("posts:hiring"), 5)
+    """
+
+    def assertQueryBudget(self, url, max_queries, method="get", data=None, repeat_threshold=None, **extra):
+        with QueryRecorder() as recorder:
+            response = getattr(self.client, method)(url, data, **extra)
+
+        listing = "\n".join(f"  {i}. {sql}" for i, (sql, _) in enumerate(recorder.queries, 1))
+        self.assertLessEqual(
+            recorder.count,
+            max_queries,
+            f"{url} ran {recorder.count} queries (budget {max_queries}):\n{listing}",
+        )
+        repeated = recorder.repeated(repeat_threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD)
+        self.assertFalse(
+            repeated,
+            f"{url} repeats the same query (N+1):\n"
+            + "\n".join(f"  {n}x {shape}" for shape, n in repeated),
+        )
+        return response
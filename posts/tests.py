@@ -1,13 +1,49 @@
-from django.test import TestCase, Client, override_settings
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Post, RentalPost, HiringPost, Media, Skill, Category, Review
+from .models import (
+    Post, RentalPost, HiringPost, Media, MediaBlob, Skill, Category, Review, Job, DeletedFile, SearchTrigram
+)
+from .blobs import content_hash
+from .gc import delete_files
+from .images import attach_images
+from .jobs import enqueue, run_pending_jobs
+from .search import PostgresSearchBackend
+from .trigram import TableTrigramIndex
+from . import bench, views
+from .db_router import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .db_stats import connection_stats, reset_connection_stats
+from .media_serving import serve_media
+from .query_plans import find_seq_scans
+from .testing import QueryBudgetTestMixin
+from .upload_handlers import ImageUploadHandler, rejected_uploads
+from .media_urls import clear_url_cache, media_url, url_cache_stats
+from django.utils import timezone
 from posts.forms import HiringPostForm, RentalPostForm, ReviewForm
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils.http import urlencode
 from django.db.models import Q
+from django.db import DatabaseError, connection
+from unittest import mock, skipUnless
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import Http404, HttpResponse
+import os
+import runpy
+import shutil
+import tempfile
 
 # Create your tests here.
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class PostIntegrationTestCase(TestCase):
     def setUp(self):
         
@@ -132,6 +168,114 @@ class PostIntegrationTestCase(TestCase):
         # ตรวจสอบว่า price_detail มี "/วัน" สำหรับ RentalPost
         self.assertIn('/วัน', formatted_item['price_detail'])
     
+    # แบ่งหน้าแบบ cursor: ?after=<id> ไปหน้าถัดไป, ?before=<id> ย้อนกลับ
+    def test_hiring_page_keyset_pagination(self):
+        url = reverse('posts:hiring')
+        first = self.client.get(url).context['page_obj']
+        first_ids = [post.id for post in first]
+        self.assertFalse(first.has_previous())
+        self.assertIsNone(first.previous_cursor)
+        self.assertEqual(first.next_cursor, first_ids[-1])
+
+        # หน้าถัดไปมีโพสต์ที่เหลืออีก 2 โพสต์
+        second = self.client.get(url, {'after': first.next_cursor}).context['page_obj']
+        second_ids = [post.id for post in second]
+        self.assertEqual(len(second_ids), 2)
+        self.assertTrue(all(i < min(first_ids) for i in second_ids))
+        self.assertIsNone(second.next_cursor)
+        self.assertContains(self.client.get(url, {'after': first.next_cursor}), f'?before={second_ids[0]}')
+
+        # ย้อนกลับมาได้หน้าแรกเหมือนเดิม
+        back = self.client.get(url, {'before': second.previous_cursor}).context['page_obj']
+        self.assertEqual([post.id for post in back], first_ids)
+        self.assertFalse(back.has_previous())
+
+        # cursor ที่ไม่ใช่ตัวเลขถือว่าเป็นหน้าแรก
+        invalid = self.client.get(url, {'after': 'abc'}).context['page_obj']
+        self.assertEqual([post.id for post in invalid], first_ids)
+
+    # flag ทั้งสองฝั่งมาจากข้อมูลจริง ไม่ใช่จากทิศทางของ cursor
+    def test_keyset_pagination_flags_at_the_edges(self):
+        url = reverse('posts:hiring')
+        oldest = HiringPost.objects.order_by('pk').first().pk
+
+        # cursor ที่เลยโพสต์สุดท้าย: หน้าว่างแต่ยังย้อนกลับได้
+        empty = self.client.get(url, {'after': oldest}).context['page_obj']
+        self.assertEqual(len(empty), 0)
+        self.assertTrue(empty.has_previous())
+
+        # ย้อนกลับไปหน้าที่มีโพสต์เก่าที่สุด ไม่มีหน้าถัดไปแล้ว
+        last = self.client.get(url, {'before': empty.previous_cursor}).context['page_obj']
+        self.assertEqual([post.id for post in last][-1], oldest)
+        self.assertFalse(last.has_next())
+        self.assertIsNone(last.next_cursor)
+        self.assertTrue(last.has_previous())
+
+    # หน้า feed ไม่ต้องนับจำนวนโพสต์ทั้งหมด (ไม่มี COUNT)
+    def test_feed_has_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:rental'), {'after': self.rental_posts[-1].id})
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+
+    # จำนวน query ของหน้า feed ต้องคงที่ ไม่ว่าจะมีการ์ดกี่ใบ
+    def test_feed_query_count_is_constant(self):
+        url = reverse('posts:hiring')
+        with CaptureQueriesContext(connection) as full_page:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['hiring_items']), 6)
+
+        # ลบโพสต์ให้เหลือใบเดียว
+        HiringPost.objects.exclude(pk=self.hiring_posts[0].pk).delete()
+        with CaptureQueriesContext(connection) as single_card:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['hiring_items']), 1)
+
+        self.assertEqual(len(full_page), len(single_card))
+
+    # รูปปกถูกเก็บไว้บน Post และเปลี่ยนตาม Media ที่เพิ่ม/ลบ
+    def test_cover_image_follows_media(self):
+        post = HiringPost.objects.create(author=self.user, title="No media", budgetMin=1, budgetMax=2)
+        self.assertEqual(post.cover_image, "")
+
+        first = Media.objects.create(post=post, image="media_images/first.jpg")
+        Media.objects.create(post=post, image="media_images/second.jpg")
+        post.refresh_from_db()
+        self.assertEqual(post.cover_image, "media_images/first.jpg")
+
+        first.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.cover_image, "media_images/second.jpg")
+
+        # บันทึกโพสต์ที่โหลดมาก่อนหน้า ต้องไม่เขียนทับรูปปกด้วยค่าเก่า
+        stale = HiringPost.objects.get(pk=post.pk)
+        Media.objects.filter(post=post).delete()
+        Media.objects.create(post=post, image="media_images/third.jpg")
+        stale.title = "Edited"
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.cover_image, "media_images/third.jpg")
+
+    # หน้า feed แสดงรูปปกโดยไม่ query ตาราง Media
+    def test_feed_does_not_query_media(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:hiring'))
+        self.assertTrue(response.context['hiring_items'][0]['image_url'].startswith('/media/'))
+        self.assertFalse(any('posts_media' in query['sql'] for query in queries))
+
+    # การ์ดจาก cards() มีรูปปกและสถานะการจองของผู้ใช้
+    def test_cards_queryset_annotations(self):
+        post = self.hiring_posts[0]
+        post.bookings.add(self.user)
+
+        cards = {p.id: p for p in HiringPost.objects.cards(self.user)}
+        self.assertTrue(cards[post.id].is_booked)
+        self.assertFalse(cards[self.hiring_posts[1].id].is_booked)
+        self.assertEqual(cards[post.id].cover_image, post.media.order_by('id').first().image.name)
+
+        # ผู้ใช้ที่ไม่ได้ login จะไม่มี is_booked
+        anonymous = HiringPost.objects.cards().get(pk=post.pk)
+        self.assertFalse(hasattr(anonymous, 'is_booked'))
+
     # ข้อมูลของโพสต์ hiring page ครบถ้วน 
     def test_detail_post_hiring(self):
         post = self.hiring_posts[0]
@@ -230,6 +374,7 @@ class PostIntegrationTestCase(TestCase):
         self.assertEqual(str(media_without_image), f"Media for Post ID: {post.id}")
 
 # class แยกสำหรับทดสอบเวลาสร้างโพสต์     
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class PostCreationTests(TestCase):
     def setUp(self):
         # สร้าง user
@@ -287,7 +432,7 @@ class PostCreationTests(TestCase):
         # สร้างข้อมูลทดสอบและรูปภาพ
         test_image = SimpleUploadedFile(
             name="test_image.jpg",
-            content=b"test image content",
+            content=b"\xff\xd8\xff\xe0test image content",
             content_type="image/jpeg"
         )
         
@@ -326,7 +471,7 @@ class PostCreationTests(TestCase):
         # สร้างข้อมูลทดสอบและรูปภาพ
         test_image = SimpleUploadedFile(
             name="test_image.jpg",
-            content=b"test image content",
+            content=b"\xff\xd8\xff\xe0test image content",
             content_type="image/jpeg"
         )
         
@@ -356,7 +501,7 @@ class PostCreationTests(TestCase):
          # สร้างข้อมูลทดสอบและรูปภาพ
         test_image = SimpleUploadedFile(
             name="test_image.jpg",
-            content=b"test image content",
+            content=b"\xff\xd8\xff\xe0test image content",
             content_type="image/jpeg"
         )
         
@@ -391,7 +536,7 @@ class PostCreationTests(TestCase):
         
         test_image = SimpleUploadedFile(
             name="test_image.jpg",
-            content=b"test image content",
+            content=b"\xff\xd8\xff\xe0test image content",
             content_type="image/jpeg"
         )
         
@@ -437,7 +582,7 @@ class PostCreationTests(TestCase):
         # สร้างข้อมูลทดสอบและรูปภาพ
         test_image = SimpleUploadedFile(
             name="test_image.jpg",
-            content=b"dummy_image_content",
+            content=b"\xff\xd8\xff\xe0dummy_image_content",
             content_type="image/jpeg"
         )
 
@@ -487,6 +632,7 @@ class PostCreationTests(TestCase):
         media_objects = Media.objects.filter(post=post)
         self.assertEqual(media_objects.count(), 0)
         
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class PostViewTests(TestCase):
     def setUp(self):
         # สร้าง user 2 คน
@@ -641,7 +787,7 @@ class PostViewTests(TestCase):
         # สร้างข้อมูลทดสอบและรูปภาพ
         test_image = SimpleUploadedFile(
             name="test_image.jpg",
-            content=b"dummy_image_content",
+            content=b"\xff\xd8\xff\xe0dummy_image_content",
             content_type="image/jpeg"
         )
 
@@ -778,6 +924,45 @@ class ReviewViewTests(TestCase):
 
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse("posts:detail_post", args=[self.post.id]))
+
+    def test_review_counters_follow_create_update_delete(self):
+        # ตัวนับรีวิวบน Post ต้องอัปเดตตามการสร้าง/แก้ไข/ลบรีวิว
+        self.client.login(username="reviewer", password="1234567")
+
+        # สร้างรีวิวใหม่
+        self.client.post(self.url, {"rating": 4, "comment": "Good!"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.review_count, 1)
+        self.assertEqual(self.post.rating_sum, 4)
+
+        # แก้ไขรีวิวเดิมผ่าน update_or_create => จำนวนเท่าเดิม แต่คะแนนเปลี่ยน
+        self.client.post(self.url, {"rating": 2, "comment": "Changed"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.review_count, 1)
+        self.assertEqual(self.post.rating_sum, 2)
+
+        # เพิ่มรีวิวจากอีกคน
+        other = User.objects.create_user(username="other", password="123")
+        Review.objects.create(post=self.post, author=other, rating=5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.count_reviews, 2)
+        self.assertEqual(self.post.avg_rating, 3.5)
+
+        # ลบรีวิว (ทั้งแบบ instance และแบบ queryset)
+        Review.objects.get(author=other).delete()
+        Review.objects.filter(author=self.reviewer).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.review_count, 0)
+        self.assertEqual(self.post.rating_sum, 0)
+        self.assertEqual(self.post.avg_rating, 0)
+
+    def test_rating_properties_do_not_query(self):
+        # อ่าน avg_rating / count_reviews จากตัวนับ ไม่ต้องยิง query
+        Review.objects.create(post=self.post, author=self.reviewer, rating=3)
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(post.avg_rating, 3)
+            self.assertEqual(post.count_reviews, 1)
         
 class BookingViewTests(TestCase):
 
@@ -859,6 +1044,40 @@ class BookingViewTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse("posts:hiring"))
     
+    def test_booked_ids_loaded_once_per_request(self):
+        # โหลด set ของโพสต์ที่จองไว้ครั้งเดียว ไม่ว่าหน้าจะมีการ์ดกี่ใบ
+        from posts.bookmarks import get_booked_post_ids
+        from django.test import RequestFactory
+
+        self.rental.bookings.add(self.test)
+        request = RequestFactory().get("/")
+        request.user = self.test
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_booked_post_ids(request), {self.rental.id})
+            self.assertIn(self.rental.id, get_booked_post_ids(request))
+
+    @override_settings(POSTS_BOOKMARK_CACHE_TIMEOUT=300)
+    def test_toggle_invalidates_cached_bookmarks(self):
+        # เปิด cache ข้าม request แล้ว toggle ต้องเห็นผลทันทีใน request ถัดไป
+        self.client.login(username="test", password="123456")
+        detail_url = reverse("posts:detail_post", args=[self.hiring.id])
+
+        self.assertFalse(self.client.get(detail_url).context["is_booked"])
+        self.client.get(self.toggle_url_hiring)
+        self.assertTrue(self.client.get(detail_url).context["is_booked"])
+
+        # เปลี่ยนจากฝั่งอื่น (เช่นหน้า admin) ก็ต้องล้าง cache ด้วย
+        self.test.booked_posts.remove(self.hiring)
+        self.assertFalse(self.client.get(detail_url).context["is_booked"])
+
+    def test_feed_marks_booked_cards(self):
+        self.hiring.bookings.add(self.test)
+        self.client.login(username="test", password="123456")
+
+        items = self.client.get(reverse("posts:hiring")).context["hiring_items"]
+        self.assertTrue(items[0]["is_booked"])
+
     def test_my_booking_view_has_items(self):
         # มีการจอง และแสดงโพสต์ที่จองถูกต้อง
         # user จอง rental/hiring
@@ -989,4 +1208,1182 @@ class SearchViewTests(TestCase):
         self.assertEqual(len(items), 2)
 
         # เรียงจาก id มาก → น้อย
-        self.assertGreater(items[0]["id"], items[1]["id"])
\ No newline at end of file
+        self.assertGreater(items[0]["id"], items[1]["id"])
+
+    def test_search_results_are_paginated_in_database(self):
+        # สร้างโพสต์ให้เกิน 1 หน้า (หน้าละ 12)
+        for i in range(13):
+            HiringPost.objects.create(
+                author=self.user,
+                title=f"Drone pilot {i}",
+                budgetMin=100,
+                budgetMax=200,
+            )
+
+        response = self.client.get(self.search_url, {"q": "Drone"})
+        self.assertEqual(len(response.context["search_items"]), 12)
+        self.assertEqual(response.context["result_count"], 13)
+
+        response = self.client.get(self.search_url, {"q": "Drone", "page": 2})
+        self.assertEqual(len(response.context["search_items"]), 1)
+
+    def test_search_query_count_is_constant(self):
+        # จำนวน query ของหน้าค้นหาไม่ขึ้นกับจำนวนผลลัพธ์ในหน้า
+        RentalPost.objects.create(
+            author=self.user,
+            title="Photographer equipment",
+            pricePerDay=350,
+        )
+        with CaptureQueriesContext(connection) as two_results:
+            response = self.client.get(self.search_url, {"q": "Photographer"})
+        self.assertEqual(len(response.context["search_items"]), 2)
+
+        for i in range(4):
+            HiringPost.objects.create(
+                author=self.user, title=f"Photographer {i}", budgetMin=1, budgetMax=2
+            )
+        with CaptureQueriesContext(connection) as six_results:
+            response = self.client.get(self.search_url, {"q": "Photographer"})
+        self.assertEqual(len(response.context["search_items"]), 6)
+
+        self.assertEqual(len(two_results), len(six_results))
+
+        # ผลลัพธ์ผสม hiring + rental ได้ราคาตามประเภทของโพสต์
+        prices = [item["price_detail"] for item in response.context["search_items"]]
+        self.assertTrue(any("/วัน" in price for price in prices))
+
+    def test_search_ranks_title_matches_first(self):
+        # คำที่ตรงกับชื่อโพสต์ต้องได้อันดับดีกว่าคำที่อยู่แค่ในรายละเอียด
+        in_title = HiringPost.objects.create(
+            author=self.user, title="Videographer needed", budgetMin=1, budgetMax=2
+        )
+        # โพสต์นี้ใหม่กว่า (id มากกว่า) แต่ต้องไม่ถูกดันขึ้นมาก่อนเพราะ id
+        in_description = HiringPost.objects.create(
+            author=self.user,
+            title="Weekend job",
+            description="Need a videographer with drone",
+            budgetMin=1,
+            budgetMax=2,
+        )
+
+        items = self.client.get(self.search_url, {"q": "videographer"}).context["search_items"]
+        self.assertEqual([item["id"] for item in items], [in_title.id, in_description.id])
+
+    def test_search_index_follows_tags_and_delete(self):
+        # เปลี่ยนชื่อ Category / ลบโพสต์ ต้องอัปเดต index ตาม
+        self.category.name = "Tripod"
+        self.category.save()
+        items = self.client.get(self.search_url, {"q": "Tripod"}).context["search_items"]
+        self.assertEqual([item["id"] for item in items], [self.rental_post.id])
+
+        self.rental_post.delete()
+        response = self.client.get(self.search_url, {"q": "Tripod"})
+        self.assertEqual(response.context["result_count"], 0)
+
+    def test_search_thai_substring(self):
+        # ภาษาไทยไม่มีการเว้นวรรค ต้องค้นคำที่อยู่กลางข้อความได้
+        post = RentalPost.objects.create(
+            author=self.user, title="ให้เช่ายืมกล้องถ่ายรูป", pricePerDay=100
+        )
+        items = self.client.get(self.search_url, {"q": "กล้อง"}).context["search_items"]
+        self.assertEqual([item["id"] for item in items], [post.id])
+
+    def test_postgres_backend_matches_thai_inside_words(self):
+        # tsvector แยกคำไทยไม่ได้ คำไทยต้องค้นกลางข้อความด้วย LIKE แทน tsquery
+        sql = str(PostgresSearchBackend().search("กล้อง").query)
+        self.assertIn("LIKE", sql)
+        self.assertIn("%กล้อง%", sql)
+        self.assertNotIn("to_tsquery", sql)
+
+    @skipUnless(connection.vendor == "postgresql", "ต้องใช้ PostgreSQL")
+    def test_postgres_search_finds_thai_substring(self):
+        backend = PostgresSearchBackend()
+        post = RentalPost.objects.create(
+            author=self.user, title="ให้เช่ายืมกล้องถ่ายรูป", pricePerDay=100
+        )
+        backend.index_post(post.id)
+        self.assertEqual(list(backend.search("กล้อง")), [post.id])
+        self.assertEqual(list(backend.search("ยืมกล้อง rent")), [])
+
+    def test_search_short_terms_are_not_dropped(self):
+        # คำสั้นกว่า 3 ตัวอักษรใช้ FTS5 trigram ไม่ได้ แต่ต้องยังเป็นเงื่อนไขของการค้นหา
+        tv = RentalPost.objects.create(author=self.user, title="Sony TV for rent", pricePerDay=100)
+        RentalPost.objects.create(author=self.user, title="Sony speaker for rent", pricePerDay=100)
+
+        items = self.client.get(self.search_url, {"q": "sony tv"}).context["search_items"]
+        self.assertEqual([item["id"] for item in items], [tv.id])
+        items = self.client.get(self.search_url, {"q": "tv"}).context["search_items"]
+        self.assertEqual([item["id"] for item in items], [tv.id])
+        response = self.client.get(self.search_url, {"q": "a_"})
+        self.assertEqual(response.context["result_count"], 0)
+
+    def test_search_suggests_similar_title_when_misspelled(self):
+        response = self.client.get(self.search_url, {"q": "Photograhper"})
+        self.assertEqual(response.context["result_count"], 0)
+        self.assertEqual(response.context["suggestions"], ["Photographer for wedding"])
+
+    def test_autocomplete_tolerates_typos(self):
+        response = self.client.get(reverse("posts:autocomplete"), {"q": "Photograper"})
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()["results"]
+        self.assertEqual(
+            [(item["type"], item["label"]) for item in results],
+            [("post", "Photographer for wedding"), ("skill", "Photography")],
+        )
+        self.assertEqual(
+            results[0]["url"], reverse("posts:detail_post", args=[self.hiring_post.id])
+        )
+
+    def test_autocomplete_ignores_short_query(self):
+        response = self.client.get(reverse("posts:autocomplete"), {"q": "c"})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_trigram_index_follows_rename_and_delete(self):
+        self.category.name = "Tripod"
+        self.category.save()
+        self.rental_post.delete()
+
+        results = self.client.get(reverse("posts:autocomplete"), {"q": "Tripd"}).json()["results"]
+        self.assertEqual([item["label"] for item in results], ["Tripod"])
+
+        results = self.client.get(reverse("posts:autocomplete"), {"q": "Camera for"}).json()["results"]
+        self.assertEqual(results, [])
+
+    def test_table_trigram_lookup_ranks_and_limits_in_sql(self):
+        index = TableTrigramIndex()
+        kind = SearchTrigram.KIND_SKILL
+        for pk, name in enumerate(["Photography", "Photo", "Photographer portrait", "Pottery"], start=100):
+            index.index(kind, pk, name)
+
+        with CaptureQueriesContext(connection) as queries:
+            results = index.lookup(kind, "Photo", limit=2)
+        self.assertEqual([text for _, text, _ in results], ["Photo", "Photography"])
+        self.assertEqual(results[0][2], 1.0)
+        sql = queries.captured_queries[-1]["sql"]
+        self.assertIn("ORDER BY", sql)
+        self.assertIn("LIMIT 2", sql)
+
+
+class PostSubtypeQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="123456")
+        self.hiring = HiringPost.objects.create(
+            author=self.user, title="Hire", budgetMin=100, budgetMax=200
+        )
+        self.rental = RentalPost.objects.create(
+            author=self.user, title="Rent", pricePerDay=100
+        )
+        # โพสต์ที่ไม่ใช่ hiring หรือ rental ต้องไม่ถูกดึงมา
+        Post.objects.create(author=self.user, title="Base Post")
+
+    def test_with_subtypes_downcasts_without_extra_queries(self):
+        with self.assertNumQueries(1):
+            posts = [
+                post.as_subtype()
+                for post in Post.objects.with_subtypes().cards().order_by("id")
+            ]
+        self.assertIsInstance(posts[0], HiringPost)
+        self.assertIsInstance(posts[1], RentalPost)
+        self.assertEqual(len(posts), 2)
+
+        # ค่าที่ annotate ไว้ถูกคัดลอกไปยัง object ลูก
+        self.user.booked_posts.add(self.hiring)
+        post = Post.objects.with_subtypes().cards(self.user).get(pk=self.hiring.pk).as_subtype()
+        self.assertTrue(post.is_booked)
+
+    def test_with_subtypes_limit_in_database(self):
+        newest = Post.objects.with_subtypes().order_by("-id")[:1]
+        self.assertEqual([post.as_subtype() for post in newest], [self.rental])
+
+
+@override_settings(POSTS_CARD_CACHE_TIMEOUT=300)
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="owner", password="123456")
+        self.viewer = User.objects.create_user(username="viewer", password="123456")
+        self.post = HiringPost.objects.create(
+            author=self.user, title="Cached Title", budgetMin=100, budgetMax=200
+        )
+        self.hiring_url = reverse("posts:hiring")
+
+    def test_card_is_served_from_cache_until_post_saved(self):
+        self.assertContains(self.client.get(self.hiring_url), "Cached Title")
+
+        # update() ไม่ส่ง signal: version เดิม จึงยังได้ HTML จาก cache
+        Post.objects.filter(pk=self.post.pk).update(title="Silent Title")
+        self.assertContains(self.client.get(self.hiring_url), "Cached Title")
+
+        # save() (เช่นจาก edit_post_view) ต้องเปลี่ยน version
+        self.post.title = "Edited Title"
+        self.post.save()
+        response = self.client.get(self.hiring_url)
+        self.assertContains(response, "Edited Title")
+        self.assertNotContains(response, "Cached Title")
+
+    def test_review_and_media_change_card(self):
+        self.assertContains(self.client.get(self.hiring_url), "รีวิวคนแรกเลยซิ")
+
+        Review.objects.create(post=self.post, author=self.viewer, rating=4)
+        self.assertContains(self.client.get(self.hiring_url), "(1 รีวิว)")
+
+        Media.objects.create(post=self.post, image="media_images/cover.jpg")
+        self.assertContains(self.client.get(self.hiring_url), "media_images/cover.jpg")
+
+    def test_booked_state_is_per_viewer(self):
+        self.post.bookings.add(self.viewer)
+
+        self.client.login(username="owner", password="123456")
+        self.assertNotContains(self.client.get(self.hiring_url), "is-booked")
+
+        self.client.login(username="viewer", password="123456")
+        self.assertContains(self.client.get(self.hiring_url), "is-booked")
+
+    def test_version_is_stable_until_changed(self):
+        def version():
+            return self.client.get(self.hiring_url).context["hiring_items"][0]["card_version"]
+
+        first = version()
+        self.assertEqual(version(), first)
+
+        Review.objects.create(post=self.post, author=self.viewer, rating=5)
+        self.assertNotEqual(version(), first)
+
+    def test_image_url_is_outside_cached_fragment(self):
+        # URL รูปเปลี่ยนได้โดยที่ version ไม่เปลี่ยน (ย้าย storage / signed URL) จึงต้องไม่ถูก cache
+        self.assertContains(self.client.get(self.hiring_url), "Cached Title")
+        Post.objects.filter(pk=self.post.pk).update(title="Silent Title", cover_image="media_images/moved.jpg")
+        response = self.client.get(self.hiring_url)
+        self.assertContains(response, "Cached Title")
+        self.assertContains(response, "media_images/moved.jpg")
+
+    def test_warm_page_reads_cards_in_one_round_trip(self):
+        for i in range(3):
+            HiringPost.objects.create(author=self.user, title=f"Card {i}", budgetMin=1, budgetMax=2)
+        self.client.get(self.hiring_url)
+
+        # version และ HTML ของทั้งหน้าอ่านด้วย get_many อย่างละครั้ง ไม่มี get / set ทีละการ์ด
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many, mock.patch(
+            "posts.templatetags.post_cards.cache"
+        ) as fragment_cache:
+            response = self.client.get(self.hiring_url)
+        self.assertContains(response, "Card 2")
+        self.assertEqual(get_many.call_count, 2)
+        self.assertEqual(fragment_cache.method_calls, [])
+
+    @override_settings(POSTS_CARD_CACHE_TIMEOUT=0)
+    def test_disabled_card_cache_skips_cache_entirely(self):
+        with mock.patch("posts.templatetags.post_cards.cache") as fragment_cache:
+            for url in (self.hiring_url, reverse("posts:rental"), reverse("home"), reverse("posts:search")):
+                self.client.get(url, {"q": "Cached"})
+        fragment_cache.get.assert_not_called()
+        fragment_cache.set.assert_not_called()
+
+
+def make_image_file(name="photo.png", size=(1200, 900), format="PNG", color=(200, 80, 40)):
+    # รูปจริงสำหรับทดสอบ (Pillow ต้องอ่านได้) สีต่างกัน = เนื้อไฟล์ต่างกัน
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f"image/{format.lower()}")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaVariantTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="minnie", email="minnie@dome.tu.ac.th", password="123456"
+        )
+        self.client.force_login(self.user)
+
+    def create_hiring(self, image):
+        self.client.post(
+            reverse("posts:create_hiring"),
+            {"title": "With photo", "budgetMin": 1, "budgetMax": 2, "images": [image]},
+        )
+        return HiringPost.objects.get(title="With photo")
+
+    def test_upload_generates_card_and_thumbnail_variants(self):
+        post = self.create_hiring(make_image_file())
+        media = post.media.get()
+
+        with Image.open(media.card_webp.path) as card:
+            self.assertEqual(card.format, "WEBP")
+            self.assertLessEqual(card.width, 640)
+            self.assertLessEqual(card.height, 480)
+        with Image.open(media.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 160))
+
+        # หน้า listing ใช้รูปขนาดการ์ด ส่วนหน้า detail ใช้รูปต้นฉบับ
+        item = self.client.get(reverse("posts:hiring")).context["hiring_items"][0]
+        self.assertEqual(item["image_url"], media.card_image.url)
+        self.assertEqual(item["image_webp_url"], media.card_webp.url)
+        detail = self.client.get(reverse("posts:detail_post", args=[post.id]))
+        self.assertContains(detail, media.image.url)
+
+    def test_multiple_images_inserted_in_one_query(self):
+        post = HiringPost.objects.create(author=self.user, title="Many", budgetMin=1, budgetMax=2)
+        files = [make_image_file(f"photo_{i}.png", color=(i, 0, 0)) for i in range(3)]
+        digests = [content_hash(f) for f in files]
+
+        with CaptureQueriesContext(connection) as queries:
+            attach_images(post, files)
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "posts_media"')]
+        self.assertEqual(len(inserts), 1)
+
+        # ลำดับรูปตรงกับลำดับที่อัปโหลด และรูปปกคือรูปแรก
+        media_list = post.media.select_related("blob").order_by("id")
+        self.assertEqual([media.blob.sha256 for media in media_list], digests)
+        post.refresh_from_db()
+        self.assertEqual(post.cover_image, post.media.order_by("id").first().card_image.name)
+
+    def test_failed_insert_removes_written_files(self):
+        post = HiringPost.objects.create(author=self.user, title="Fail", budgetMin=1, budgetMax=2)
+        storage = Media._meta.get_field("image").storage
+        saved = []
+        original_save = storage.save
+
+        def tracking_save(name, content, **kwargs):
+            saved.append(original_save(name, content, **kwargs))
+            return saved[-1]
+
+        with mock.patch.object(storage, "save", side_effect=tracking_save), \
+                mock.patch.object(Media.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                attach_images(
+                    post, [make_image_file("a.png"), make_image_file("b.png", color=(1, 2, 3))]
+                )
+
+        self.assertEqual(len(saved), 8)
+        self.assertFalse(any(storage.exists(name) for name in saved))
+        self.assertFalse(post.media.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_invalid_image_is_kept_without_variants(self):
+        post = self.create_hiring(
+            # header เป็น JPEG (ผ่าน ImageUploadHandler) แต่ Pillow อ่านไม่ได้
+            SimpleUploadedFile("broken.jpg", b"\xff\xd8\xff\xe0not an image", content_type="image/jpeg")
+        )
+        media = post.media.get()
+        self.assertFalse(media.card_image)
+
+        item = self.client.get(reverse("posts:hiring")).context["hiring_items"][0]
+        self.assertEqual(item["image_url"], media.image.url)
+        self.assertIsNone(item["image_webp_url"])
+
+    def test_backfill_command(self):
+        post = HiringPost.objects.create(author=self.user, title="Old", budgetMin=1, budgetMax=2)
+        media = Media.objects.create(post=post, image=make_image_file("old.png"))
+        self.assertFalse(media.card_image)
+
+        call_command("generate_media_variants", stdout=StringIO(), stderr=StringIO())
+
+        media.refresh_from_db()
+        post.refresh_from_db()
+        self.assertTrue(media.card_webp)
+        self.assertEqual(post.cover_image, media.card_image.name)
+        self.assertEqual(post.cover_webp, media.card_webp.name)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageUploadHandlerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="minnie", email="minnie@dome.tu.ac.th", password="123456"
+        )
+        self.client.force_login(self.user)
+
+    def create_hiring(self, *images, client=None):
+        return (client or self.client).post(
+            reverse("posts:create_hiring"),
+            {"title": "Upload", "budgetMin": 1, "budgetMax": 2, "images": list(images)},
+        )
+
+    def test_non_image_is_rejected(self):
+        response = self.create_hiring(
+            make_image_file(),
+            SimpleUploadedFile("script.jpg", b"<script>alert(1)</script>", content_type="image/jpeg"),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("script.jpg", str(response.context["form"].errors["images"]))
+        self.assertFalse(HiringPost.objects.exists())
+
+    def test_tiny_non_image_is_rejected(self):
+        response = self.create_hiring(SimpleUploadedFile("a.png", b"abc"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(HiringPost.objects.exists())
+
+    @override_settings(POSTS_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_file_is_rejected(self):
+        response = self.create_hiring(make_image_file())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ใหญ่เกินไป", str(response.context["form"].errors["images"]))
+
+    @override_settings(POSTS_MAX_UPLOAD_SIZE=64 * 1024)
+    def test_rejected_file_stops_reading_the_request(self):
+        # ไฟล์แรกใหญ่เกิน ไฟล์ที่สองไม่ใช่รูป: parser ต้องหยุดทันที ไม่อ่าน body ที่เหลือทิ้ง
+        for upload in (
+            SimpleUploadedFile("big.jpg", b"\xff\xd8\xff" + os.urandom(1024 * 1024)),
+            SimpleUploadedFile("script.jpg", b"<script>" * 128 * 1024),
+        ):
+            request = RequestFactory().post(reverse("posts:create_hiring"), {"title": "Upload", "images": [upload]})
+            request.upload_handlers = [ImageUploadHandler(request)]
+            request.POST
+            self.assertEqual(request.FILES.getlist("images"), [])
+            self.assertEqual(len(rejected_uploads(request)), 1)
+            self.assertGreater(len(request.environ["wsgi.input"]), 512 * 1024)
+
+    @override_settings(POSTS_MAX_UPLOAD_REQUEST_SIZE=1024)
+    def test_oversized_request_is_rejected_before_parsing(self):
+        response = self.create_hiring(make_image_file())
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(HiringPost.objects.exists())
+
+    def test_content_type_comes_from_file_header(self):
+        with mock.patch("posts.views.attach_images") as attach:
+            self.create_hiring(make_image_file("photo.jpg", format="PNG"))
+        upload = attach.call_args[0][1][0]
+        self.assertEqual(upload.content_type, "image/png")
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = self.create_hiring(make_image_file(), client=client)
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="minnie", email="minnie@dome.tu.ac.th", password="123456"
+        )
+        self.client.force_login(self.user)
+        self.storage = Media._meta.get_field("image").storage
+
+    def create_post(self, title):
+        return HiringPost.objects.create(author=self.user, title=title, budgetMin=1, budgetMax=2)
+
+    def test_same_photo_is_stored_once(self):
+        first, second = self.create_post("First"), self.create_post("Second")
+        attach_images(first, [make_image_file("a.png")])
+
+        with mock.patch.object(self.storage, "save") as save:
+            # อัปโหลดรูปเดิมซ้ำ (ชื่อไฟล์ต่างกัน) สองครั้งในโพสต์เดียว
+            attach_images(second, [make_image_file("b.png"), make_image_file("c.png")])
+        save.assert_not_called()
+
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        names = {(m.image.name, m.card_webp.name) for m in Media.objects.all()}
+        self.assertEqual(names, {(blob.image, blob.card_webp)})
+        second.refresh_from_db()
+        self.assertEqual(second.cover_webp, blob.card_webp)
+
+    def test_edit_reupload_does_not_write_new_files(self):
+        post = self.create_post("Edit")
+        attach_images(post, [make_image_file()])
+
+        with mock.patch.object(self.storage, "save") as save:
+            response = self.client.post(
+                reverse("posts:edit_post", args=[post.id]),
+                {"title": "Edit", "budgetMin": 1, "budgetMax": 2, "images": [make_image_file()]},
+            )
+        self.assertEqual(response.status_code, 302)
+        save.assert_not_called()
+        self.assertEqual(post.media.count(), 2)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+
+    def test_files_are_deleted_with_last_reference(self):
+        first, second = self.create_post("First"), self.create_post("Second")
+        attach_images(first, [make_image_file()])
+        attach_images(second, [make_image_file()])
+        blob = MediaBlob.objects.get()
+        names = blob.file_names()
+        self.assertEqual(len(names), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(all(self.storage.exists(name) for name in names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(any(self.storage.exists(name) for name in names))
+
+    @override_settings(POSTS_DIRECT_UPLOADS=True)
+    def test_duplicate_direct_upload_is_removed(self):
+        attach_images(self.create_post("First"), [make_image_file()])
+
+        body = make_image_file().read()
+        ticket = self.client.post(
+            reverse("posts:upload_ticket"), {"content_type": "image/png", "size": len(body)}
+        ).json()
+        self.client.put(ticket["url"], body, content_type="image/png")
+        self.client.post(
+            reverse("posts:create_hiring"),
+            {"title": "Direct", "budgetMin": 1, "budgetMax": 2, "upload_tokens": [ticket["token"]]},
+        )
+
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(HiringPost.objects.get(title="Direct").media.get().blob, blob)
+        self.assertFalse(self.storage.exists(ticket["key"]))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@override_settings(POSTS_MEDIA_ASYNC=True)
+class MediaJobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="minnie", email="minnie@dome.tu.ac.th", password="123456"
+        )
+        self.client.force_login(self.user)
+
+    def run_worker(self):
+        call_command("run_jobs", "--once", stdout=StringIO())
+
+    def test_upload_is_processed_by_worker(self):
+        response = self.client.post(
+            reverse("posts:create_hiring"),
+            {"title": "Queued", "budgetMin": 1, "budgetMax": 2, "images": [make_image_file()]},
+        )
+        self.assertEqual(response.status_code, 302)
+
+        # request เขียนเฉพาะรูปต้นฉบับลง storage คิวเก็บแค่ media_id ไม่ใช่เนื้อไฟล์
+        post = HiringPost.objects.get(title="Queued")
+        media = post.media.get()
+        self.assertTrue(media.image.name.startswith(f"media_images/uploads/{self.user.pk}/"))
+        self.assertTrue(media.image.storage.exists(media.image.name))
+        self.assertFalse(media.card_webp)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertEqual(job.payload, {"media_id": media.pk})
+
+        self.run_worker()
+
+        media.refresh_from_db()
+        post.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual(media.image.name, media.blob.image)
+        self.assertTrue(media.card_webp)
+        self.assertEqual(post.cover_image, media.card_image.name)
+        self.assertEqual(job.status, Job.STATUS_DONE)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = enqueue("generate_variants", payload={}, max_attempts=2)
+
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("KeyError", job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+        # ยังไม่ถึงเวลาลองใหม่ worker ต้องไม่หยิบงานนี้
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_handler_runs_outside_job_transaction(self):
+        # จองงาน / บันทึกผลเป็น transaction สั้นๆ แยกกัน handler (I/O ของ storage) อยู่นอก transaction
+        depth = []
+        enqueue("generate_variants", payload={"media_id": 0})
+        with mock.patch(
+            "posts.images.generate_variants_job",
+            side_effect=lambda job: depth.append(len(connection.savepoint_ids)),
+        ):
+            outside = len(connection.savepoint_ids)
+            self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(depth, [outside])
+        self.assertEqual(Job.objects.get().status, Job.STATUS_DONE)
+
+    def test_job_admin_changelist_opens(self):
+        enqueue("generate_variants", payload={"media_id": 0})
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+
+        response = self.client.get(reverse("admin:posts_job_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "generate_variants")
+
+    def test_job_for_deleted_post_is_done(self):
+        post = HiringPost.objects.create(author=self.user, title="Gone", budgetMin=1, budgetMax=2)
+        attach_images(post, [make_image_file()])
+        post.delete()
+
+        self.run_worker()
+        self.assertEqual(Job.objects.get().status, Job.STATUS_DONE)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@override_settings(POSTS_DIRECT_UPLOADS=True)
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="minnie", email="minnie@dome.tu.ac.th", password="123456"
+        )
+        self.client.force_login(self.user)
+
+    def upload(self, client=None):
+        # ขอ ticket แล้ว PUT ไฟล์ไปที่ปลายทาง (FileSystemStorage บนเครื่อง dev)
+        client = client or self.client
+        body = make_image_file().read()
+        ticket = client.post(
+            reverse("posts:upload_ticket"), {"content_type": "image/png", "size": len(body)}
+        ).json()
+        self.assertEqual(ticket["method"], "PUT")
+        response = client.put(ticket["url"], body, content_type="image/png")
+        self.assertEqual(response.status_code, 204)
+        return ticket
+
+    def create_hiring(self, tokens):
+        return self.client.post(
+            reverse("posts:create_hiring"),
+            {"title": "Direct", "budgetMin": 1, "budgetMax": 2, "upload_tokens": tokens},
+        )
+
+    def test_uploaded_file_is_attached_without_copying(self):
+        ticket = self.upload()
+        response = self.create_hiring([ticket["token"]])
+        self.assertEqual(response.status_code, 302)
+
+        media = HiringPost.objects.get(title="Direct").media.get()
+        self.assertEqual(media.image.name, ticket["key"])
+        self.assertTrue(media.card_webp)
+
+    def test_ticket_rejects_non_images_and_large_files(self):
+        url = reverse("posts:upload_ticket")
+        response = self.client.post(url, {"content_type": "text/html", "size": 10})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {"content_type": "image/png", "size": 50 * 1024 * 1024})
+        self.assertEqual(response.status_code, 400)
+
+    def test_put_must_match_ticket(self):
+        ticket = self.client.post(
+            reverse("posts:upload_ticket"), {"content_type": "image/png", "size": 10}
+        ).json()
+        response = self.client.put(ticket["url"], b"x" * 11, content_type="image/png")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put(ticket["url"], b"x" * 10, content_type="image/gif")
+        self.assertEqual(response.status_code, 400)
+
+    def test_uploaded_non_image_is_rejected(self):
+        # ticket ตรวจได้แค่ Content-Type ที่ผู้ใช้อ้าง ต้องดูไบต์จริงของไฟล์ก่อนผูกกับโพสต์
+        body = b"<script>alert(1)</script>"
+        ticket = self.client.post(
+            reverse("posts:upload_ticket"), {"content_type": "image/png", "size": len(body)}
+        ).json()
+        self.assertEqual(self.client.put(ticket["url"], body, content_type="image/png").status_code, 204)
+
+        response = self.create_hiring([ticket["token"]])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("รูปภาพ", str(response.context["form"].errors["images"]))
+        self.assertFalse(HiringPost.objects.exists())
+        self.assertFalse(Media._meta.get_field("image").storage.exists(ticket["key"]))
+
+    def test_token_of_another_user_or_reused_token_is_rejected(self):
+        other = User.objects.create_user(
+            username="mickey", email="mickey@dome.tu.ac.th", password="123456"
+        )
+        other_client = Client()
+        other_client.force_login(other)
+        response = self.create_hiring([self.upload(other_client)["token"]])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors["images"])
+        self.assertFalse(HiringPost.objects.exists())
+
+        token = self.upload()["token"]
+        self.assertEqual(self.create_hiring([token]).status_code, 302)
+        response = self.create_hiring([token])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(HiringPost.objects.count(), 1)
+
+    @override_settings(POSTS_DIRECT_UPLOADS=False)
+    def test_disabled_by_default(self):
+        response = self.client.post(
+            reverse("posts:upload_ticket"), {"content_type": "image/png", "size": 10}
+        )
+        self.assertEqual(response.status_code, 404)
+        page = self.client.get(reverse("posts:create_hiring"))
+        self.assertNotContains(page, "data-upload-ticket-url")
+
+
+class MediaGarbageCollectorTests(TestCase):
+    def setUp(self):
+        # ใช้ MEDIA_ROOT ชั่วคราว: โหมด --full ไล่ลบทุกไฟล์ที่ไม่มีแถวอ้างถึง
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(
+            username="minnie", email="minnie@dome.tu.ac.th", password="123456"
+        )
+        self.post = HiringPost.objects.create(author=self.user, title="GC", budgetMin=1, budgetMax=2)
+        self.storage = Media._meta.get_field("image").storage
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command("gc_media", *args, stdout=out)
+        return out.getvalue()
+
+    def test_files_of_deleted_media_are_collected_from_log(self):
+        other = HiringPost.objects.create(author=self.user, title="Other", budgetMin=1, budgetMax=2)
+        shared = Media.objects.create(post=self.post, image=make_image_file("shared.png"))
+        Media.objects.create(post=other, image=shared.image.name)
+        lone = Media.objects.create(post=self.post, image=make_image_file("lone.png"))
+
+        self.post.delete()
+        self.assertEqual(DeletedFile.objects.count(), 2)
+
+        self.assertIn("Would delete 1", self.gc("--dry-run"))
+        self.assertTrue(self.storage.exists(lone.image.name))
+        self.assertEqual(DeletedFile.objects.count(), 2)
+
+        self.assertIn("Deleted 1", self.gc())
+        self.assertFalse(self.storage.exists(lone.image.name))
+        self.assertTrue(self.storage.exists(shared.image.name))
+        self.assertFalse(DeletedFile.objects.exists())
+
+    def test_replaced_profile_image_is_collected(self):
+        profile = self.user.profile
+        profile.profile_image = make_image_file("old.png")
+        profile.save()
+        old_name = profile.profile_image.name
+
+        profile.profile_image = make_image_file("new.png")
+        profile.save()
+        self.assertEqual(list(DeletedFile.objects.values_list("name", flat=True)), [old_name])
+
+        self.gc()
+        self.assertFalse(self.storage.exists(old_name))
+        self.assertTrue(self.storage.exists(profile.profile_image.name))
+
+    def test_full_scan_skips_recent_and_referenced_files(self):
+        kept = Media.objects.create(post=self.post, image=make_image_file("kept.png"))
+        orphan = self.storage.save("media_images/uploads/1/abandoned.png", ContentFile(b"x"))
+
+        self.assertIn("Deleted 0", self.gc("--full"))
+        self.assertTrue(self.storage.exists(orphan))
+
+        self.assertIn("Deleted 1", self.gc("--full", "--min-age", "0"))
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(kept.image.name))
+
+    def test_s3_deletes_in_batches_of_1000(self):
+        s3 = mock.Mock(bucket_name="bucket", location="media")
+        s3.bucket.delete_objects.side_effect = lambda Delete: {"Deleted": Delete["Objects"]}
+        names = [f"media_images/{i}.png" for i in range(2500)]
+
+        with mock.patch("posts.gc._storage", return_value=s3):
+            self.assertEqual(delete_files(names), names)
+
+        calls = s3.bucket.delete_objects.call_args_list
+        self.assertEqual([len(c.kwargs["Delete"]["Objects"]) for c in calls], [1000, 1000, 500])
+        self.assertEqual(calls[0].kwargs["Delete"]["Objects"][0], {"Key": "media/media_images/0.png"})
+
+    def test_s3_failed_deletes_stay_in_log(self):
+        for name in ("media_images/ok.png", "media_images/locked.png"):
+            DeletedFile.objects.create(name=name)
+        s3 = mock.Mock(bucket_name="bucket", location="media")
+        s3.bucket.delete_objects.return_value = {
+            "Deleted": [{"Key": "media/media_images/ok.png"}],
+            "Errors": [{"Key": "media/media_images/locked.png", "Code": "AccessDenied", "Message": "Access Denied"}],
+        }
+
+        with mock.patch("posts.gc._storage", return_value=s3):
+            self.assertIn("Deleted 1", self.gc())
+        # ไฟล์ที่ลบไม่สำเร็จต้องถูกลองใหม่ในรอบถัดไป
+        self.assertEqual(list(DeletedFile.objects.values_list("name", flat=True)), ["media_images/locked.png"])
+
+
+
+class MediaServingTests(TestCase):
+    sha = "ab" * 32
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root, MEDIA_SERVE_MODE="django")
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.name = f"media_images/{self.sha}/photo.png"
+        Media._meta.get_field("image").storage.save(self.name, ContentFile(b"0123456789"))
+        self.factory = RequestFactory()
+
+    def get(self, path=None, **headers):
+        return serve_media(self.factory.get("/media/", headers=headers), path or self.name)
+
+    def test_full_response_has_strong_etag_and_immutable_cache(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_not_content_addressed_file_is_not_immutable(self):
+        Media._meta.get_field("image").storage.save("profile_images/me.png", ContentFile(b"x"))
+        self.assertEqual(self.get("profile_images/me.png")["Cache-Control"], "public, max-age=86400")
+
+    def test_matching_etag_returns_304(self):
+        etag = self.get()["ETag"]
+        response = self.get(If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_range_requests(self):
+        response = self.get(Range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+
+        response = self.get(Range="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        # If-Range ไม่ตรง = ไฟล์เปลี่ยนไปแล้ว ต้องส่งทั้งไฟล์
+        self.assertEqual(self.get(Range="bytes=2-5", If_Range='"old"').status_code, 200)
+
+        response = self.get(Range="bytes=20-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    @override_settings(MEDIA_SERVE_MODE="x-accel", MEDIA_ACCEL_PREFIX="/protected-media/")
+    def test_x_accel_redirect_offloads_to_proxy(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response.content, b"")
+        self.assertIn("ETag", response)
+
+    def test_missing_or_outside_files_are_rejected(self):
+        with self.assertRaises(Http404):
+            self.get("media_images/missing.png")
+        with self.assertRaises(Http404):
+            self.get("media_images")
+        with self.assertRaises(SuspiciousFileOperation):
+            self.get("../settings.py")
+
+
+class MediaURLCacheTests(TestCase):
+    def setUp(self):
+        clear_url_cache()
+        self.addCleanup(clear_url_cache)
+
+    def s3_storage(self, **options):
+        from storages.backends.s3boto3 import S3Boto3Storage
+
+        options.setdefault("bucket_name", "bucket")
+        options.setdefault("location", "media")
+        options.setdefault("region_name", "ap-southeast-1")
+        options.setdefault("custom_domain", None)
+        return S3Boto3Storage(**options)
+
+    def test_field_url_is_memoized(self):
+        user = User.objects.create_user(username="url", password="123456")
+        post = HiringPost.objects.create(author=user, title="URL", budgetMin=1, budgetMax=2)
+        media = Media.objects.create(post=post, image="media_images/a.png")
+
+        self.assertEqual(media.image.url, "/media/media_images/a.png")
+        self.assertEqual(Media.objects.get(pk=media.pk).image.url, "/media/media_images/a.png")
+        stats = url_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    @override_settings(POSTS_MEDIA_URL_CACHE_SIZE=2)
+    def test_least_recently_used_url_is_evicted(self):
+        media_url("a.png")
+        media_url("b.png")
+        media_url("a.png")
+        media_url("c.png")  # ตัด b ทิ้ง ไม่ใช่ a ที่เพิ่งใช้
+        media_url("a.png")
+        media_url("b.png")
+
+        stats = url_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 4, 2))
+        self.assertEqual(stats["size"], 2)
+
+    def test_public_s3_url_is_built_without_boto(self):
+        storage = self.s3_storage(custom_domain="cdn.example.com")
+        expected = storage.url("media_images/รูป 1.png")
+
+        with mock.patch.object(storage, "url", side_effect=AssertionError):
+            self.assertEqual(media_url("media_images/รูป 1.png", storage), expected)
+
+        storage = self.s3_storage(querystring_auth=False)
+        self.assertEqual(
+            media_url("media_images/a.png", storage),
+            "https://bucket.s3.ap-southeast-1.amazonaws.com/media/media_images/a.png",
+        )
+
+    def test_presigned_url_expires_before_signature(self):
+        storage = self.s3_storage(querystring_expire=3600)
+        with mock.patch.object(storage, "url", side_effect=["signed-1", "signed-2"]) as url, \
+                mock.patch("posts.media_urls.time.monotonic", return_value=1000):
+            self.assertEqual(media_url("a.png", storage), "signed-1")
+            self.assertEqual(media_url("a.png", storage), "signed-1")
+            with mock.patch("posts.media_urls.time.monotonic", return_value=1000 + 1801):
+                self.assertEqual(media_url("a.png", storage), "signed-2")
+        self.assertEqual(url.call_count, 2)
+
+
+class ConnectionStatsTests(TestCase):
+    def setUp(self):
+        reset_connection_stats()
+        self.addCleanup(reset_connection_stats)
+
+    @override_settings(DATABASE_CONN_MODE="persistent")
+    def test_reuse_rate_counts_requests_without_new_connections(self):
+        for _ in range(4):
+            request_started.send(sender=self.__class__)
+        connection_created.send(sender=connection.__class__, connection=connection)
+
+        stats = connection_stats()["default"]
+        self.assertEqual(stats["mode"], "persistent")
+        self.assertEqual((stats["requests"], stats["connects"]), (4, 1))
+        self.assertEqual(stats["reuse_rate"], 0.75)
+        self.assertNotIn("pool", stats)
+
+    def test_runtime_stats_view_is_staff_only(self):
+        user = User.objects.create_user(username="ops", password="123456")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("posts:runtime_stats")).status_code, 302)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse("posts:runtime_stats"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"pid", "database", "media_urls"})
+        self.assertGreaterEqual(response.json()["database"]["default"]["requests"], 1)
+
+    def test_invalid_connection_mode_is_rejected_at_startup(self):
+        def load_settings(mode):
+            env = {"DEBUG": "False", "DATABASE_URL": "postgres://u:p@localhost/db", "DATABASE_CONN_MODE": mode}
+            with mock.patch.dict(os.environ, env):
+                return runpy.run_path(os.path.join(settings.BASE_DIR, "my_project", "settings.py"))
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "'persistant'"):
+            load_settings("persistant")
+        # โหมด pool ต้องมี psycopg 3 + psycopg_pool (requirements มีแค่ psycopg2)
+        with mock.patch("importlib.util.find_spec", return_value=None):
+            with self.assertRaisesMessage(ImproperlyConfigured, "psycopg[pool]"):
+                load_settings("pool")
+        self.assertEqual(load_settings("persistent")["DATABASES"]["default"]["CONN_MAX_AGE"], 600)
+
+
+class QueryPlanTests(TestCase):
+    def test_find_seq_scans(self):
+        postgres_plan = (
+            "Limit  (cost=0.29..1.02 rows=7 width=8)\n"
+            "  ->  Nested Loop\n"
+            "        ->  Parallel Seq Scan on posts_review  (cost=0.00..5.00 rows=100 width=8)\n"
+            "        ->  Index Scan using posts_post_pkey on posts_post  (cost=0.29..0.31 rows=1 width=8)"
+        )
+        self.assertEqual(find_seq_scans(postgres_plan, "postgresql"), ["posts_review"])
+
+        sqlite_plan = (
+            "3 0 0 SCAN posts_category\n"
+            "6 0 0 SCAN posts_hiringpost USING INDEX sqlite_autoindex_posts_hiringpost_1\n"
+            "9 0 0 SEARCH posts_post USING INTEGER PRIMARY KEY (rowid=?)"
+        )
+        self.assertEqual(find_seq_scans(sqlite_plan, "sqlite"), ["posts_category"])
+
+    def test_canonical_queries_use_indexes(self):
+        user = User.objects.create_user(username="plan", password="123456")
+        HiringPost.objects.create(author=user, title="Plan", budgetMin=1, budgetMax=2)
+        Category.objects.create(name="Plan")
+
+        out = StringIO()
+        call_command("explain_queries", "--min-rows", "0", "--fail", stdout=out)
+        self.assertIn("0 of 12 queries", out.getvalue())
+
+    def test_fail_on_large_sequential_scan(self):
+        Category.objects.create(name="Big")
+        with mock.patch("posts.query_plans.find_seq_scans", return_value=["posts_category"]):
+            with self.assertRaisesMessage(CommandError, "12 of 12 queries"):
+                call_command("explain_queries", "--min-rows", "1", "--fail", stdout=StringIO())
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, view, write=False):
+        # จำลอง handler ของ Django: middleware -> process_view -> view
+        reads = []
+
+        def get_response(req):
+            middleware.process_view(req, view, (), {})
+            reads.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Review)
+                reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return reads, middleware(request)
+
+    def test_read_only_views_read_from_replica(self):
+        reads, response = self.route(self.factory.get("/posts/hiring/"), views.hiring_page_view)
+        self.assertEqual(reads, ["replica"])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_write_pins_rest_of_request_and_following_requests_to_primary(self):
+        reads, response = self.route(self.factory.get("/posts/hiring/"), views.hiring_page_view, write=True)
+        self.assertEqual(reads, ["replica", "default"])
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        reads, response = self.route(self.factory.post("/posts/post/1/booking/"), views.toggle_booking_view)
+        self.assertEqual(reads, ["default"])
+        self.assertEqual(response.cookies[STICKY_COOKIE]["max-age"], 10)
+
+        # redirect กลับมาที่หน้ารายละเอียดพร้อม cookie: ต้องเห็นการจองที่เพิ่งทำ
+        request = self.factory.get("/posts/post/1/")
+        request.COOKIES[STICKY_COOKIE] = "1"
+        reads, _ = self.route(request, views.detail_post_view)
+        self.assertEqual(reads, ["default"])
+
+    @override_settings(DATABASE_ROUTERS=["posts.db_router.PrimaryReplicaRouter"])
+    def test_booking_toggle_reads_from_primary(self):
+        # toggle เป็น GET แต่อ่านการจองปัจจุบันก่อนเขียน ถ้าอ่านจาก replica ที่ตามไม่ทันจะกลับสถานะผิด
+        reads, _ = self.route(self.factory.get("/posts/post/1/booking/"), views.toggle_booking_view)
+        self.assertEqual(reads, ["default"])
+
+        user = User.objects.create_user(username="booker", password="123456")
+        post = HiringPost.objects.create(author=user, title="Pinned", budgetMin=1, budgetMax=2)
+        self.client.force_login(user)
+
+        aliases = []
+        db_for_read = PrimaryReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return aliases[-1]
+
+        middleware = [*settings.MIDDLEWARE, "posts.db_router.ReplicaRoutingMiddleware"]
+        with override_settings(MIDDLEWARE=middleware), mock.patch.object(PrimaryReplicaRouter, "db_for_read", record):
+            self.client.get(reverse("posts:toggle_booking", args=[post.pk]))
+        self.assertTrue(aliases)
+        self.assertEqual(set(aliases), {"default"})
+        self.assertTrue(post.bookings.filter(pk=user.pk).exists())
+
+    def test_other_apps_and_background_work_use_primary(self):
+        from django.contrib.admin import site
+
+        reads, _ = self.route(self.factory.get("/admin/"), site.index)
+        self.assertEqual(reads, ["default"])
+        self.assertEqual(self.router.db_for_read(Post), "default")
+        self.assertTrue(self.router.allow_migrate("default", "posts"))
+        self.assertFalse(self.router.allow_migrate("replica", "posts"))
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="budget", email="budget@dome.tu.ac.th", password="123456"
+        )
+        reviewers = [User.objects.create_user(username=f"reviewer{i}", password="123456") for i in range(6)]
+        for i in range(8):
+            self.post = HiringPost.objects.create(author=self.user, title=f"Budget {i}", budgetMin=1, budgetMax=2)
+            RentalPost.objects.create(author=self.user, title=f"Rent {i}", pricePerDay=100)
+            Media.objects.create(post=self.post, image=f"media_images/budget_{i}.png")
+            for reviewer in reviewers:
+                Review.objects.create(post=self.post, author=reviewer, rating=4)
+        self.post.bookings.add(self.user)
+        self.client.force_login(self.user)
+
+    def test_feed_and_detail_pages_stay_within_budget(self):
+        # จำนวน query ต้องไม่โตตามจำนวนการ์ด / รีวิวในหน้า
+        self.assertQueryBudget(reverse("posts:hiring"), 4)
+        self.assertQueryBudget(reverse("posts:rental"), 4)
+        self.assertQueryBudget(reverse("posts:detail_post", args=[self.post.pk]), 12)
+        self.assertQueryBudget(reverse("posts:search") + "?q=Budget", 6)
+        self.assertQueryBudget(reverse("posts:mybooking"), 4)
+
+    def test_helper_reports_repeated_queries(self):
+        with self.assertRaisesMessage(AssertionError, "N+1"):
+            self.assertQueryBudget(reverse("posts:hiring"), 100, repeat_threshold=1)
+
+    @override_settings(QUERY_BUDGET_DEFAULT=1)
+    def test_middleware_reports_queries_and_warns_over_budget(self):
+        with override_settings(MIDDLEWARE=["posts.query_budget.QueryBudgetMiddleware", *settings.MIDDLEWARE]):
+            with self.assertLogs("posts.query_budget", "WARNING") as logs:
+                response = self.client.get(reverse("profile_detail", args=[self.user.username]))
+            self.assertGreater(int(response["X-DB-Queries"]), 1)
+            self.assertTrue(response["X-DB-Time"].endswith("ms"))
+            self.assertEqual(response["X-Query-Budget-Exceeded"], f"{response['X-DB-Queries']}/1")
+            self.assertIn("users.views.profile_detail_view", logs.output[0])
+
+            # view ที่กำหนดงบเองด้วย @query_budget ไม่ใช้ค่า default
+            response = self.client.get(reverse("posts:hiring"))
+            self.assertNotIn("X-Query-Budget-Exceeded", response)
+
+
+class BenchTests(TestCase):
+    def test_seed_builds_consistent_dataset(self):
+        user = bench.seed(users=6, posts=8, media_per_post=2, reviews_per_post=3, bookings_per_user=2)
+
+        self.assertEqual(Post.objects.count(), 8)
+        self.assertEqual(Media.objects.count(), 16)
+        self.assertTrue(user.email.endswith("@dome.tu.ac.th"))
+        self.assertTrue(Post.objects.filter(author=user).exists())
+        post = Post.objects.first()
+        self.assertEqual(post.review_count, 3)
+        self.assertEqual(post.rating_sum, sum(post.reviews.values_list("rating", flat=True)))
+        self.assertTrue(post.cover_image.startswith("media_images/bench/"))
+
+    def test_bench_routes_measures_every_named_route(self):
+        user = bench.seed(users=4, posts=4, media_per_post=1, reviews_per_post=2, bookings_per_user=1)
+        results = bench.bench_routes(user, iterations=2, warmup=0)
+
+        self.assertEqual(set(results), {name for name, _ in bench.named_routes()} | {"admin:*"})
+        self.assertEqual(results["posts:hiring"]["status"], 200)
+        self.assertEqual(results["posts:detail_post"]["status"], 200)
+        # toggle_booking เป็น GET, runtime_stats ยิงในนาม staff
+        self.assertEqual(results["posts:toggle_booking"]["status"], 302)
+        self.assertEqual(results["posts:runtime_stats"]["status"], 200)
+        # route ของ django.contrib.auth.urls ที่อยู่ใน include()
+        self.assertEqual(results["login"]["status"], 200)
+        self.assertEqual(results["password_change"]["status"], 200)
+        self.assertIn("skipped", results["logout"])
+        self.assertIn("skipped", results["posts:delete_post"])
+        self.assertEqual(bench.failures(results), [])
+        self.assertEqual(Post.objects.count(), 4)
+        for key in ("p50_ms", "p95_ms", "queries", "peak_kib"):
+            self.assertIn(key, results["profile_detail"])
+
+    def test_compare_flags_regressions(self):
+        baseline = {
+            "posts:hiring": {"status": 200, "p50_ms": 5, "p95_ms": 10, "queries": 4, "peak_kib": 100},
+            "posts:delete_post": {"skipped": "destructive"},
+        }
+        results = {
+            "posts:hiring": {"status": 200, "p50_ms": 6, "p95_ms": 12, "queries": 5, "peak_kib": 200},
+            "posts:delete_post": {"skipped": "destructive"},
+            "posts:rental": {"status": 200, "p50_ms": 6, "p95_ms": 12, "queries": 4, "peak_kib": 90},
+        }
+        self.assertEqual(
+            bench.compare(results, baseline),
+            ["posts:hiring: queries 4 -> 5", "posts:hiring: peak memory 100 -> 200"],
+        )
+        self.assertEqual(
+            bench.failures({**results, "posts:search": {"status": 500}, "posts:toggle_booking": {"status": 200}}),
+            ["posts:search: status 500", "posts:toggle_booking: status 200 (expected 302)"],
+        )
+        self.assertEqual(bench.percentile([5, 1, 4, 2, 3], 0.5), 3)
+        self.assertEqual(bench.percentile([5, 1, 4, 2, 3], 0.95), 5)
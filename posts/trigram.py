@@ -0,0 +1,151 @@
+"""
+Trigram index สำหรับค้นหาแบบทนต่อการพิมพ์ผิด และ autocomplete
+
+- PostgresTrigramIndex : ใช้ pg_trgm (word_similarity) กับ GIN index ที่สร้างใน migration 0013
+- TableTrigramIndex    : เก็บ trigram ที่คำนวณด้วย Python ไว้ในตาราง SearchTrigram
+                         (ใช้กับ SQLite หรือฐานข้อมูลอื่น)
+
+คะแนนของทั้งสองแบบคือ "สัดส่วน trigram ของคำค้นที่พบในข้อความ"
+จึงเหมาะกับ autocomplete ที่ผู้ใช้พิมพ์เพียงบางส่วนของชื่อ
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Count, Max
+from django.utils.module_loading import import_string
+
+from .models import Category, Post, SearchTrigram, Skill
+
+# คำที่ใช้ทำ trigram: ตัวอักษร/ตัวเลขทุกภาษา (รวมสระและวรรณยุกต์ไทย)
+_WORD_RE = re.compile(r"[\w\u0e00-\u0e7f]+")
+
+# แหล่งข้อมูลที่ทำ index: kind -> (model, field)
+SOURCES = {
+    SearchTrigram.KIND_POST: (Post, "title"),
+    SearchTrigram.KIND_SKILL: (Skill, "name"),
+    SearchTrigram.KIND_CATEGORY: (Category, "name"),
+}
+
+
+def trigrams(text):
+    """
+    แยกข้อความเป็น trigram แบบเดียวกับ pg_trgm
+    (ตัวพิมพ์เล็ก, เติมช่องว่าง 2 ตัวหน้าคำ และ 1 ตัวท้ายคำ)
+    """
+    result = set()
+    for word in _WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i : i + 3])
+    return result
+
+
+class BaseTrigramIndex:
+    # คะแนนขั้นต่ำที่ถือว่า "ใกล้เคียง" (เทียบกับค่า default ของ pg_trgm)
+    threshold = 0.6
+
+    def index(self, kind, object_id, text):
+        raise NotImplementedError
+
+    def remove(self, kind, object_id):
+        raise NotImplementedError
+
+    def lookup(self, kind, query, limit=8):
+        """คืนลิสต์ (object_id, ข้อความ, คะแนน) เรียงจากคะแนนมากไปน้อย"""
+        raise NotImplementedError
+
+    def rebuild(self):
+        for kind, (model, field) in SOURCES.items():
+            queryset = model.objects.all()
+            if model is Post:
+                queryset = queryset.filter(type__in=("hiring", "rental"))
+            for object_id, text in queryset.values_list("pk", field).iterator():
+                self.index(kind, object_id, text)
+
+
+class PostgresTrigramIndex(BaseTrigramIndex):
+    """pg_trgm ดูแล index เอง จึงไม่ต้องเขียนอะไรเพิ่มตอนบันทึกข้อมูล"""
+
+    def index(self, kind, object_id, text):
+        pass
+
+    def remove(self, kind, object_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def lookup(self, kind, query, limit=8):
+        model, field = SOURCES[kind]
+        queryset = model.objects.all()
+        if model is Post:
+            queryset = queryset.filter(type__in=("hiring", "rental"))
+        rows = (
+            queryset.filter(**{f"{field}__trigram_word_similar": query})
+            .annotate(score=TrigramWordSimilarity(query, field))
+            .order_by("-score", "-pk")
+            .values_list("pk", field, "score")[:limit]
+        )
+        return list(rows)
+
+
+class TableTrigramIndex(BaseTrigramIndex):
+    """เก็บ trigram ของแต่ละข้อความไว้ในตาราง SearchTrigram (หนึ่งแถวต่อหนึ่ง trigram)"""
+
+    def index(self, kind, object_id, text):
+        self.remove(kind, object_id)
+        grams = trigrams(text)
+        SearchTrigram.objects.bulk_create(
+            [
+                SearchTrigram(
+                    kind=kind,
+                    object_id=object_id,
+                    trigram=gram,
+                    text=text,
+                    trigram_count=len(grams),
+                )
+                for gram in grams
+            ]
+        )
+
+    def remove(self, kind, object_id):
+        SearchTrigram.objects.filter(kind=kind, object_id=object_id).delete()
+
+    def rebuild(self):
+        SearchTrigram.objects.all().delete()
+        super().rebuild()
+
+    def lookup(self, kind, query, limit=8):
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        # นับจำนวน trigram ที่ตรงกันของแต่ละข้อความใน query เดียว (ใช้ index บน trigram)
+        # เรียง / ตัดใน SQL: ตรงมากก่อน, ข้อความสั้นใกล้เคียงคำค้นก่อน (similarity แบบเต็ม)
+        minimum_shared = max(1, int(len(grams) * self.threshold))
+        rows = (
+            SearchTrigram.objects.filter(kind=kind, trigram__in=grams)
+            .values("object_id", "text")
+            .annotate(shared=Count("id"), total=Max("trigram_count"))
+            .filter(shared__gte=minimum_shared)
+            .order_by("-shared", "total", "-object_id")[:limit]
+        )
+        return [(row["object_id"], row["text"], row["shared"] / len(grams)) for row in rows]
+
+_index = None
+
+
+def get_trigram_index():
+    """เลือก index ตาม settings.POSTS_TRIGRAM_INDEX หรือชนิดฐานข้อมูล"""
+    global _index
+    if _index is None:
+        path = getattr(settings, "POSTS_TRIGRAM_INDEX", None)
+        if path:
+            _index = import_string(path)()
+        elif connection.vendor == "postgresql":
+            _index = PostgresTrigramIndex()
+        else:
+            _index = TableTrigramIndex()
+    return _index
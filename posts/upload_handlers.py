@@ -0,0 +1,99 @@
+"""
+Upload handler สำหรับฟอร์มที่รับรูป (โพสต์ / โปรไฟล์)
+
+ค่าเริ่มต้นของ Django เก็บไฟล์เล็กไว้ในหน่วยความจำ และรับไฟล์ทุกขนาด/ทุกชนิด
+จนครบก่อนฟอร์มจะได้ตรวจ handler นี้ตรวจระหว่างที่ข้อมูลกำลังเข้ามาแทน:
+
+- request ที่ Content-Length เกิน POSTS_MAX_UPLOAD_REQUEST_SIZE ถูกปฏิเสธ (400)
+  ก่อนอ่าน body เลย
+- ไฟล์ถูกเขียนลงไฟล์ชั่วคราวบนดิสก์ทีละ chunk หน่วยความจำของ worker จึงคงที่
+- ดู header ของไฟล์ (magic bytes) ใน chunk แรก ถ้าไม่ใช่รูปภาพหรือขนาดเกิน
+  POSTS_MAX_UPLOAD_SIZE จะหยุดรับ request ทันที (StopUpload) ไม่อ่าน body ที่เหลือ
+  (SkipFile ยังให้ parser อ่านส่วนที่เหลือจนจบ เสีย bandwidth / เวลา worker เท่าเดิม)
+  ฟิลด์ / ไฟล์ที่มาหลังไฟล์นั้นจึงหายไป และ client อาจเห็น connection reset
+
+ไฟล์ที่ถูกปฏิเสธจะไม่อยู่ใน request.FILES ข้อความ error อยู่ใน rejected_uploads(request)
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from .uploads import SNIFF_SIZE, max_upload_size, sniff_image_type
+
+
+def max_request_size():
+    return getattr(settings, "POSTS_MAX_UPLOAD_REQUEST_SIZE", 50 * 1024 * 1024)
+
+
+def rejected_uploads(request):
+    """ข้อความ error ของไฟล์ที่ handler ปฏิเสธใน request นี้"""
+    return getattr(request, "_rejected_uploads", [])
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # รู้ขนาดทั้ง request จาก header แล้ว ไม่ต้องรออ่าน body
+        if content_length > max_request_size():
+            raise RequestDataTooBig("Upload exceeds POSTS_MAX_UPLOAD_REQUEST_SIZE.")
+        self.request._rejected_uploads = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b""
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > max_upload_size():
+            self.reject("ไฟล์ %(name)s มีขนาดใหญ่เกินไป")
+
+        if not self.checked:
+            self.header += raw_data[: SNIFF_SIZE - len(self.header)]
+            if len(self.header) >= SNIFF_SIZE:
+                self.check_header()
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            # ไฟล์สั้นกว่า SNIFF_SIZE
+            self.check_header(stop=False)
+            if not self.checked:
+                self.file.close()
+                return None
+        return super().file_complete(file_size)
+
+    def check_header(self, stop=True):
+        content_type = sniff_image_type(self.header)
+        if content_type is None:
+            self.reject("ไฟล์ %(name)s ไม่ใช่รูปภาพ (รองรับ JPEG, PNG, WebP, GIF)", stop)
+            return
+        # ใช้ชนิดไฟล์จากเนื้อไฟล์จริง ไม่เชื่อ Content-Type ที่เบราว์เซอร์ส่งมา
+        self.content_type = content_type
+        self.file.content_type = content_type
+        self.checked = True
+
+    def reject(self, message, stop=True):
+        self.request._rejected_uploads.append(message % {"name": self.file_name})
+        if stop:
+            # ไม่ให้ parser อ่าน body ที่เหลือ (ไฟล์ที่กำลังเขียนถูกปิดและลบโดย parser)
+            raise StopUpload(connection_reset=True)
+
+
+def image_uploads(view):
+    """
+    ให้ view ใช้ ImageUploadHandler แทน handler ปกติ
+    handler ต้องถูกตั้งก่อนอ่าน request.POST แต่ CsrfViewMiddleware อ่าน POST ก่อนถึง view
+    จึงต้อง csrf_exempt ที่ชั้นนอก แล้วตรวจ CSRF เองหลังตั้ง handler แล้ว
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+
+    return wrapper
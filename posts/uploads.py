@@ -0,0 +1,198 @@
+"""
+อัปโหลดรูปจากเบราว์เซอร์ตรงไปยัง storage โดยไม่ผ่าน worker ของ Django
+
+1. เบราว์เซอร์ขอ ticket จาก upload_ticket_view (ชนิดไฟล์ + ขนาด)
+2. อัปโหลดไฟล์ไปยังปลายทางใน ticket
+   - S3 : presigned POST (S3 ตรวจชนิด/ขนาดไฟล์ตาม policy ที่เซ็นไว้)
+   - อื่น ๆ (เครื่อง dev): PUT ไปที่ direct_upload_view ด้วย URL ที่เซ็นไว้แทน
+3. ส่ง ticket["token"] มากับฟอร์มสร้าง/แก้ไขโพสต์ในช่อง upload_tokens
+4. server ตรวจ token และไฟล์ใน storage (verify_upload_tokens)
+   แล้วสร้าง Media ที่ชี้ไปยัง key นั้นโดยไม่ต้องคัดลอกไฟล์
+"""
+import posixpath
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.urls import reverse
+
+from .models import Media
+
+# ชนิดไฟล์ที่ยอมให้อัปโหลด -> นามสกุลของ key
+ALLOWED_CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+# magic bytes ของรูปที่รองรับ -> content type (ต้องตรงกับ ALLOWED_CONTENT_TYPES)
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+# จำนวนไบต์แรกของไฟล์ที่ต้องใช้ระบุชนิด (WebP: "RIFF" + ขนาด 4 ไบต์ + "WEBP")
+SNIFF_SIZE = 12
+
+UPLOAD_PREFIX = "media_images/uploads"
+
+# อายุของปลายทางอัปโหลด (วินาที) และของ token ที่ใช้ส่งพร้อมฟอร์ม
+UPLOAD_URL_EXPIRES = 10 * 60
+TOKEN_MAX_AGE = 60 * 60
+
+_TOKEN_SALT = "posts.uploads.token"
+_PUT_SALT = "posts.uploads.put"
+
+
+class UploadError(Exception):
+    pass
+
+
+def max_upload_size():
+    return getattr(settings, "POSTS_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+
+
+def sniff_image_type(header):
+    """คืน content type จากไบต์แรกของไฟล์ หรือ None ถ้าไม่ใช่รูปที่รองรับ"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+def _storage():
+    return Media._meta.get_field("image").storage
+
+
+def is_s3_storage(storage):
+    # S3Boto3Storage (ใช้บน production เมื่อ DEBUG=False)
+    return hasattr(storage, "bucket_name") and hasattr(storage, "connection")
+
+
+def issue_ticket(user, content_type, size):
+    """สร้าง ticket สำหรับอัปโหลดไฟล์หนึ่งไฟล์"""
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise UploadError("รองรับเฉพาะไฟล์รูปภาพ (JPEG, PNG, WebP, GIF)")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("ขนาดไฟล์ไม่ถูกต้อง")
+    if not 0 < size <= max_upload_size():
+        raise UploadError("ไฟล์มีขนาดใหญ่เกินไป")
+
+    key = f"{UPLOAD_PREFIX}/{user.pk}/{uuid.uuid4().hex}{ALLOWED_CONTENT_TYPES[content_type]}"
+    token = signing.dumps({"key": key, "user": user.pk}, salt=_TOKEN_SALT)
+
+    storage = _storage()
+    if is_s3_storage(storage):
+        target = _s3_target(storage, key, content_type)
+    else:
+        target = _local_target(key, content_type, size)
+    return {"token": token, "key": key, **target}
+
+
+def _s3_object_key(storage, key):
+    return posixpath.join(storage.location, key) if storage.location else key
+
+
+def _s3_target(storage, key, content_type):
+    object_key = _s3_object_key(storage, key)
+    fields = {"Content-Type": content_type}
+    cache_control = storage.object_parameters.get("CacheControl")
+    if cache_control:
+        fields["Cache-Control"] = cache_control
+
+    presigned = storage.connection.meta.client.generate_presigned_post(
+        storage.bucket_name,
+        object_key,
+        Fields=fields,
+        # ทุกค่าใน Fields ต้องมีเงื่อนไขกำกับ ไม่งั้น S3 จะปฏิเสธ
+        Conditions=[
+            *({name: value} for name, value in fields.items()),
+            ["content-length-range", 1, max_upload_size()],
+        ],
+        ExpiresIn=UPLOAD_URL_EXPIRES,
+    )
+    return {"method": "POST", "url": presigned["url"], "fields": presigned["fields"]}
+
+
+def _local_target(key, content_type, size):
+    # ตัวแทน presigned URL สำหรับ FileSystemStorage: URL ที่เซ็น key/ชนิด/ขนาดไว้
+    signed = signing.dumps(
+        {"key": key, "type": content_type, "size": size}, salt=_PUT_SALT
+    )
+    return {
+        "method": "PUT",
+        "url": reverse("posts:direct_upload", args=[signed]),
+        "headers": {"Content-Type": content_type},
+    }
+
+
+def store_local_upload(signed, content_type, body):
+    """
+    เก็บไฟล์ที่ PUT มาที่ direct_upload_view (ใช้แทน S3 บนเครื่อง dev)
+    ตรวจเงื่อนไขเดียวกับ policy ของ S3: URL ยังไม่หมดอายุ, ชนิดไฟล์และขนาดตรงกับ ticket
+    """
+    try:
+        ticket = signing.loads(signed, salt=_PUT_SALT, max_age=UPLOAD_URL_EXPIRES)
+    except signing.BadSignature:
+        raise UploadError("ลิงก์อัปโหลดไม่ถูกต้องหรือหมดอายุแล้ว")
+    if content_type != ticket["type"]:
+        raise UploadError("ชนิดไฟล์ไม่ตรงกับที่ขอไว้")
+    if not 0 < len(body) <= min(ticket["size"], max_upload_size()):
+        raise UploadError("ขนาดไฟล์ไม่ตรงกับที่ขอไว้")
+
+    storage = _storage()
+    if storage.exists(ticket["key"]):
+        raise UploadError("ลิงก์อัปโหลดนี้ถูกใช้ไปแล้ว")
+    storage.save(ticket["key"], ContentFile(body))
+    return ticket["key"]
+
+
+def _read_header(storage, key):
+    # S3 ขอเฉพาะช่วงไบต์แรก (Range) ไม่ต้องดาวน์โหลดทั้งไฟล์
+    if is_s3_storage(storage):
+        response = storage.connection.meta.client.get_object(
+            Bucket=storage.bucket_name, Key=_s3_object_key(storage, key), Range=f"bytes=0-{SNIFF_SIZE - 1}"
+        )
+        return response["Body"].read()
+    with storage.open(key, "rb") as f:
+        return f.read(SNIFF_SIZE)
+
+
+def verify_upload_tokens(user, tokens):
+    """
+    ตรวจ token ที่ส่งมากับฟอร์มโพสต์ แล้วคืนลิสต์ key ของไฟล์ใน storage
+    - token ต้องเซ็นโดย server, ยังไม่หมดอายุ และออกให้ผู้ใช้คนนี้
+    - ไฟล์ต้องถูกอัปโหลดแล้ว ขนาดไม่เกินกำหนด และยังไม่ถูกผูกกับ Media อื่น
+    - ไบต์แรกของไฟล์ต้องเป็นรูปที่รองรับ (policy ของ S3 ตรวจได้แค่ Content-Type ที่ผู้ใช้ส่งมา)
+      ไฟล์ที่ไม่ใช่รูปถูกลบออกจาก storage ทันที
+    """
+    storage = _storage()
+    keys = []
+    for token in tokens:
+        try:
+            data = signing.loads(token, salt=_TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            raise UploadError("รูปที่อัปโหลดหมดอายุแล้ว กรุณาอัปโหลดใหม่")
+
+        key = data["key"]
+        if data["user"] != user.pk or not key.startswith(f"{UPLOAD_PREFIX}/{user.pk}/"):
+            raise UploadError("ไม่พบรูปที่อัปโหลด")
+        if key in keys or Media.objects.filter(image=key).exists():
+            raise UploadError("รูปนี้ถูกใช้ไปแล้ว")
+        if not storage.exists(key):
+            raise UploadError("ไม่พบรูปที่อัปโหลด กรุณาอัปโหลดใหม่")
+        if storage.size(key) > max_upload_size():
+            raise UploadError("ไฟล์มีขนาดใหญ่เกินไป")
+        if sniff_image_type(_read_header(storage, key)) is None:
+            storage.delete(key)
+            raise UploadError("รองรับเฉพาะไฟล์รูปภาพ (JPEG, PNG, WebP, GIF)")
+        keys.append(key)
+    return keys
@@ -17,5 +17,9 @@ urlpatterns = [
     path('mybooking/', views.my_booking_view, name='mybooking'),
     path('post/<int:post_id>/booking/', views.toggle_booking_view, name='toggle_booking'),
     path('search/', views.search_view, name='search'),
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('uploads/ticket/', views.upload_ticket_view, name='upload_ticket'),
+    path('uploads/direct/<str:signed>/', views.direct_upload_view, name='direct_upload'),
+    path('stats/', views.runtime_stats_view, name='runtime_stats'),
     
 ]
\ No newline at end of file
@@ -1,66 +1,100 @@
+import os
+from hashlib import md5
+from urllib.parse import quote
+
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Post, HiringPost, RentalPost, Media, Review
-from django.db.models import Prefetch
 from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from .models import Post, HiringPost, RentalPost, Media, Review, SearchTrigram
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from .forms import HiringPostForm, RentalPostForm
 from .decorators import student_required
-from django.db.models import Q 
-from itertools import chain
+from .pagination import keyset_paginate
+from .query_budget import query_budget
+from .bookmarks import get_booked_post_ids, toggle_booking
+from .cache import attach_card_versions
+from .images import attach_images, attach_uploaded
+from .db_stats import connection_stats
+from .media_urls import media_url, url_cache_stats
+from .upload_handlers import image_uploads, rejected_uploads
+from .uploads import (
+    UploadError,
+    issue_ticket,
+    max_upload_size,
+    store_local_upload,
+    verify_upload_tokens,
+)
+from .search import get_search_backend
+from .trigram import get_trigram_index
+
+# จำนวนการ์ดต่อหน้าในหน้า hiring / rental
+FEED_PAGE_SIZE = 6
+
+# จำนวนผลลัพธ์ต่อหน้าในหน้าค้นหา
+SEARCH_PAGE_SIZE = 12
+
+# จำนวนคำแนะนำสูงสุดของ autocomplete และเวลาที่ cache คำตอบไว้ (วินาที)
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
 
 # Create your views here.
+@query_budget(6)
 def hiring_page_view(request):
-    posts_with_media = Prefetch("media", queryset=Media.objects.all(), to_attr="images")
-
-    # ดึง "QuerySet" ทั้งหมดมา
-    all_hiring_posts = HiringPost.objects.prefetch_related(posts_with_media).order_by(
-        "-id"
+    # ดึง "QuerySet" ทั้งหมดมา (รูปปกมากับ query เดียว)
+    all_hiring_posts = HiringPost.objects.cards()
+
+    # แบ่งหน้าแบบ cursor (6 โพสต์ต่อหน้า) จาก ?after=<id> / ?before=<id>
+    page_obj = keyset_paginate(
+        all_hiring_posts,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        per_page=FEED_PAGE_SIZE,
     )
-
-    # สร้าง Paginator (ตั้งค่า 6 โพสต์ต่อหน้า)
-    paginator = Paginator(all_hiring_posts, 6)
-
-    # ดึงเลขหน้าจาก URL
-    page_number = request.GET.get("page")
-
-    # ดึงข้อมูล "หน้า" ที่ถูกต้องมา
-    page_obj = paginator.get_page(page_number)
-    formatted_items = [_format_post_data(post, request.user) for post in page_obj]
+    booked_ids = get_booked_post_ids(request)
+    formatted_items = [
+        _format_post_data(post, request.user, booked_ids) for post in page_obj
+    ]
 
     context = {
-        "hiring_items": formatted_items,
+        "hiring_items": attach_card_versions(formatted_items, "hiring_card"),
         "page_obj": page_obj,  # ส่ง 'page_obj' ไปให้ Template
     }
     return render(request, "pages/hiring.html", context)
 
 
+@query_budget(6)
 def rental_page_view(request):
-    posts_with_media = Prefetch("media", queryset=Media.objects.all(), to_attr="images")
-
-    # ดึง "QuerySet" ทั้งหมดมา
-    all_rental_posts = RentalPost.objects.prefetch_related(posts_with_media).order_by(
-        "-id"
+    # ดึง "QuerySet" ทั้งหมดมา (รูปปกมากับ query เดียว)
+    all_rental_posts = RentalPost.objects.cards()
+
+    # แบ่งหน้าแบบ cursor (6 โพสต์ต่อหน้า) จาก ?after=<id> / ?before=<id>
+    page_obj = keyset_paginate(
+        all_rental_posts,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        per_page=FEED_PAGE_SIZE,
     )
-
-    # สร้าง Paginator (6 โพสต์ต่อหน้า)
-    paginator = Paginator(all_rental_posts, 6)
-
-    # ดึงเลขหน้าจาก URL
-    page_number = request.GET.get("page")
-
-    # ดึงข้อมูล "หน้า" ที่ถูกต้องมา
-    page_obj = paginator.get_page(page_number)
-    formatted_items = [_format_post_data(post, request.user) for post in page_obj]
+    booked_ids = get_booked_post_ids(request)
+    formatted_items = [
+        _format_post_data(post, request.user, booked_ids) for post in page_obj
+    ]
 
     context = {
-        "rental_items": formatted_items,
+        "rental_items": attach_card_versions(formatted_items, "rental_card"),
         "page_obj": page_obj,  # ส่ง 'page_obj' ไปให้ Template
     }
     return render(request, "pages/rental.html", context)
 
 
 # ฟังก์ชันช่วยในการแปลงข้อมูลจาก ORM object เป็น Dict
-def _format_post_data(post, user=None):
+def _format_post_data(post, user=None, booked_ids=None):
     """
     ฟังก์ชันช่วยแปลงข้อมูลจาก ORM Object -> Dict
     เพื่อส่งต่อไปยัง Template (HTML)
@@ -68,10 +102,13 @@ def _format_post_data(post, user=None):
 
     # ดึงรูปภาพแรกของโพสต์ (ถ้ามี) ตอนนี้พวกเรายังไม่มีลิ้งค์ใส่รูปภาพ
     first_image_url = None
-    if hasattr(post, "images") and post.images:
-        first_media = post.images[0]
-        if first_media.image:
-            first_image_url = first_media.image.url
+    webp_image_url = None
+    storage = Media._meta.get_field("image").storage
+    if post.cover_image:
+        # ชื่อไฟล์รูปปก (ขนาดการ์ด) เก็บไว้บนแถว Post แล้ว ไม่ต้องโหลด Media
+        first_image_url = media_url(post.cover_image, storage)
+        if post.cover_webp:
+            webp_image_url = media_url(post.cover_webp, storage)
 
     # กำหนดชื่อและราคาตามประเภทโพสต์
     price_detail = ""
@@ -81,7 +118,13 @@ def _format_post_data(post, user=None):
         price_detail = f"เริ่มต้น {post.pricePerDay:,}฿/วัน"
 
     is_booked = False
-    if user and user.is_authenticated:
+    if booked_ids is not None:
+        # เช็คจาก set ของ request (posts/bookmarks.py) ไม่ต้อง query
+        is_booked = post.id in booked_ids
+    elif hasattr(post, "is_booked"):
+        # cards(user) คำนวณมาให้แล้วด้วย Exists
+        is_booked = post.is_booked
+    elif user and user.is_authenticated:
         # เช็คว่า id ของ user นี้ อยู่ใน list bookings ของโพสต์นี้ไหม
         is_booked = post.bookings.filter(id=user.id).exists()
 
@@ -89,6 +132,7 @@ def _format_post_data(post, user=None):
     return {
         "id": post.id,
         "image_url": first_image_url or "/static/img/default.png",
+        "image_webp_url": webp_image_url,
         # "images": images,
         "title": post.title,
         "count_reviews": post.count_reviews,
@@ -98,6 +142,7 @@ def _format_post_data(post, user=None):
     }
 
 
+@query_budget(15)
 def detail_post_view(request, post_id):
     post = get_object_or_404(
         Post.objects.select_related(
@@ -122,15 +167,15 @@ def detail_post_view(request, post_id):
     elif hasattr(post, "rentalpost"):
         specific_post = post.rentalpost
 
-    is_booked = False
-    if request.user.is_authenticated:
-        is_booked = post.bookings.filter(id=request.user.id).exists()
+    is_booked = post.id in get_booked_post_ids(request)
 
     context = {
         "post": specific_post,
         "media": post.media.all(),
         "skills": skills_list,
         "categories": post.categories.all(),
+        # ผู้รีวิวพร้อม Profile (ชื่อ / URL avatar) ใน query เดียว
+        "reviews": post.reviews.select_related("author__profile"),
         "is_hiring": is_hiring,
         "is_booked": is_booked,
     }
@@ -142,11 +187,37 @@ def createpost(request):
     return render(request, "pages/createposts.html")
 
 
+def _direct_upload_enabled():
+    # อัปโหลดรูปจากเบราว์เซอร์ตรงไป storage (posts/uploads.py)
+    # บน S3 ต้องตั้ง CORS ของ bucket ให้รับ POST จากโดเมนของเว็บก่อนเปิดใช้
+    return getattr(settings, "POSTS_DIRECT_UPLOADS", False)
+
+
+def _verified_upload_keys(request, form):
+    """
+    ตรวจรูปที่เบราว์เซอร์อัปโหลดตรงไป storage แล้ว (ช่อง upload_tokens ของฟอร์ม)
+    และรูปที่ ImageUploadHandler ปฏิเสธระหว่างอัปโหลด
+    คืนลิสต์ key หรือ None ถ้าไม่ผ่าน (พร้อมใส่ error ให้ช่อง images)
+    """
+    rejected = rejected_uploads(request)
+    if rejected:
+        for message in rejected:
+            form.add_error("images", message)
+        return None
+    try:
+        return verify_upload_tokens(request.user, request.POST.getlist("upload_tokens"))
+    except UploadError as error:
+        form.add_error("images", str(error))
+        return None
+
+
+@image_uploads
 @student_required
 def create_hiring_view(request):
     if request.method == "POST":
         form = HiringPostForm(request.POST, request.FILES)
-        if form.is_valid():
+        uploaded_keys = _verified_upload_keys(request, form) if form.is_valid() else None
+        if uploaded_keys is not None:
             # บันทึกฟอร์มหลัก แต่ยังไม่ commit ลง DB
             new_post = form.save(commit=False)
 
@@ -159,25 +230,30 @@ def create_hiring_view(request):
             # บันทึก M2M (categories, skills)
             form.save_m2m()
 
-            files = request.FILES.getlist("images")
-            for f in files:
-                # สร้าง Media object ที่เชื่อมโยงกับ new_post
-                Media.objects.create(post=new_post, image=f)
+            # สร้าง Media ที่เชื่อมโยงกับ new_post พร้อมรูปย่อสำหรับหน้า listing
+            attach_images(new_post, request.FILES.getlist("images"))
+            attach_uploaded(new_post, uploaded_keys)
 
             # ส่งผู้ใช้ไปยังหน้า detail ของโพสต์ที่เพิ่งสร้าง
             return redirect("posts:detail_post", post_id=new_post.id)
     else:
         form = HiringPostForm()
 
-    context = {"form": form, "form_title": "Create hiring post"}
+    context = {
+        "form": form,
+        "form_title": "Create hiring post",
+        "direct_upload": _direct_upload_enabled(),
+    }
     return render(request, "pages/create_hiring.html", context)
 
 
+@image_uploads
 @student_required
 def create_rental_view(request):
     if request.method == "POST":
         form = RentalPostForm(request.POST, request.FILES)
-        if form.is_valid():
+        uploaded_keys = _verified_upload_keys(request, form) if form.is_valid() else None
+        if uploaded_keys is not None:
             # บันทึกฟอร์มหลัก แต่ยังไม่ commit ลง DB
             new_post = form.save(commit=False)
 
@@ -190,17 +266,20 @@ def create_rental_view(request):
             # บันทึก M2M (categories, skills)
             form.save_m2m()
 
-            files = request.FILES.getlist("images")
-            for f in files:
-                # สร้าง Media object ที่เชื่อมโยงกับ new_post
-                Media.objects.create(post=new_post, image=f)
+            # สร้าง Media ที่เชื่อมโยงกับ new_post พร้อมรูปย่อสำหรับหน้า listing
+            attach_images(new_post, request.FILES.getlist("images"))
+            attach_uploaded(new_post, uploaded_keys)
 
             # ส่งผู้ใช้ไปยังหน้า detail ของโพสต์ที่เพิ่งสร้าง
             return redirect("posts:detail_post", post_id=new_post.id)
     else:
         form = RentalPostForm()
 
-    context = {"form": form, "form_title": "Create rental post"}
+    context = {
+        "form": form,
+        "form_title": "Create rental post",
+        "direct_upload": _direct_upload_enabled(),
+    }
     return render(request, "pages/create_rental.html", context)
 
 
@@ -208,27 +287,19 @@ def create_rental_view(request):
 def my_post_view(request):
     user = request.user
 
-    # ดึงข้อมูล Media มารอไว้ (เพื่อแสดงรูปภาพปก)
-    posts_with_media = Prefetch("media", queryset=Media.objects.all(), to_attr="images")
-
-    # ดึง Post ของ User นั้นๆ ทั้ง Hiring และ Rental
-    my_hiring = HiringPost.objects.filter(author=user).prefetch_related(
-        posts_with_media
+    # ดึง Post ของ User นั้นๆ ทั้ง Hiring และ Rental ใน query เดียว
+    # เรียงลำดับจาก "เก่า -> ใหม่" (ตาม id น้อยไปมาก) ที่ฐานข้อมูล
+    my_posts = (
+        Post.objects.filter(author=user).with_subtypes().cards().order_by("id")
     )
-    my_rental = RentalPost.objects.filter(author=user).prefetch_related(
-        posts_with_media
-    )
-
-    # รวมลิสต์และเรียงลำดับจาก "เก่า -> ใหม่" (ตาม id น้อยไปมาก)
-    all_my_posts = sorted(list(my_hiring) + list(my_rental), key=lambda x: x.id)
 
     # แปลงข้อมูลให้อยู่ในรูปแบบ Dict
-    formatted_items = [_format_post_data(post) for post in all_my_posts]
+    formatted_items = [_format_post_data(post.as_subtype()) for post in my_posts]
 
     can_create = user.is_superuser or user.email.endswith("@dome.tu.ac.th")
 
     context = {
-        "mypost_items": formatted_items,
+        "mypost_items": attach_card_versions(formatted_items, "mypost_card"),
         "can_create": can_create,
     }
     return render(request, "pages/mypost.html", context)
@@ -248,6 +319,7 @@ def delete_post_view(request, post_id):
     return redirect("posts:mypost")
 
 
+@image_uploads
 @login_required
 def edit_post_view(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -277,12 +349,12 @@ def edit_post_view(request, post_id):
     if request.method == "POST":
         # ส่ง instance เข้าไปเพื่อเป็นการ Update
         form = form_class(request.POST, request.FILES, instance=instance)
-        if form.is_valid():
+        uploaded_keys = _verified_upload_keys(request, form) if form.is_valid() else None
+        if uploaded_keys is not None:
             updated_post = form.save()
 
-            files = request.FILES.getlist("images")
-            for f in files:
-                Media.objects.create(post=updated_post, image=f)
+            attach_images(updated_post, request.FILES.getlist("images"))
+            attach_uploaded(updated_post, uploaded_keys)
 
             return redirect("posts:detail_post", post_id=updated_post.id)
     else:
@@ -293,6 +365,7 @@ def edit_post_view(request, post_id):
         "form": form,
         "form_title": title_context,
         "is_edit": True,  # ตัวแปรบอก Template ว่ากำลัง Edit อยู่ (เผื่อใช้ปรับคำในปุ่ม)
+        "direct_upload": _direct_upload_enabled(),
     }
     return render(request, template_name, context)
 
@@ -327,11 +400,8 @@ def add_review_view(request, post_id):
 def toggle_booking_view(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
 
-    # เช็คว่า user จองไปหรือยัง
-    if post.bookings.filter(id=request.user.id).exists():
-        post.bookings.remove(request.user)  # ถ้ามีแล้ว ให้ลบออก (Un-book)
-    else:
-        post.bookings.add(request.user)  # ถ้ายังไม่มี ให้เพิ่ม (Book)
+    # จอง / ยกเลิกการจอง (เช็คจาก set ของ request แล้วอัปเดต set ให้ตรงกัน)
+    toggle_booking(request, post)
 
     # Redirect กลับไปหน้าเดิมที่ user กดมา
     return redirect(request.META.get("HTTP_REFERER", "posts:hiring"))
@@ -341,72 +411,143 @@ def toggle_booking_view(request, post_id):
 def my_booking_view(request):
     user = request.user
 
-    # ดึง Media มารอไว้
-    posts_with_media = Prefetch("media", queryset=Media.objects.all(), to_attr="images")
-
-    # ดึงโพสต์ที่ user นี้อยู่ใน field bookings
-    # ต้อง select_related hiringpost/rentalpost เพื่อให้แยกประเภทได้ตอน format
+    # ดึงโพสต์จาก set ของ id ที่ user นี้จองไว้
+    # with_subtypes() JOIN hiringpost/rentalpost มาให้แยกประเภทได้ตอน format
+    booked_ids = get_booked_post_ids(request)
     booked_posts = (
-        Post.objects.filter(bookings=user)
-        .select_related("hiringpost", "rentalpost")
-        .prefetch_related(posts_with_media)
+        Post.objects.filter(pk__in=booked_ids)
+        .with_subtypes()
+        .cards()
         .order_by("-id")
     )
 
     # แปลงข้อมูล (ดึง instance ลูก hiring/rental ออกมาส่งให้ format)
-    formatted_items = []
-    for post in booked_posts:
-        # ต้องแปลงเป็น HiringPost หรือ RentalPost object ก่อนส่งเข้า format
-        actual_post = post
-        if hasattr(post, "hiringpost"):
-            actual_post = post.hiringpost
-        elif hasattr(post, "rentalpost"):
-            actual_post = post.rentalpost
-        if hasattr(post, "images"):
-            actual_post.images = post.images
-
-        formatted_items.append(_format_post_data(actual_post, user))
+    formatted_items = [
+        _format_post_data(post.as_subtype(), user, booked_ids)
+        for post in booked_posts
+    ]
 
     context = {
         "booking_items": formatted_items,
     }
     return render(request, "pages/mybooking.html", context)
 
+@query_budget(8)
 def search_view(request):
     query = request.GET.get('q') 
     formatted_items = []
+    page_obj = None
 
     if query:
-        posts_with_media = Prefetch("media", queryset=Media.objects.all(), to_attr="images")
-
-        # 1. ค้นหาใน HiringPost (ค้นหาจาก Title หรือ Description)
-        hiring_results = HiringPost.objects.select_related('author').prefetch_related(posts_with_media).filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(skills__name__icontains=query) # (Option) ค้นหาจาก Skill ด้วยก็ได้
-        ).distinct()
-
-        # 2. ค้นหาใน RentalPost
-        rental_results = RentalPost.objects.select_related('author').prefetch_related(posts_with_media).filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(categories__name__icontains=query) # (Option) ค้นหาจาก Category ด้วยก็ได้
-        ).distinct()
-
-        # 3. รวมผลลัพธ์เข้าด้วยกัน (ใช้ chain เพื่อรวม QuerySet 2 ตัว)
-        # หรือจะแปลงเป็น list แล้วบวกกันก็ได้: all_results = list(hiring_results) + list(rental_results)
-        all_results = sorted(
-            list(hiring_results) + list(rental_results), 
-            key=lambda x: x.id, 
-            reverse=True # เรียงจากใหม่ไปเก่า
-        )
-
-        # 4. ใช้ฟังก์ชันเดิมจัดรูปแบบข้อมูล
-        formatted_items = [_format_post_data(post, request.user) for post in all_results]
+        # ค้นหาผ่าน search index (posts/search.py) ได้ลิสต์ id เรียงตามความเกี่ยวข้อง
+        # ค้นจาก Title, Description, Skill และ Category
+        results = get_search_backend().search(query)
+
+        # แบ่งหน้าที่ฐานข้อมูล ดึงเฉพาะ id ของหน้าปัจจุบัน
+        paginator = Paginator(results, SEARCH_PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get("page"))
+        page_ids = list(page_obj)
+
+        # โหลดการ์ดของหน้านี้ใน query เดียว แล้วเรียงตามอันดับจาก index
+        posts_by_id = {
+            post.pk: post
+            for post in Post.objects.filter(pk__in=page_ids).with_subtypes().cards()
+        }
+        booked_ids = get_booked_post_ids(request)
+        formatted_items = [
+            _format_post_data(posts_by_id[post_id].as_subtype(), request.user, booked_ids)
+            for post_id in page_ids
+            if post_id in posts_by_id
+        ]
+
+    # ไม่พบผลลัพธ์: แนะนำชื่อโพสต์ที่ใกล้เคียง (กรณีพิมพ์ผิด)
+    suggestions = []
+    if query and not formatted_items:
+        suggestions = [
+            text for _, text, _ in get_trigram_index().lookup(SearchTrigram.KIND_POST, query, limit=3)
+        ]
 
     context = {
         "query": query,
-        "search_items": formatted_items,
-        "result_count": len(formatted_items)
+        "search_items": attach_card_versions(formatted_items, "search_card"),
+        "result_count": page_obj.paginator.count if page_obj else 0,
+        "page_obj": page_obj,
+        "suggestions": suggestions,
     }
-    return render(request, "pages/search.html", context)
\ No newline at end of file
+    return render(request, "pages/search.html", context)
+
+
+def _autocomplete_results(query):
+    # โพสต์มาก่อน แล้วตามด้วย skill / category จนครบ AUTOCOMPLETE_LIMIT
+    index = get_trigram_index()
+    search_url = reverse("posts:search")
+    results = []
+    for kind in (SearchTrigram.KIND_POST, SearchTrigram.KIND_SKILL, SearchTrigram.KIND_CATEGORY):
+        remaining = AUTOCOMPLETE_LIMIT - len(results)
+        if remaining <= 0:
+            break
+        for object_id, text, _ in index.lookup(kind, query, limit=remaining):
+            if kind == SearchTrigram.KIND_POST:
+                url = reverse("posts:detail_post", args=[object_id])
+            else:
+                url = f"{search_url}?q={quote(text)}"
+            results.append({"type": kind, "id": object_id, "label": text, "url": url})
+    return results
+
+
+def autocomplete_view(request):
+    # คืนคำแนะนำเป็น JSON สำหรับช่องค้นหา: /posts/autocomplete/?q=...
+    query = (request.GET.get("q") or "").strip()[:100]
+    if len(query) < 2:
+        return JsonResponse({"query": query, "results": []})
+
+    # คำค้นเดียวกันมักถูกถามซ้ำขณะพิมพ์ จึง cache คำตอบไว้สั้น ๆ
+    cache_key = "posts:autocomplete:" + md5(query.lower().encode()).hexdigest()
+    results = cache.get(cache_key)
+    if results is None:
+        results = _autocomplete_results(query)
+        cache.set(cache_key, results, AUTOCOMPLETE_CACHE_TIMEOUT)
+    return JsonResponse({"query": query, "results": results})
+
+
+@student_required
+@require_POST
+def upload_ticket_view(request):
+    # ออก ticket ให้เบราว์เซอร์อัปโหลดรูปหนึ่งไฟล์ตรงไปยัง storage
+    if not _direct_upload_enabled():
+        raise Http404
+    try:
+        ticket = issue_ticket(
+            request.user, request.POST.get("content_type"), request.POST.get("size")
+        )
+    except UploadError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return JsonResponse(ticket)
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+def direct_upload_view(request, signed):
+    # ปลายทางอัปโหลดแทน S3 presigned URL เมื่อใช้ FileSystemStorage (เครื่อง dev)
+    # สิทธิ์มาจาก URL ที่เซ็นไว้ใน ticket เหมือน presigned URL จึงไม่ใช้ CSRF
+    if not _direct_upload_enabled():
+        raise Http404
+    try:
+        # อ่านจาก stream ตรง ๆ ไม่ผ่าน request.body ที่จำกัดขนาดไว้ 2.5MB
+        body = request.read(max_upload_size() + 1)
+        store_local_upload(signed, request.content_type, body)
+    except UploadError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return HttpResponse(status=204)
+
+
+@staff_member_required
+def runtime_stats_view(request):
+    # สถิติของ worker ที่ตอบ request นี้ (แต่ละ process นับแยกกัน)
+    return JsonResponse(
+        {
+            "pid": os.getpid(),
+            "database": connection_stats(),
+            "media_urls": url_cache_stats(),
+        }
+    )
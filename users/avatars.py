@@ -0,0 +1,42 @@
+"""
+รูปโปรไฟล์ย่อ (avatar) เป็นสี่เหลี่ยมจัตุรัส
+
+- small : รายการรีวิว (แสดง 32px เผื่อจอ 2x)
+- large : หน้าโปรไฟล์ (กล่องรูปกว้างราว 300px เผื่อจอ 2x)
+
+URL ของแต่ละขนาดถูกคำนวณครั้งเดียวตอนสร้าง แล้วเก็บไว้บน Profile
+"""
+import os
+
+from PIL import Image, ImageOps
+
+from posts.images import JPEG_QUALITY, encode_image, open_image
+
+AVATAR_SIZES = {
+    "small": 64,
+    "large": 480,
+}
+
+
+def update_avatars(profile, source):
+    """
+    สร้าง avatar ทุกขนาดจาก source (ไฟล์รูปที่อัปโหลด) แล้วกำหนดให้ profile (ยังไม่ save)
+    source = None หรือไฟล์ที่ไม่ใช่รูปภาพ จะล้าง avatar ออก (template ใช้รูปต้นฉบับ/placeholder แทน)
+    """
+    image = open_image(source) if source else None
+    for size_name, size in AVATAR_SIZES.items():
+        field = getattr(profile, f"avatar_{size_name}")
+        if image is None:
+            setattr(profile, f"avatar_{size_name}", None)
+            setattr(profile, f"avatar_{size_name}_url", "")
+            continue
+
+        stem = os.path.splitext(os.path.basename(source.name or "avatar"))[0]
+        avatar = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        field.save(
+            f"{stem}_{size}.jpg",
+            encode_image(avatar, "JPEG", quality=JPEG_QUALITY, optimize=True),
+            save=False,
+        )
+        setattr(profile, f"avatar_{size_name}_url", field.url)
+
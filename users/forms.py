@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.models import User
+from .avatars import update_avatars
 from .models import Profile
 
 
@@ -42,3 +43,13 @@ class ProfileUpdateForm(forms.ModelForm):
         widgets = {
             "bioSkills": forms.Textarea(attrs={"rows": 3}),
         }
+
+    def save(self, commit=True):
+        profile = super().save(commit=False)
+        # อัปโหลดรูปใหม่ / ลบรูป -> สร้าง avatar ใหม่ทุกขนาด (users/avatars.py)
+        if "profile_image" in self.changed_data:
+            update_avatars(profile, self.cleaned_data.get("profile_image") or None)
+        if commit:
+            profile.save()
+            self.save_m2m()
+        return profile
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from users.avatars import AVATAR_SIZES, update_avatars
+from users.models import Profile
+
+AVATAR_FIELDS = [
+    f"avatar_{size_name}{suffix}" for size_name in AVATAR_SIZES for suffix in ("", "_url")
+]
+
+
+class Command(BaseCommand):
+    help = "สร้าง avatar ทุกขนาดให้โปรไฟล์ที่อัปโหลดรูปไว้ก่อนมีระบบ avatar"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="สร้างใหม่ทุกโปรไฟล์ แม้จะมี avatar อยู่แล้ว",
+        )
+        parser.add_argument(
+            "--urls-only",
+            action="store_true",
+            help="คำนวณ URL ที่เก็บไว้ใหม่จากไฟล์เดิม (เช่น หลังเปลี่ยนโดเมนของ storage)",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Profile.objects.exclude(Q(profile_image="") | Q(profile_image__isnull=True))
+
+        if options["urls_only"]:
+            updated = 0
+            for profile in queryset.exclude(Q(avatar_small="") | Q(avatar_small__isnull=True)).iterator():
+                for size_name in AVATAR_SIZES:
+                    field = getattr(profile, f"avatar_{size_name}")
+                    setattr(profile, f"avatar_{size_name}_url", field.url if field else "")
+                profile.save(update_fields=AVATAR_FIELDS)
+                updated += 1
+            self.stdout.write(self.style.SUCCESS(f"Refreshed avatar URLs for {updated} profile(s)"))
+            return
+
+        if not options["force"]:
+            queryset = queryset.filter(Q(avatar_small="") | Q(avatar_small__isnull=True))
+
+        generated = skipped = 0
+        for profile in queryset.iterator():
+            try:
+                with profile.profile_image.open("rb") as source:
+                    update_avatars(profile, source)
+            except (OSError, ValueError):
+                update_avatars(profile, None)
+            if profile.avatar_small:
+                profile.save(update_fields=AVATAR_FIELDS)
+                generated += 1
+            else:
+                skipped += 1
+                self.stderr.write(f"Skipped profile #{profile.pk}: {profile.profile_image.name} is not a readable image")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated avatars for {generated} profile(s) ({skipped} skipped)")
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_profile_facebook_link_profile_instagram_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_large',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_images/avatars/'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_large_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_small',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_images/avatars/'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_small_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+    ]
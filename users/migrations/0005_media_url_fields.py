@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:09
+
+import posts.media_urls
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_profile_avatars'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_image',
+            field=posts.media_urls.MediaImageField(blank=True, null=True, upload_to='profile_images/'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models import Avg
 
+from posts.media_urls import MediaImageField
+
 # Create your models here.
 class Profile(models.Model):
     
@@ -11,12 +13,23 @@ class Profile(models.Model):
     bioSkills = models.TextField(blank=True, null=True)
     socialMedia = models.CharField(max_length=255, blank=True, null=True)
     phoneNum = models.CharField(max_length=10, blank=True, null=True)
-    profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    profile_image = MediaImageField(upload_to='profile_images/', blank=True, null=True)
+
+    # รูปโปรไฟล์ย่อเป็นสี่เหลี่ยมจัตุรัส สร้างตอนบันทึก ProfileUpdateForm (users/avatars.py)
+    # เก็บ URL ไว้ด้วย template จึงไม่ต้องเรียก storage ทุกครั้งที่แสดงรูป
+    avatar_small = models.ImageField(upload_to='profile_images/avatars/', blank=True, null=True, editable=False)
+    avatar_large = models.ImageField(upload_to='profile_images/avatars/', blank=True, null=True, editable=False)
+    avatar_small_url = models.CharField(max_length=500, blank=True, editable=False)
+    avatar_large_url = models.CharField(max_length=500, blank=True, editable=False)
+
     line_id = models.CharField(max_length=50, blank=True, null=True)
     instagram_id = models.CharField(max_length=50, blank=True, null=True)
     facebook_link = models.URLField(max_length=200, blank=True, null=True)
     x_link = models.URLField(max_length=200, blank=True, null=True) # Twitter/X
 
+    # ฟิลด์ที่เก็บชื่อไฟล์ใน storage (ใช้ตอนตรวจไฟล์ที่ไม่มีใครใช้แล้ว posts/gc.py)
+    FILE_FIELDS = ("profile_image", "avatar_small", "avatar_large")
+
     def __str__(self):
         return self.user.username
     
@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
+from posts.gc import log_deleted_files
 from .models import Profile
 
 @receiver(post_save, sender=User)
@@ -12,4 +13,34 @@ def create_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    instance.profile.save()
+
+
+def _file_names(profile):
+    # อ่านจาก __dict__ ไม่ให้ field ที่ถูก defer ยิง query
+    names = {}
+    for field in Profile.FILE_FIELDS:
+        value = profile.__dict__.get(field)
+        names[field] = getattr(value, "name", value) or ""
+    return names
+
+
+@receiver(post_init, sender=Profile)
+def remember_profile_images(sender, instance, **kwargs):
+    # จำชื่อไฟล์รูปโปรไฟล์ / avatar ตอนโหลดจาก DB
+    instance._saved_file_names = _file_names(instance)
+
+
+@receiver(post_save, sender=Profile)
+def log_replaced_profile_images(sender, instance, **kwargs):
+    # รูปเดิมที่ถูกแทนที่/ล้างออก ให้ gc_media ลบไฟล์ทีหลัง
+    current = _file_names(instance)
+    log_deleted_files(
+        name for field, name in instance._saved_file_names.items() if name and name != current[field]
+    )
+    instance._saved_file_names = current
+
+
+@receiver(post_delete, sender=Profile)
+def log_deleted_profile_images(sender, instance, **kwargs):
+    log_deleted_files(_file_names(instance).values())
@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from users.models import Profile
@@ -7,6 +7,12 @@ from users.forms import UserUpdateForm, ProfileUpdateForm
 from django.contrib.admin.sites import AdminSite
 from users.admin import ProfileAdmin
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import BytesIO, StringIO
+from PIL import Image
+import tempfile
 
 
 # Create your tests here.
@@ -19,6 +25,7 @@ class ProfileModelTest(TestCase):
         self.assertEqual(str(profile), self.user.username)
         self.assertEqual(str(profile), "minnie")
         
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class ProfileViewTests(TestCase):
     def setUp(self):
         # สร้าง user และ profile อัตโนมัติ (สมมติ Profile มี OneToOne กับ User)
@@ -90,7 +97,22 @@ class ProfileViewTests(TestCase):
         # ข้อมูลใน database ไม่ถูกแก้ไข
         self.user.refresh_from_db()
         self.assertNotEqual(self.user.username, '')
+
+    def test_profile_post_non_image_rejected(self):
+        """ไฟล์ที่ไม่ใช่รูปภาพถูกปฏิเสธระหว่างอัปโหลด (posts/upload_handlers.py)"""
+        data = {
+            'email': 'john.do@dome.tu.ac.th',
+            'displayName': 'Johnny',
+            'profile_image': SimpleUploadedFile('me.jpg', b'not an image at all', content_type='image/jpeg'),
+        }
+
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profile_image', response.context['p_form'].errors)
+        self.user.profile.refresh_from_db()
+        self.assertFalse(self.user.profile.profile_image)
         
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class ProfileAdminTests(TestCase):
     def setUp(self):
         self.site = AdminSite()
@@ -124,6 +146,7 @@ class ProfileAdminTests(TestCase):
         html = self.admin.show_image(profile)
         self.assertEqual(html, "-")
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class ProfileModelTests(TestCase):
 
     def setUp(self):
@@ -168,4 +191,76 @@ class ProfileModelTests(TestCase):
         # ตรวจสอบ model method
         avg_model = self.profile.get_average_rating()
         self.assertIsInstance(avg_model, float)
-        self.assertEqual(avg_model, 4.5)
\ No newline at end of file
+        self.assertEqual(avg_model, 4.5)
+
+def make_avatar_file(name="me.png", size=(800, 600)):
+    buffer = BytesIO()
+    Image.new("RGB", size, (30, 120, 200)).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='john', email='john@dome.tu.ac.th', password='123456')
+        self.client.force_login(self.user)
+
+    def upload(self, **extra):
+        data = {'email': 'john@dome.tu.ac.th', 'displayName': 'John', **extra}
+        return self.client.post(reverse('profile_edit'), data)
+
+    def test_upload_generates_square_avatars(self):
+        self.upload(profile_image=make_avatar_file())
+        profile = Profile.objects.get(user=self.user)
+
+        with Image.open(profile.avatar_small.path) as small:
+            self.assertEqual(small.size, (64, 64))
+        with Image.open(profile.avatar_large.path) as large:
+            self.assertEqual(large.size, (480, 480))
+        self.assertEqual(profile.avatar_small_url, profile.avatar_small.url)
+
+        response = self.client.get(reverse('profile_detail', args=['john']))
+        self.assertContains(response, profile.avatar_large_url)
+
+    def test_clearing_image_clears_avatars(self):
+        self.upload(profile_image=make_avatar_file())
+        self.upload(**{'profile_image-clear': 'on'})
+        profile = Profile.objects.get(user=self.user)
+        self.assertFalse(profile.avatar_small)
+        self.assertEqual(profile.avatar_large_url, '')
+
+    def test_review_avatars_do_not_add_queries(self):
+        post = Post.objects.create(author=self.user, title="Reviewed")
+        url = reverse('profile_detail', args=['john'])
+
+        def add_reviewer(i):
+            reviewer = User.objects.create_user(username=f"reviewer{i}", password="123")
+            reviewer.profile.avatar_small_url = f"/media/profile_images/avatars/{i}_64.jpg"
+            reviewer.profile.save()
+            Review.objects.create(post=post, author=reviewer, rating=5)
+
+        add_reviewer(0)
+        with CaptureQueriesContext(connection) as one_review:
+            self.client.get(url)
+        for i in range(1, 4):
+            add_reviewer(i)
+        with CaptureQueriesContext(connection) as many_reviews:
+            response = self.client.get(url)
+
+        self.assertEqual(len(many_reviews), len(one_review))
+        self.assertContains(response, "/media/profile_images/avatars/3_64.jpg")
+
+        detail = self.client.get(reverse('posts:detail_post', args=[post.id]))
+        self.assertContains(detail, "/media/profile_images/avatars/3_64.jpg")
+
+    def test_backfill_command(self):
+        profile = self.user.profile
+        profile.profile_image = make_avatar_file()
+        profile.save()
+        self.assertFalse(profile.avatar_small)
+
+        call_command('generate_avatars', stdout=StringIO(), stderr=StringIO())
+
+        profile.refresh_from_db()
+        self.assertTrue(profile.avatar_large)
+        self.assertEqual(profile.avatar_large_url, profile.avatar_large.url)
@@ -4,11 +4,17 @@ from django.contrib.auth.models import User
 from .forms import UserUpdateForm, ProfileUpdateForm
 from django.db.models import Avg
 from posts.models import Review
+from posts.upload_handlers import image_uploads, rejected_uploads
 
 def profile_detail_view(request, username): 
     
-    profile_user = get_object_or_404(User, username=username)
-    user_reviews = Review.objects.filter(post__author=profile_user).order_by('-created_at')
+    profile_user = get_object_or_404(User.objects.select_related('profile'), username=username)
+    # ดึงผู้รีวิว (พร้อม URL avatar ใน Profile) และโพสต์มาใน query เดียว
+    user_reviews = (
+        Review.objects.filter(post__author=profile_user)
+        .select_related('author__profile', 'post')
+        .order_by('-created_at')
+    )
     avg_rating = user_reviews.aggregate(Avg('rating'))['rating__avg']
     if avg_rating is None:
         avg_rating = 0
@@ -25,6 +31,7 @@ def profile_detail_view(request, username):
 
 
 # ฟังก์ชันสำหรับ "แก้ไขโปรไฟล์" (ต้อง Login เท่านั้น)
+@image_uploads
 @login_required
 def profile_edit_view(request):
     if request.method == "POST":
@@ -32,6 +39,9 @@ def profile_edit_view(request):
         p_form = ProfileUpdateForm(
             request.POST, request.FILES, instance=request.user.profile
         )
+        # รูปที่ถูกปฏิเสธระหว่างอัปโหลด (ไม่ใช่รูปภาพ / ใหญ่เกินไป)
+        for message in rejected_uploads(request):
+            p_form.add_error("profile_image", message)
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
             p_form.save()